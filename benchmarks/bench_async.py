@@ -0,0 +1,41 @@
+u"""Requests per second of Client against AsyncClient on a local stub server answering with some latency.
+
+Usage: python benchmarks/bench_async.py [calls] [max_workers] [latency]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import sys
+import time
+
+from microsoftgraph.async_client import AsyncClient
+from microsoftgraph.client import Client
+from stub_server import StubServer
+
+
+def report(name, calls, elapsed):
+    print(u'{:<28} {:>6} calls {:>8.3f}s {:>10.1f} req/s'.format(name, calls, elapsed, calls / elapsed))
+
+
+def main(calls=500, max_workers=20, latency=0.01):
+    with StubServer(latency=latency) as server:
+        client = Client(u'id', u'secret')
+        client.base_url = server.url + u'v1.0/'
+        client.set_token({u'access_token': u'token'})
+        start = time.time()
+        for i in range(calls):
+            client.get_message(str(i))
+        report(u'Client', calls, time.time() - start)
+        client.close()
+
+        with AsyncClient(u'id', u'secret', max_workers=max_workers) as async_client:
+            async_client.client.base_url = server.url + u'v1.0/'
+            async_client.set_token({u'access_token': u'token'})
+            start = time.time()
+            futures = [async_client.get_message(str(i)) for i in range(calls)]
+            for future in futures:
+                future.result()
+            report(u'AsyncClient ({} workers)'.format(max_workers), calls, time.time() - start)
+
+
+if __name__ == u'__main__':
+    main(*[float(arg) if u'.' in arg else int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,73 @@
+u"""Client.map against a local stub server that throttles (429) above a number of concurrent requests.
+
+Usage: python benchmarks/bench_map.py [calls] [max_workers] [capacity] [latency]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import json
+import sys
+import threading
+import time
+
+from microsoftgraph.client import Client
+from microsoftgraph.retry import RetryPolicy
+from stub_server import StubServer
+
+
+class ThrottlingHandler(object):
+    u"""Answers with 429 and Retry-After while more than `capacity` requests are in flight."""
+
+    def __init__(self, capacity, latency):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        with self._lock:
+            self.in_flight += 1
+            throttle = self.in_flight > self.capacity
+            if throttle:
+                self.throttled += 1
+        try:
+            if throttle:
+                return 429, {u'Retry-After': u'0.2', u'Content-Type': u'application/json'}, json.dumps(
+                    {u'error': {u'code': u'TooManyRequests', u'message': u'Throttled'}})
+            time.sleep(self.latency)
+            return 200, {u'Content-Type': u'application/json'}, json.dumps({u'id': path.rsplit(u'/', 1)[-1]})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(name, handler, server, calls, max_workers, **kwargs):
+    client = Client(u'id', u'secret', pool_maxsize=max_workers, retry_policy=RetryPolicy(max_retries=10))
+    client.base_url = server.url + u'v1.0/'
+    client.set_token({u'access_token': u'token'})
+    handler.throttled = 0
+    start = time.time()
+    if max_workers == 1:
+        results = [client.get_message(str(i)) for i in range(calls)]
+        failed = 0
+    else:
+        results = list(client.map(client.get_message, (str(i) for i in range(calls)), max_workers=max_workers,
+                                  **kwargs))
+        failed = sum(1 for result in results if not result.ok)
+    elapsed = time.time() - start
+    client.close()
+    print(u'{:<22} {:>6} calls {:>8.3f}s {:>8.1f} req/s {:>6} throttled {:>4} failed'.format(
+        name, calls, elapsed, calls / elapsed, handler.throttled, failed))
+
+
+def main(calls=1000, max_workers=32, capacity=8, latency=0.01):
+    handler = ThrottlingHandler(capacity, latency)
+    with StubServer(handler) as server:
+        run(u'serial', handler, server, calls // 10, 1)
+        run(u'map', handler, server, calls, max_workers, adaptive=False)
+        run(u'map, adaptive', handler, server, calls, max_workers)
+        run(u'map, unordered', handler, server, calls, max_workers, ordered=False)
+
+
+if __name__ == u'__main__':
+    main(*[float(arg) if u'.' in arg else int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+u"""Throughput of NotificationProcessor, called directly and behind a local HTTP server.
+
+Usage: python benchmarks/bench_notifications.py [batches] [batch_size] [resources]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import json
+import sys
+import threading
+import time
+from urlparse import urlparse
+
+import requests
+
+from microsoftgraph.notifications import NotificationProcessor
+from stub_server import StubServer
+
+
+def make_batches(batches, batch_size, resources):
+    bodies = []
+    for batch in range(batches):
+        values = []
+        for index in range(batch_size):
+            resource_id = u'AAMk{}'.format((batch * batch_size + index) % resources)
+            values.append({u'subscriptionId': u'sub', u'clientState': u'secret', u'changeType': u'updated',
+                           u'resource': u'Users/me/Messages/' + resource_id, u'resourceData': {u'id': resource_id},
+                           u'tenantId': u'tenant'})
+        bodies.append(json.dumps({u'value': values}))
+    return bodies
+
+
+def consume(processor, stop):
+    while not stop.is_set() or processor.queue.qsize():
+        processor.drain()
+        time.sleep(0.001)
+
+
+def run(name, bodies, batch_size, post, **kwargs):
+    processor = NotificationProcessor(client_state=u'secret', **kwargs)
+    stop = threading.Event()
+    consumer = threading.Thread(target=consume, args=(processor, stop))
+    consumer.start()
+    start = time.time()
+    for body in bodies:
+        post(processor, body)
+    elapsed = time.time() - start
+    stop.set()
+    consumer.join()
+    total = len(bodies) * batch_size
+    print(u'{:<24} {:>7} notifications {:>8.3f}s {:>9.0f}/s'.format(name, total, elapsed, total / elapsed))
+    print(u'  {}'.format(processor.stats))
+
+
+def main(batches=200, batch_size=50, resources=1000):
+    bodies = make_batches(batches, batch_size, resources)
+    direct = lambda processor, body: processor.handle(u'', body)
+    run(u'direct', bodies, batch_size, direct)
+    run(u'direct, dedup+coalesce', bodies, batch_size, direct, dedup_window=60, coalesce=True)
+
+    current = {}
+    with StubServer(lambda method, path, headers, body: current[u'processor'].handle(urlparse(path).query,
+                                                                                       body)) as server:
+        session = requests.Session()
+
+        def post(processor, body):
+            current[u'processor'] = processor
+            session.post(server.url + u'notify', data=body, headers={u'Content-Type': u'application/json'})
+
+        run(u'http', bodies, batch_size, post)
+        session.close()
+
+
+if __name__ == u'__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
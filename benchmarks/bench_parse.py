@@ -0,0 +1,96 @@
+u"""Decoding time and memory of collection pages with the installed JSON decoders, plain and with compact items.
+
+The payloads mimic pages of list_pages, get_me_events and excel_get_rows.
+
+Usage: python benchmarks/bench_parse.py [items] [rounds]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import json
+import sys
+import time
+
+from microsoftgraph import decoding
+
+
+def events_page(items):
+    return {u'@odata.context': u'https://graph.microsoft.com/v1.0/$metadata#users(\'me\')/events', u'value': [{
+        u'@odata.etag': u'W/"ZlnW4RIAV06KYYwlrfNZvQAAKGWwbw=="',
+        u'id': u'AAMkAGIAAAoZDOFAAA{:06d}='.format(index),
+        u'createdDateTime': u'2017-04-15T03:00:50.7579581Z',
+        u'lastModifiedDateTime': u'2017-04-15T03:00:51.245372Z',
+        u'subject': u'Weekly sync {}'.format(index),
+        u'bodyPreview': u'Agenda: status, blockers and next steps for the week. ' * 2,
+        u'importance': u'normal',
+        u'isAllDay': False,
+        u'isCancelled': False,
+        u'showAs': u'busy',
+        u'start': {u'dateTime': u'2017-04-21T10:00:00.0000000', u'timeZone': u'UTC'},
+        u'end': {u'dateTime': u'2017-04-21T11:00:00.0000000', u'timeZone': u'UTC'},
+        u'location': {u'displayName': u'Conference room {}'.format(index % 10)},
+        u'attendees': [{u'type': u'required', u'status': {u'response': u'none', u'time': u'0001-01-01T00:00:00Z'},
+                        u'emailAddress': {u'name': u'Person {}'.format(n), u'address': u'p{}@contoso.com'.format(n)}}
+                       for n in range(3)],
+        u'organizer': {u'emailAddress': {u'name': u'Organizer', u'address': u'organizer@contoso.com'}},
+    } for index in range(items)], u'@odata.nextLink': u'https://graph.microsoft.com/v1.0/me/events?$skip=10'}
+
+
+def pages_page(items):
+    return {u'value': [{
+        u'id': u'1-{:032x}!{}-8d3a'.format(index, index),
+        u'self': u'https://graph.microsoft.com/v1.0/me/onenote/pages/1-{:032x}'.format(index),
+        u'createdDateTime': u'2016-10-12T02:19:52Z',
+        u'title': u'Page {}'.format(index),
+        u'createdByAppId': u'WLID-000000004C12821A',
+        u'contentUrl': u'https://graph.microsoft.com/v1.0/me/onenote/pages/1-{:032x}/content'.format(index),
+        u'lastModifiedDateTime': u'2016-10-12T02:19:52Z',
+        u'links': {u'oneNoteClientUrl': {u'href': u'onenote:https://d.docs.live.net/page{}'.format(index)},
+                   u'oneNoteWebUrl': {u'href': u'https://onedrive.live.com/page{}'.format(index)}},
+    } for index in range(items)]}
+
+
+def rows_page(items):
+    return {u'value': [{u'index': index, u'values': [[index, u'Product {}'.format(index), 12.5, u'2017-01-01', True]]}
+                       for index in range(items)]}
+
+
+def deep_size(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(value, seen) for value in obj)
+    elif isinstance(obj, decoding.Item):
+        size += deep_size(obj._fields, seen) + deep_size(obj._values, seen)
+    return size
+
+
+def main(items=1000, rounds=20):
+    decoders = []
+    for name, load in decoding.DECODERS:
+        try:
+            decoders.append((name, load()))
+        except ImportError:
+            print(u'{} is not installed'.format(name))
+    for page_name, make in ((u'events', events_page), (u'onenote pages', pages_page), (u'excel rows', rows_page)):
+        payload = json.dumps(make(items)).encode(u'utf-8')
+        print(u'{} page: {} items, {} KiB'.format(page_name, items, len(payload) // 1024))
+        for name, loads in decoders:
+            for mode in (u'plain', u'compact'):
+                pages = []
+                start = time.time()
+                for _ in range(rounds):
+                    page = decoding.decode(loads, payload, mode == u'compact')
+                    # Keep the pages alive, as a caller walking a collection does with its results.
+                    pages.append(page)
+                elapsed = (time.time() - start) / rounds
+                print(u'  {:<6} {:<9} {:>8.2f} ms/page {:>8} KiB in memory'.format(
+                    name, mode, elapsed * 1000, deep_size(page) // 1024))
+
+
+if __name__ == u'__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,41 @@
+u"""Compares one-shot requests (a new connection per call) with the pooled Client session.
+
+Usage: python benchmarks/bench_session.py [calls]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import sys
+import time
+
+import requests
+
+from microsoftgraph.client import Client
+from stub_server import StubServer
+
+
+def bench(name, func, calls):
+    start = time.time()
+    for _ in range(calls):
+        func()
+    elapsed = time.time() - start
+    print(u'{:<24} {:>6} calls {:>8.3f}s {:>10.1f} calls/s'.format(name, calls, elapsed, calls / elapsed))
+
+
+def main(calls=500):
+    with StubServer() as server:
+        client = Client(u'id', u'secret')
+        client.base_url = server.url + u'v1.0/'
+        client.set_token({u'access_token': u'token'})
+
+        before = server.connections
+        bench(u'requests.request', lambda: requests.request(u'GET', server.url + u'v1.0/me'), calls)
+        print(u'  connections opened: {}'.format(server.connections - before))
+
+        before = server.connections
+        bench(u'Client.get_me (pooled)', client.get_me, calls)
+        print(u'  connections opened: {}'.format(server.connections - before))
+        client.close()
+
+
+if __name__ == u'__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
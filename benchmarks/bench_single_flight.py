@@ -0,0 +1,52 @@
+u"""Stress test of identical concurrent GET requests, with and without single-flight coalescing.
+
+Usage: python benchmarks/bench_single_flight.py [threads] [rounds] [latency]
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import sys
+import threading
+import time
+
+from microsoftgraph.client import Client
+from microsoftgraph.singleflight import SingleFlight
+from stub_server import StubServer
+
+
+def run(server, single_flight, threads, rounds):
+    client = Client(u'id', u'secret', pool_maxsize=threads, single_flight=single_flight)
+    client.base_url = server.url + u'v1.0/'
+    client.set_token({u'access_token': u'token'})
+    barrier = threading.Semaphore(0)
+
+    def worker():
+        for _ in range(rounds):
+            barrier.acquire()
+            client.get_me()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    before = server.requests
+    start = time.time()
+    for _ in range(rounds):
+        for _ in range(threads):
+            barrier.release()
+    for thread in workers:
+        thread.join()
+    elapsed = time.time() - start
+    client.close()
+    return server.requests - before, elapsed
+
+
+def main(threads=50, rounds=10, latency=0.05):
+    with StubServer(latency=latency) as server:
+        for name, single_flight in ((u'plain', None), (u'single-flight', SingleFlight())):
+            sent, elapsed = run(server, single_flight, threads, rounds)
+            print(u'{:<14} {:>5} calls {:>5} requests sent {:>8.3f}s'.format(name, threads * rounds, sent, elapsed))
+            if single_flight is not None:
+                print(u'  {}'.format(single_flight.stats))
+
+
+if __name__ == u'__main__':
+    main(*[float(arg) if u'.' in arg else int(arg) for arg in sys.argv[1:]])
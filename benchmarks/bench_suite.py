@@ -0,0 +1,208 @@
+u"""Offline benchmark suite: every scenario runs against a ReplayTransport, without network.
+
+Scenarios: the request hot path, _parse of a large page, pagination, JSON batching, upload and download.
+Save the results of a reference run and compare later runs to it to catch performance regressions, e.g. in CI:
+
+    python benchmarks/bench_suite.py --save baseline.json
+    python benchmarks/bench_suite.py --compare baseline.json --tolerance 0.3
+
+The comparison exits with status 1 when a scenario is slower than the baseline by more than the tolerance.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from microsoftgraph.client import Client
+from microsoftgraph.replay import ReplayTransport
+from bench_parse import events_page
+
+BASE = u'https://graph.microsoft.com/v1.0/'
+
+
+def make_client(transport, **kwargs):
+    client = Client(u'id', u'secret', transport=transport, **kwargs)
+    client.set_token({u'access_token': u'token'})
+    return client
+
+
+def timed(func, rounds):
+    u"""Returns the best time of a round over `rounds` rounds, the least disturbed by the machine."""
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_hot_path(rounds, calls=2000):
+    transport = ReplayTransport()
+    transport.add(u'GET', BASE + u'me', json_body={u'id': u'me', u'displayName': u'Me'})
+    client = make_client(transport)
+
+    def run():
+        for _ in range(calls):
+            client.get_me()
+
+    return timed(run, rounds) / calls, u'per call'
+
+
+def bench_parse(rounds, calls=20):
+    transport = ReplayTransport()
+    transport.add(u'GET', BASE + u'me/events', json_body=events_page(1000))
+    client = make_client(transport)
+    response = transport.request(u'GET', BASE + u'me/events')
+
+    def run():
+        for _ in range(calls):
+            client._parse(response)
+
+    return timed(run, rounds) / calls, u'per 1000-item page'
+
+
+def bench_pagination(rounds, pages=50, page_size=100):
+    transport = ReplayTransport()
+    transport.add_pages(BASE + u'me/contacts?$top={}'.format(page_size),
+                        [{u'id': u'contact{}'.format(index), u'displayName': u'Contact {}'.format(index)}
+                         for index in range(pages * page_size)], page_size)
+    client = make_client(transport)
+
+    def run():
+        count = sum(1 for _ in client.iter(client.outlook_get_me_contacts, page_size=page_size))
+        assert count == pages * page_size, count
+
+    return timed(run, rounds) / pages, u'per page'
+
+
+def batch_handler(request):
+    responses = [{u'id': sub[u'id'], u'status': 200, u'headers': {u'Content-Type': u'application/json'},
+                  u'body': {u'id': sub[u'url'].rsplit(u'/', 1)[-1]}}
+                 for sub in json.loads(request.body)[u'requests']]
+    return 200, {}, {u'responses': responses}
+
+
+def bench_batch(rounds, calls=400):
+    transport = ReplayTransport()
+    transport.route(u'^POST /v1.0/\\$batch$', batch_handler)
+    client = make_client(transport)
+
+    def run():
+        with client.batch() as batch:
+            futures = [batch.get_message(u'message{}'.format(index)) for index in range(calls)]
+        assert all(future.result() for future in futures)
+
+    return timed(run, rounds) / calls, u'per batched call'
+
+
+class UploadServer(object):
+    u"""Answers the range PUTs of an upload session."""
+
+    def __init__(self, size):
+        self.size = size
+        self.received = 0
+
+    def __call__(self, request):
+        start, end, total = map(int, re.match(u'bytes (\\d+)-(\\d+)/(\\d+)',
+                                              request.headers[u'Content-Range']).groups())
+        assert len(request.body) == end - start + 1
+        self.received += end - start + 1
+        if end + 1 == total:
+            return 201, {}, {u'id': u'item', u'size': total}
+        return 202, {}, {u'nextExpectedRanges': [u'{}-'.format(end + 1)]}
+
+
+def bench_upload(rounds, directory, size=32 * 1024 * 1024):
+    path = os.path.join(directory, u'upload.bin')
+    with open(path, u'wb') as f:
+        f.write(os.urandom(size))
+    transport = ReplayTransport()
+    transport.add(u'POST', BASE + u'me/drive/root:/bench/upload.bin:/createUploadSession',
+                  json_body={u'uploadUrl': u'https://upload.example.com/session', u'nextExpectedRanges': [u'0-']})
+    transport.route(u'^PUT /session$', UploadServer(size))
+    client = make_client(transport)
+
+    def run():
+        item = client.drive_upload_large_file(path, u'bench/upload.bin')
+        assert item[u'size'] == size
+
+    return timed(run, rounds) / (size / 1024.0 / 1024), u'per MiB'
+
+
+def bench_download(rounds, directory, size=32 * 1024 * 1024):
+    content = os.urandom(size)
+
+    def download(request):
+        match = re.match(u'bytes=(\\d+)-(\\d+)', request.headers.get(u'Range', u''))
+        if not match:
+            return 200, {u'Content-Type': u'application/octet-stream'}, content
+        start, end = int(match.group(1)), int(match.group(2))
+        return 206, {u'Content-Range': u'bytes {}-{}/{}'.format(start, end, size)}, content[start:end + 1]
+
+    transport = ReplayTransport()
+    transport.add(u'GET', BASE + u'me/drive/items/item', json_body={
+        u'id': u'item', u'size': size, u'file': {u'hashes': {}},
+        u'@microsoft.graph.downloadUrl': u'https://download.example.com/content'})
+    transport.route(u'^GET /content$', download)
+    client = make_client(transport)
+    path = os.path.join(directory, u'download.bin')
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        client.drive_download_item(u'item', path, max_workers=4, segment_size=4 * 1024 * 1024, verify=False)
+        assert os.path.getsize(path) == size
+
+    return timed(run, rounds) / (size / 1024.0 / 1024), u'per MiB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(u'--rounds', type=int, default=5, help=u'rounds per scenario, the best one is kept')
+    parser.add_argument(u'--save', help=u'write the results to this JSON file')
+    parser.add_argument(u'--compare', help=u'compare the results to this JSON file')
+    parser.add_argument(u'--tolerance', type=float, default=0.3, help=u'allowed slowdown, 0.3 for 30%%')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        scenarios = [
+            (u'hot_path', lambda: bench_hot_path(args.rounds)),
+            (u'parse', lambda: bench_parse(args.rounds)),
+            (u'pagination', lambda: bench_pagination(args.rounds)),
+            (u'batch', lambda: bench_batch(args.rounds)),
+            (u'upload', lambda: bench_upload(args.rounds, directory)),
+            (u'download', lambda: bench_download(args.rounds, directory)),
+        ]
+        results = {}
+        for name, scenario in scenarios:
+            seconds, unit = scenario()
+            results[name] = seconds
+            print(u'{:<12} {:>12.1f} us {}'.format(name, seconds * 1e6, unit))
+    finally:
+        shutil.rmtree(directory)
+
+    if args.save:
+        with open(args.save, u'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [name for name, seconds in sorted(results.items())
+                       if name in baseline and seconds > baseline[name] * (1 + args.tolerance)]
+        for name in regressions:
+            print(u'REGRESSION {}: {:.1f} us instead of {:.1f} us'.format(name, results[name] * 1e6,
+                                                                          baseline[name] * 1e6))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == u'__main__':
+    main()
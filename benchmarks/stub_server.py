@@ -0,0 +1,94 @@
+u"""A tiny threaded HTTP/1.1 server standing in for graph.microsoft.com in the benchmarks."""
+from __future__ import absolute_import
+import json
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StubServer(object):
+    u"""Serves canned responses on 127.0.0.1.
+
+    Args:
+        handler: A callable (method, path, headers, body) -> (status, headers, body). By default every request
+        is answered with a small JSON document.
+        latency: Seconds to wait before answering each request.
+
+    """
+
+    def __init__(self, handler=None, latency=0):
+        self.handler = handler or self.default_handler
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((u'127.0.0.1', 0), self._make_handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        return u'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+
+    @staticmethod
+    def default_handler(method, path, headers, body):
+        return 200, {u'Content-Type': u'application/json'}, json.dumps({u'id': u'stub', u'path': path})
+
+    def _make_handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = u'HTTP/1.1'
+            # Buffer the status line and headers so each response goes out in one segment.
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get(u'Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, headers, payload = stub.handler(self.command, self.path, self.headers, body)
+                if not isinstance(payload, bytes):
+                    payload = payload.encode(u'utf-8')
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header(u'Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
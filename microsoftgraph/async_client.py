@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+import threading
+from Queue import Full
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from microsoftgraph.client import Client
+
+
+class AsyncClient(object):
+    u"""Non-blocking version of Client.
+
+    Exposes the same methods as Client, but the API calls (mail, calendar, OneNote, Outlook, OneDrive, Excel,
+    exchange_code and refresh_token) return a concurrent.futures.Future right away and run on a bounded pool of
+    worker threads sharing one pooled HTTP session. The futures hold the parsed response or the exception raised
+    by Client._parse. On Python 3 they can be awaited with asyncio.wrap_future.
+
+    Args:
+        client_id: The application id.
+        client_secret: The application secret.
+        max_workers: Number of requests running at the same time. It also sizes the connection pool.
+        max_pending: Number of calls waiting or running beyond which submit() raises Queue.Full instead of
+        queuing the call, None (the default) to queue every call. The caller is never blocked.
+        kwargs: Other Client arguments.
+
+    """
+    SYNC_METHODS = frozenset([u'authorization_url', u'set_token', u'manage_token', u'batch', u'iter', u'map',
+                              u'workbook_session', u'create_pages', u'excel_read_values', u'close'])
+
+    def __init__(self, client_id, client_secret, max_workers=10, max_pending=None, **kwargs):
+        kwargs.setdefault(u'pool_maxsize', max_workers)
+        self.client = Client(client_id, client_secret, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_pending = max_pending
+        self._semaphore = threading.BoundedSemaphore(max_pending) if max_pending is not None else None
+
+    def __getattr__(self, name):
+        if name == u'client':
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if name.startswith(u'_') or name in self.SYNC_METHODS or not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def method(*args, **kwargs):
+            return self.submit(attr, *args, **kwargs)
+
+        return method
+
+    def submit(self, fn, *args, **kwargs):
+        u"""Runs fn(*args, **kwargs) on the worker threads.
+
+        Returns:
+            A concurrent.futures.Future.
+
+        Raises:
+            Queue.Full: If max_pending calls are already waiting or running.
+
+        """
+        if self._semaphore is None:
+            return self._executor.submit(fn, *args, **kwargs)
+        # Never wait for room: blocking here would stall the event loop of an asyncio caller.
+        if not self._semaphore.acquire(False):
+            raise Full(u'{} calls are already pending.'.format(self._max_pending))
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(lambda f: self._semaphore.release())
+        return future
+
+    def close(self):
+        u"""Waits for the pending calls and closes the pooled connections."""
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,228 @@
+from __future__ import absolute_import
+import itertools
+import re
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib import urlencode
+from urlparse import urlparse, urlunparse
+
+from microsoftgraph import exceptions
+
+
+class BatchRequest(object):
+    __slots__ = (u'id', u'method', u'endpoint', u'url', u'headers', u'body', u'depends_on', u'future', u'attempts')
+
+    def __init__(self, id, method, endpoint, url, headers, body, depends_on):
+        self.id = id
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.depends_on = depends_on
+        self.future = Future()
+        self.attempts = 0
+
+    def to_json(self, ids_in_chunk):
+        data = {u'id': self.id, u'method': self.method, u'url': self.url}
+        if self.headers:
+            data[u'headers'] = self.headers
+        if self.body is not None:
+            data[u'body'] = self.body
+        depends_on = [request.id for request in self.depends_on if request.id in ids_in_chunk]
+        if depends_on:
+            data[u'dependsOn'] = depends_on
+        return data
+
+
+class Batch(object):
+    u"""Collects the calls made through a Client and sends them as JSON batch requests.
+
+    Inside a `with client.batch() as b:` block every Client method called from the same thread (either on the
+    client or on `b`) returns a concurrent.futures.Future instead of sending a request. The collected requests are
+    sent in groups of at most MAX_SIZE when the block exits (or when flush() is called), and each future receives
+    the parsed body of its sub-response or the exception that Client._parse would have raised for it.
+
+    Args:
+        client: The Client whose calls are batched.
+        max_size: Number of sub-requests per $batch request, 20 at most.
+        max_retries: How many times a sub-request answered with 429 or 503 is sent again.
+        retry_after: Seconds to wait before a retry when the sub-responses carry no Retry-After header.
+        max_retry_after: Upper bound of the wait between two retries.
+
+    """
+    MAX_SIZE = 20
+    RETRY_STATUS_CODES = (429, 503)
+
+    def __init__(self, client, max_size=MAX_SIZE, max_retries=3, retry_after=1, max_retry_after=60):
+        if not 0 < max_size <= self.MAX_SIZE:
+            raise ValueError(u'max_size must be between 1 and {}'.format(self.MAX_SIZE))
+        self.client = client
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self._pending = []
+        self._depends_on = []
+        self._requests = {}
+        self._ids = itertools.count(1)
+
+    def __enter__(self):
+        if getattr(self.client._local, u'batch', None) is not None:
+            raise RuntimeError(u'A batch is already active for this client in this thread.')
+        self.client._local.batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.client._local.batch = None
+        if exc_type is None:
+            self.flush()
+        else:
+            for request in self._pending:
+                request.future.cancel()
+            self._pending = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @contextmanager
+    def depends_on(self, *futures):
+        u"""Makes the calls done inside the block run after the requests behind the given futures.
+
+        Args:
+            futures: Futures returned by earlier calls in this batch.
+
+        """
+        requests = []
+        for future in futures:
+            request = self._requests.get(id(future))
+            if request is None:
+                raise ValueError(u'The future does not belong to this batch.')
+            requests.append(request)
+        previous = self._depends_on
+        self._depends_on = previous + requests
+        try:
+            yield self
+        finally:
+            self._depends_on = previous
+
+    def add(self, method, url, headers=None, params=None, json=None, **kwargs):
+        u"""Queues a request and returns the future of its result.
+
+        Args:
+            method: The HTTP method.
+            url: The absolute url, as built by the Client methods.
+            headers: Extra headers of the sub-request.
+            params: Query string parameters.
+            json: The JSON body.
+
+        Returns:
+            A concurrent.futures.Future.
+
+        """
+        kwargs.pop(u'timeout', None)
+        if kwargs:
+            raise ValueError(u'Requests using {} cannot be batched.'.format(u', '.join(sorted(kwargs))))
+        endpoint, relative_url = self._split_url(url, params)
+        if self.client.cache is not None and method.upper() != u'GET':
+            self.client.cache.invalidate(url)
+        headers = dict(headers or {})
+        if json is not None:
+            headers.setdefault(u'Content-Type', u'application/json')
+        request = BatchRequest(str(next(self._ids)), method, endpoint, relative_url, headers, json,
+                               list(self._depends_on))
+        self._pending.append(request)
+        self._requests[id(request.future)] = request
+        return request.future
+
+    def flush(self):
+        u"""Sends every queued request and resolves their futures."""
+        pending, self._pending = self._pending, []
+        previous, self.client._local.batch = getattr(self.client._local, u'batch', None), None
+        try:
+            for chunk in self._chunks(pending):
+                self._send(chunk)
+        finally:
+            self.client._local.batch = previous
+
+    def _chunks(self, requests):
+        chunk = []
+        for request in requests:
+            if chunk and (len(chunk) == self.max_size or chunk[0].endpoint != request.endpoint):
+                yield chunk
+                chunk = []
+            chunk.append(request)
+        if chunk:
+            yield chunk
+
+    def _send(self, chunk):
+        while chunk:
+            ready = []
+            for request in chunk:
+                if any(dependency.future.exception() is not None if dependency.future.done() else
+                       dependency not in chunk for dependency in request.depends_on):
+                    request.future.set_exception(exceptions.FailedDependency(
+                        u'Request {} depends on a failed request.'.format(request.id)))
+                else:
+                    ready.append(request)
+            if not ready:
+                return
+            ids = set(request.id for request in ready)
+            try:
+                response = self.client._post(ready[0].endpoint,
+                                             json={u'requests': [request.to_json(ids) for request in ready]})
+            except Exception as e:
+                for request in ready:
+                    request.future.set_exception(e)
+                return
+            chunk, wait = self._resolve(ready, response.get(u'responses', []))
+            if chunk:
+                time.sleep(wait)
+
+    def _resolve(self, requests, responses):
+        by_id = dict((response[u'id'], response) for response in responses)
+        retry, wait = [], 0
+        for request in requests:
+            response = by_id.get(request.id, {u'status': 500, u'body': u'Missing sub-response.'})
+            status = response.get(u'status')
+            self.client._note_status(status)
+            if self.client.cache is not None and request.method.upper() != u'GET':
+                # A GET cached while the batch was sent may predate the write.
+                self.client.cache.invalidate(request.endpoint[:-len(u'$batch')] + request.url.lstrip(u'/'))
+            if request.attempts < self.max_retries and (
+                    status in self.RETRY_STATUS_CODES or
+                    (status == 424 and any(dependency in retry for dependency in request.depends_on))):
+                request.attempts += 1
+                retry.append(request)
+                wait = max(wait, self._retry_after(response, request.attempts))
+                continue
+            try:
+                request.future.set_result(self.client._check_status(status, response.get(u'body')))
+            except exceptions.BaseError as e:
+                request.future.set_exception(e)
+        return retry, min(wait, self.max_retry_after)
+
+    def _retry_after(self, response, attempts):
+        headers = dict((key.lower(), value) for key, value in (response.get(u'headers') or {}).items())
+        try:
+            return float(headers[u'retry-after'])
+        except (KeyError, ValueError):
+            return self.retry_after * 2 ** (attempts - 1)
+
+    @staticmethod
+    def _split_url(url, params):
+        parsed = urlparse(url)
+        segments = [segment for segment in parsed.path.split(u'/') if segment]
+        if not segments:
+            raise ValueError(u'Cannot batch a request to {}'.format(url))
+        endpoint = urlunparse((parsed.scheme, parsed.netloc, u'/{}/$batch'.format(segments[0]), u'', u'', u''))
+        relative_url = re.sub(u'/+', u'/', u'/' + u'/'.join(segments[1:]))
+        query = parsed.query
+        if params:
+            encoded = urlencode([(key, value.encode(u'utf-8') if isinstance(value, unicode) else value)
+                                 for key, value in sorted(params.items())])
+            query = query + u'&' + encoded if query else encoded
+        if query:
+            relative_url += u'?' + query
+        return endpoint, relative_url
@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+import hashlib
+import json
+import threading
+import time
+from urlparse import urlparse
+
+from microsoftgraph.stores import MemoryStore
+
+
+def resource_path(url):
+    u"""Returns the resource of a Graph url: its path without the API version, e.g. me/contactfolders/1."""
+    segments = [segment for segment in urlparse(url).path.lower().split(u'/') if segment]
+    return u'/'.join(segments[1:])
+
+
+class ResponseCache(object):
+    u"""Caches GET responses of Client._request and revalidates them with their ETag.
+
+    A response is served from the cache for `ttl` seconds. After that, if it had an ETag, the request is sent
+    with If-None-Match and a 304 response reuses the cached body. Requests differing by their query parameters or
+    by the headers given by the caller are cached apart. A PUT, POST, PATCH or DELETE on a resource drops
+    the cached responses of that resource, of its children and of its parent collection, both before it is sent and
+    once it is answered.
+
+    Args:
+        store: Where the responses are kept: MemoryStore(max_size=1024) by default, or a FileStore/SQLiteStore
+        from microsoftgraph.stores to keep them on disk.
+        ttl: Seconds during which a response is served without any request.
+
+    """
+
+    def __init__(self, store=None, ttl=60):
+        self.store = store if store is not None else MemoryStore(max_size=1024)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        # Index of the cached keys by resource, and of the resources by ancestor, so that a write finds the
+        # responses to drop without listing the store. A persistent store is listed once, here.
+        self._keys = {}
+        self._descendants = {}
+        self._indexed = 0
+        self._rebuild_at = 0
+        self._rebuild_index()
+
+    def key(self, access_token, method, url, params, headers=None):
+        u"""Returns the key of a request. The headers given by the caller, like Prefer, ConsistencyLevel or
+        workbook-session-id, change the response and are part of it."""
+        identity = hashlib.sha1(access_token.encode(u'utf-8')).hexdigest()
+        headers = sorted((name.lower(), value) for name, value in (headers or {}).items())
+        digest = hashlib.sha1(json.dumps([identity, method, url, sorted((params or {}).items()),
+                                          headers])).hexdigest()
+        return u'{}|{}'.format(resource_path(url), digest)
+
+    def get(self, key):
+        u"""Returns (fresh, entry or None): the entry can be served as is while it is fresh, otherwise only after a
+        304 to its ETag. Client._cached_result decodes its body like a response."""
+        entry = self.store.get(key)
+        if entry is None:
+            self._count(u'misses')
+            return False, None
+        if entry[u'expires'] > time.time():
+            self._count(u'hits')
+            return True, entry
+        if not entry[u'etag']:
+            self._count(u'misses')
+        return False, entry
+
+    def revalidate(self, key, entry):
+        u"""Makes an entry confirmed by a 304 response fresh again."""
+        self._count(u'revalidated')
+        entry[u'expires'] = time.time() + self.ttl
+        self.store.set(key, entry)
+
+    def set(self, key, response):
+        u"""Caches a 200 response."""
+        if response.status_code != 200:
+            return
+        self.store.set(key, {
+            u'expires': time.time() + self.ttl,
+            u'etag': response.headers.get(u'ETag'),
+            u'content_type': response.headers.get(u'Content-Type', u''),
+            u'text': response.text,
+        })
+        with self._lock:
+            self._index(key)
+            # Keys evicted by the store stay indexed until their resource is written: rebuild the index from the
+            # store once it has doubled, which keeps its size bounded at an amortized constant cost.
+            if self._indexed > self._rebuild_at:
+                self._rebuild_index()
+
+    def invalidate(self, url):
+        u"""Drops the cached responses of the resource of url, of its children and of its parent."""
+        resource = resource_path(url)
+        with self._lock:
+            resources = self._descendants.pop(resource, set())
+            resources.update((resource, resource.rpartition(u'/')[0]))
+            keys = []
+            for name in resources:
+                indexed = self._keys.pop(name, ())
+                self._indexed -= len(indexed)
+                keys.extend(indexed)
+        for key in keys:
+            self.store.delete(key)
+
+    def _index(self, key):
+        resource = key.rpartition(u'|')[0]
+        keys = self._keys.setdefault(resource, set())
+        if key in keys:
+            return
+        keys.add(key)
+        self._indexed += 1
+        ancestor = resource
+        while u'/' in ancestor:
+            ancestor = ancestor.rpartition(u'/')[0]
+            self._descendants.setdefault(ancestor, set()).add(resource)
+
+    def _rebuild_index(self):
+        self._keys, self._descendants, self._indexed = {}, {}, 0
+        for key in self.store.keys():
+            self._index(key)
+        self._rebuild_at = max(1024, 2 * self._indexed)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @property
+    def stats(self):
+        u"""A dict with the number of hits, misses and 304 revalidations."""
+        with self._lock:
+            return {u'hits': self.hits, u'misses': self.misses, u'revalidated': self.revalidated}
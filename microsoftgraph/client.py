@@ -1,11 +1,23 @@
 from __future__ import absolute_import
-import base64
-import mimetypes
 import requests
 import json
-from microsoftgraph import exceptions
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from microsoftgraph import decoding, excel, exceptions, mail, onenote
+from microsoftgraph.batch import Batch
+from microsoftgraph.compression import ACCEPT_ENCODING, TransferStats, compress_json
+from microsoftgraph.fanout import THROTTLE_STATUS_CODES, FanOut
+from microsoftgraph.hooks import RequestInfo, url_template
+from microsoftgraph.paging import PageIterator
+from microsoftgraph.query import Query, project
+from microsoftgraph.ratelimit import resource_family
+from microsoftgraph.retry import RetryPolicy
+from microsoftgraph.tokens import TokenManager
+from microsoftgraph.upload import DEFAULT_CHUNK_SIZE, upload_large_file
 from microsoftgraph.decorators import token_required
-from urllib import urlencode, quote_plus
+from microsoftgraph.download import DEFAULT_SEGMENT_SIZE, download_item
+from urllib import urlencode, quote, quote_plus
 from io import open
 from urlparse import urlparse
 
@@ -20,7 +32,53 @@ class Client(object):
     OFFICE365_AUTH_ENDPOINT = u'/oauth20_authorize.srf?'
     OFFICE365_TOKEN_ENDPOINT = u'/oauth20_token.srf'
 
-    def __init__(self, client_id, client_secret, api_version=u'v1.0', account_type=u'common', office365=False):
+    def __init__(self, client_id, client_secret, api_version=u'v1.0', account_type=u'common', office365=False,
+                 session=None, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 timeout=None, retry_policy=None, rate_limiter=None, rate_limit_account=None, cache=None,
+                 single_flight=None, hooks=None, json_decoder=None, compact=False, projections=None,
+                 strict_projection=False, compress_request_size=None, transport=None):
+        u"""
+
+        Args:
+            client_id: The application id.
+            client_secret: The application secret.
+            api_version: The Graph API version used to build base_url.
+            account_type: The tenant used in the authority url ('common' by default).
+            office365: True to use the Office 365 (login.live.com) endpoints and token.
+            session: An optional requests.Session to reuse, e.g. shared between several clients. When given, the
+            pool arguments are ignored.
+            pool_connections: Number of per-host connection pools to cache.
+            pool_maxsize: Maximum number of connections kept alive per host. Use at least the number of threads
+            sharing this client.
+            pool_block: If True, threads wait for a free connection instead of opening a throwaway one when the
+            pool is exhausted.
+            keep_alive: If False, every connection is closed after its response.
+            timeout: Default timeout for every request, as seconds or a (connect, read) tuple.
+            retry_policy: The RetryPolicy applied to 429, 503 and 504 responses. Defaults to RetryPolicy(), use
+            RetryPolicy(max_retries=0) to disable the retries.
+            rate_limiter: An optional microsoftgraph.ratelimit.RateLimiter pacing every request. It can be shared
+            between clients.
+            rate_limit_account: The account part of the rate limiter keys, account_type by default. Use the tenant
+            or the mailbox the client works for.
+            cache: An optional microsoftgraph.cache.ResponseCache for the GET requests.
+            single_flight: An optional microsoftgraph.singleflight.SingleFlight. Identical GET requests sent at the
+            same time from several threads then share one request and one (read-only) result.
+            hooks: Objects called around every HTTP request, see microsoftgraph.hooks (LatencyHistogram,
+            RequestCounters, CorrelationLog, OpenTelemetryHook or your own Hook subclass).
+            json_decoder: The JSON decoder of the responses: 'orjson', 'ujson', 'json', a callable, or None for the
+            fastest one installed.
+            compact: If True, the items of collection pages are returned as read-only, dict-like
+            microsoftgraph.decoding.Item objects, which take much less memory than dicts.
+            projections: A dict of the properties selected by default per endpoint template (e.g.
+            {u'me/messages/{id}': [u'id', u'subject']}), on top of microsoftgraph.query.DEFAULT_PROJECTIONS. They
+            apply to the GET requests without $select.
+            strict_projection: If True, a GET request that selects nothing issues a ProjectionWarning.
+            compress_request_size: If set, the json bodies of POST, PUT and PATCH requests of at least this many
+            bytes are sent gzipped. An endpoint answering 400 or 415 to a gzipped body gets plain bodies from then on.
+            transport: The object sending the HTTP requests, with the signature of requests.Session.request. The
+            session by default; use a microsoftgraph.replay.ReplayTransport to work offline.
+
+        """
         self.client_id = client_id
         self.client_secret = client_secret
         self.api_version = api_version
@@ -31,6 +89,145 @@ class Client(object):
         self.office365 = office365
         self.office365_token = None
 
+        self._local = threading.local()
+        self.timeout = timeout
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.rate_limit_account = rate_limit_account or account_type
+        self.token_manager = None
+        self.cache = cache
+        self.single_flight = single_flight
+        self.hooks = list(hooks or [])
+        self.json_decoder = decoding.get_decoder(json_decoder)
+        self.compact = compact
+        self.projections = dict(projections or {})
+        self.strict_projection = strict_projection
+        self.compress_request_size = compress_request_size
+        self.transfer = TransferStats()
+        # Endpoints known to refuse, or to accept, gzipped request bodies.
+        self._uncompressible = set()
+        self._compressible = set()
+        self.workbook_sessions = excel.WorkbookSessionPool(self)
+        if session is None:
+            session = self._create_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+        self.session = session
+        self.transport = transport if transport is not None else session
+
+    @staticmethod
+    def _create_session(pool_connections, pool_maxsize, pool_block, keep_alive):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        session.mount(u'https://', adapter)
+        session.mount(u'http://', adapter)
+        if not keep_alive:
+            session.headers[u'Connection'] = u'close'
+        return session
+
+    def close(self):
+        u"""Closes the pooled connections of this client."""
+        self.session.close()
+
+    def batch(self, **kwargs):
+        u"""Groups the calls made inside a with block into JSON batch requests.
+
+        Example:
+            with client.batch() as b:
+                futures = [b.get_message(message_id) for message_id in message_ids]
+            messages = [future.result() for future in futures]
+
+        Args:
+            kwargs: Options of microsoftgraph.batch.Batch (max_size, max_retries, retry_after, max_retry_after).
+
+        Returns:
+            A Batch.
+
+        """
+        return Batch(self, **kwargs)
+
+    def workbook_session(self, item_id, persist_changes=True):
+        u"""Runs the Excel calls on a workbook inside one workbook session.
+
+        Within the with block, every request on the workbook of item_id (from any thread) carries the
+        workbook-session-id header. Threads working on the same workbook share one session per persist_changes
+        value, which is refreshed in the background and closed when the last of them leaves its block. A thread
+        uses the session of its own block; threads outside of any block use the persistent session if there is one.
+
+        Example:
+            with client.workbook_session(item_id):
+                client.excel_add_row(item_id, worksheet_id, table_id, json={'values': [[1, 2]]})
+
+        Args:
+            item_id: The drive item id of the workbook.
+            persist_changes: False to discard the changes when the session is closed.
+
+        Returns:
+            A context manager giving the session id.
+
+        """
+        return self.workbook_sessions.session(item_id, persist_changes)
+
+    def iter(self, method, *args, **kwargs):
+        u"""Iterates over every item of a collection, following @odata.nextLink lazily.
+
+        Example:
+            for contact in client.iter(client.outlook_get_me_contacts, page_size=100, max_items=1000):
+                ...
+
+        Args:
+            method: A Client method returning a collection, or its name.
+            args: Positional arguments of the method.
+            page_size: Number of items per page, sent as $top. The method must accept params.
+            max_items: Stop after this many items.
+            prefetch: If True, the next page is fetched while the current one is consumed.
+            kwargs: Keyword arguments of the method.
+
+        Returns:
+            A PageIterator, use its pages() method to get whole pages instead of items.
+
+        """
+        page_size = kwargs.pop(u'page_size', None)
+        max_items = kwargs.pop(u'max_items', None)
+        prefetch = kwargs.pop(u'prefetch', False)
+        if not callable(method):
+            method = getattr(self, method)
+        if page_size and isinstance(kwargs.get(u'params'), Query):
+            kwargs[u'params'] = kwargs[u'params'].top(page_size)
+        elif page_size:
+            kwargs[u'params'] = dict(kwargs.get(u'params') or {}, **{u'$top': page_size})
+        return PageIterator(self, lambda: method(*args, **kwargs), max_items=max_items, prefetch=prefetch)
+
+    def map(self, method, items, max_workers=8, ordered=True, on_progress=None, adaptive=True, **kwargs):
+        u"""Calls a method once per item, max_workers calls at a time.
+
+        Example:
+            for result in client.map(client.get_message, message_ids, max_workers=16):
+                if result.ok:
+                    print(result.value[u'subject'])
+                else:
+                    print(result.item, result.exception)
+
+        Args:
+            method: A Client method, its name, or any callable using the client.
+            items: An iterable of arguments: a tuple item is passed as positional arguments.
+            max_workers: Maximum number of calls in flight.
+            ordered: If True, the results come in input order, otherwise as soon as they complete.
+            on_progress: A callable receiving (done, failed) after each completed call.
+            adaptive: If True, fewer calls run at the same time while Graph throttles them.
+            kwargs: Keyword arguments of every call.
+
+        Returns:
+            A FanOut, iterate over it to get a Result (item, value, exception) per item.
+
+        """
+        return FanOut(self, method, items, kwargs, max_workers=max_workers, ordered=ordered,
+                      on_progress=on_progress, adaptive=adaptive)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def authorization_url(self, redirect_uri, scope, state=None):
         u"""
 
@@ -88,10 +285,12 @@ class Client(object):
             u'grant_type': u'authorization_code',
         }
         if self.office365:
-            response = requests.post(self.OFFICE365_AUTHORITY_URL + self.OFFICE365_TOKEN_ENDPOINT, data=data)
+            response = self.transport.request(u'POST', self.OFFICE365_AUTHORITY_URL + self.OFFICE365_TOKEN_ENDPOINT,
+                                              data=data, timeout=self.timeout)
         else:
-            response = requests.post(self.AUTHORITY_URL + self.account_type + self.TOKEN_ENDPOINT, data=data)
-        return self._parse(response)
+            response = self.transport.request(u'POST', self.AUTHORITY_URL + self.account_type + self.TOKEN_ENDPOINT,
+                                              data=data, timeout=self.timeout)
+        return self._parse_token(response)
 
     def refresh_token(self, redirect_uri, refresh_token):
         u"""
@@ -116,10 +315,35 @@ class Client(object):
             u'grant_type': u'refresh_token',
         }
         if self.office365:
-            response = requests.post(self.OFFICE365_AUTHORITY_URL + self.OFFICE365_TOKEN_ENDPOINT, data=data)
+            response = self.transport.request(u'POST', self.OFFICE365_AUTHORITY_URL + self.OFFICE365_TOKEN_ENDPOINT,
+                                              data=data, timeout=self.timeout)
         else:
-            response = requests.post(self.AUTHORITY_URL + self.account_type + self.TOKEN_ENDPOINT, data=data)
-        return self._parse(response)
+            response = self.transport.request(u'POST', self.AUTHORITY_URL + self.account_type + self.TOKEN_ENDPOINT,
+                                              data=data, timeout=self.timeout)
+        return self._parse_token(response)
+
+    def _parse_token(self, response):
+        token = self._parse(response)
+        if isinstance(token, dict) and u'expires_in' in token:
+            token[u'expires_at'] = time.time() + int(token[u'expires_in'])
+        return token
+
+    def manage_token(self, redirect_uri, margin=300, background=False, on_refresh=None):
+        u"""Refreshes the token automatically shortly before it expires, and once after a 401 response.
+
+        Args:
+            redirect_uri: The redirect_uri used to get the token.
+            margin: Seconds before the expiry at which the token is refreshed.
+            background: If True, a daemon thread refreshes the token even when the client is idle.
+            on_refresh: A callable receiving every new token, e.g. to persist it.
+
+        Returns:
+            The TokenManager.
+
+        """
+        self.token_manager = TokenManager(self, redirect_uri, margin=margin, background=background,
+                                          on_refresh=on_refresh)
+        return self.token_manager
 
     def set_token(self, token):
         u"""Sets the Token for its use in this library.
@@ -285,19 +509,104 @@ class Client(object):
         """
         return self._get(self.base_url + u'/me/onenote/pages', params=params)
 
+    @token_required
+    def list_section_pages(self, section_id, params=None):
+        u"""Retrieve the pages of a section.
+
+        Args:
+            section_id:
+            params:
+
+        Returns:
+            A dict.
+
+        """
+        return self._get(self.base_url + u'me/onenote/sections/{}/pages'.format(section_id), params=params)
+
+    @token_required
+    def get_page_content(self, page_id, params=None):
+        u"""Retrieve the HTML content of a page. Its images and attachments are links to onenote resources.
+
+        Args:
+            page_id:
+            params:
+
+        Returns:
+            A str, the HTML.
+
+        """
+        return self._get(self.base_url + u'me/onenote/pages/{}/content'.format(page_id), params=params)
+
+    @token_required
+    def create_pages(self, pages, max_workers=4, ordered=True, on_progress=None):
+        u"""Create many pages, max_workers at a time, streaming their multipart bodies from disk.
+
+        A throttled creation is sent again after its Retry-After delay, and fewer pages are created at the same
+        time while Graph throttles them. Pages created concurrently may not keep their input order within a section.
+
+        Example:
+            pages = ((section_id, path, {u'image1': image_path}) for path, image_path in files)
+            for result in client.create_pages(pages, max_workers=4):
+                if not result.ok:
+                    print(result.item, result.exception)
+
+        Args:
+            pages: An iterable of (section_id, html_path) or (section_id, html_path, resources), resources being a
+                dict of part name (the name: referenced in the HTML) to a file path or a (path, content type).
+            max_workers: Maximum number of pages created at the same time.
+            ordered: If True, the results come in input order, otherwise as soon as they complete.
+            on_progress: A callable receiving (done, failed) after each page.
+
+        Returns:
+            A FanOut, iterate over it to get a Result per page, its value being the created page.
+
+        """
+        return self.map(lambda *page: onenote.create_page(self, *page), pages, max_workers=max_workers,
+                        ordered=ordered, on_progress=on_progress)
+
+    @token_required
+    def export_notebooks(self, directory, state_store=None, notebook_ids=None, max_workers=4, on_progress=None):
+        u"""Export the pages of notebooks, with their images and attachments, to a directory.
+
+        The sections of each notebook are walked page by page, and max_workers pages are exported at a time, their
+        resources being downloaded in parallel. Each page is written as it completes to
+        directory/notebook/section/page id/, as page.html with links to its local resources/ and page.json with
+        its metadata. The exported pages are recorded in state_store, so an interrupted export resumes with the
+        missing pages and a later one only fetches the pages modified since. Sections in section groups are not
+        exported. Only resources hosted by Graph are downloaded; links to other hosts are left as they are.
+
+        Args:
+            directory: The export directory.
+            state_store: A store from microsoftgraph.stores for the checkpoint, by default a SQLiteStore in the
+                directory.
+            notebook_ids: Export only these notebooks.
+            max_workers: Maximum number of pages and resources downloaded at the same time.
+            on_progress: A callable receiving (done, failed) after each page.
+
+        Returns:
+            A dict with the number of notebooks, sections, pages and resources exported, of pages skipped as
+            unchanged, and the (page id, exception) of the pages that failed.
+
+        """
+        return onenote.export_notebooks(self, directory, state_store=state_store, notebook_ids=notebook_ids,
+                                        max_workers=max_workers, on_progress=on_progress)
+
     # Calendar
     @token_required
-    def get_me_events(self):
+    def get_me_events(self, params=None):
         u"""Get a list of event objects in the user's mailbox. The list contains single instance meetings and
         series masters.
 
         Currently, this operation returns event bodies in only HTML format.
 
+        Args:
+            params: A dict.
+
         Returns:
             A dict.
 
         """
-        return self._get(self.base_url + u'me/events')
+        return self._get(self.base_url + u'me/events', params=params)
 
     @token_required
     def create_calendar_event(self, subject, content, start_datetime, start_timezone, end_datetime, end_timezone,
@@ -385,15 +694,21 @@ class Client(object):
 
     # Mail
     @token_required
-    def send_mail(self, subject=None, recipients=None, body=u'', content_type=u'HTML', attachments=None):
+    def send_mail(self, subject=None, recipients=None, body=u'', content_type=u'HTML', attachments=None,
+                  max_workers=4):
         u"""Helper to send email from current user.
 
+        Attachments are read and base64 encoded chunk by chunk while the request is sent. When they add up to more
+        than 3 MB, a draft is created instead, the attachments are added to it (through upload sessions for the
+        large ones, max_workers at a time) and the draft is sent.
+
         Args:
             subject: email subject (required)
             recipients: list of recipient email addresses (required)
             body: body of the message
             content_type: content type (default is 'HTML')
             attachments: list of file attachments (local filenames)
+            max_workers: number of attachments uploaded at the same time when a draft is used
 
         Returns:
             Returns the response from the POST to the sendmail API.
@@ -406,26 +721,13 @@ class Client(object):
         # Create recipient list in required format.
         recipient_list = [{u'EmailAddress': {u'Address': address}} for address in recipients]
 
-        # Create list of attachments in required format.
-        attached_files = []
-        if attachments:
-            for filename in attachments:
-                b64_content = base64.b64encode(open(filename, u'rb').read())
-                mime_type = mimetypes.guess_type(filename)[0]
-                mime_type = mime_type if mime_type else u''
-                attached_files.append(
-                    {u'@odata.type': u'#microsoft.graph.fileAttachment', u'ContentBytes': b64_content.decode(u'utf-8'),
-                     u'ContentType': mime_type, u'Name': filename})
-
         # Create email message in required format.
-        email_msg = {u'Message': {u'Subject': subject,
-                                 u'Body': {u'ContentType': content_type, u'Content': body},
-                                 u'ToRecipients': recipient_list,
-                                 u'Attachments': attached_files},
-                     u'SaveToSentItems': u'true'}
+        email_msg = {u'Subject': subject,
+                     u'Body': {u'ContentType': content_type, u'Content': body},
+                     u'ToRecipients': recipient_list}
 
-        # Do a POST to Graph's sendMail API and return the response.
-        return self._post(self.base_url + u'me/microsoft.graph.sendMail', json=email_msg)
+        # Stream the message and its attachments to Graph and return the response.
+        return mail.send_mail(self, email_msg, attachments or [], max_workers=max_workers)
 
     # Outlook
     @token_required
@@ -470,6 +772,91 @@ class Client(object):
         url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/children".format(folder_id)
         return self._get(url, params=params)
 
+    @token_required
+    def drive_get_item(self, item_id, params=None):
+        u"""Retrieve the metadata of a drive item, including its size, hashes and a short-lived download url.
+
+        Args:
+            item_id:
+            params: A dict.
+
+        Returns:
+            A dict.
+
+        """
+        url = u"{0}me/drive/items/{1}".format(self.base_url, item_id)
+        return self._get(url, params=params)
+
+    @token_required
+    def drive_download_item(self, item_id, destination, max_workers=1, segment_size=DEFAULT_SEGMENT_SIZE,
+                            verify=True, on_progress=None):
+        u"""Download the content of a drive item, streaming it in chunks instead of loading it in memory.
+
+        When destination is a path, the file is fetched with Range requests of segment_size bytes, max_workers
+        at a time, into destination + '.part'. The finished segments are recorded next to it so that an
+        interrupted download of the same item version resumes with the missing segments. A segment that does not
+        receive exactly its bytes raises IOError and is fetched again by the next call.
+
+        Args:
+            item_id:
+            destination: A file path, or a file-like object to which the content is streamed in one request.
+            max_workers: Number of segments downloaded at the same time.
+            segment_size: Bytes per Range request.
+            verify: If True, the sha256, sha1 or quickXor hash is checked against the item. The size always is.
+            on_progress: A callable receiving (downloaded bytes, total bytes).
+
+        Returns:
+            A dict, the item metadata.
+
+        """
+        return download_item(self, item_id, destination, max_workers=max_workers, segment_size=segment_size,
+                             verify=verify, on_progress=on_progress)
+
+    @token_required
+    def drive_create_upload_session(self, remote_path, parent_id=None, **kwargs):
+        u"""Create an upload session to upload a file of any size.
+
+        Args:
+            remote_path: The file path, relative to the drive root or to parent_id.
+            parent_id: The id of the parent folder.
+
+        Returns:
+            A dict with the uploadUrl.
+
+        """
+        remote_path = quote(remote_path.encode(u'utf-8'))
+        if parent_id is None:
+            url = u"{0}me/drive/root:/{1}:/createUploadSession".format(self.base_url, remote_path)
+        else:
+            url = u"{0}me/drive/items/{1}:/{2}:/createUploadSession".format(self.base_url, parent_id, remote_path)
+        return self._post(url, **kwargs)
+
+    @token_required
+    def drive_upload_large_file(self, path, remote_path, parent_id=None, conflict_behavior=u'rename',
+                                chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1, state_store=None, on_progress=None):
+        u"""Upload a local file through an upload session, streaming it from disk one chunk at a time.
+
+        If a state_store is given, the upload session is saved in it and an interrupted upload of the same file
+        resumes from the ranges the server has not acknowledged yet.
+
+        Args:
+            path: The local file.
+            remote_path: The file path, relative to the drive root or to parent_id.
+            parent_id: The id of the parent folder.
+            conflict_behavior: fail, replace or rename.
+            chunk_size: Bytes per request, a multiple of 320 KiB.
+            max_workers: Number of ranges uploaded at the same time.
+            state_store: A store from microsoftgraph.stores keeping the upload sessions.
+            on_progress: A callable receiving (uploaded bytes, total bytes).
+
+        Returns:
+            A dict, the created driveItem.
+
+        """
+        return upload_large_file(self, path, remote_path, parent_id=parent_id, conflict_behavior=conflict_behavior,
+                                 chunk_size=chunk_size, max_workers=max_workers, state_store=state_store,
+                                 on_progress=on_progress)
+
     @token_required
     def drive_create_session(self, item_id, **kwargs):
         url = u"https://graph.microsoft.com/v1.0/me/drive/items/{0}/workbook/createSession".format(item_id)
@@ -558,15 +945,65 @@ class Client(object):
     #     return self._patch(url, **kwargs)
 
     @token_required
-    def excel_get_range(self, item_id, worksheets_id, **kwargs):
-        url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/workbook/worksheets/{1}/range(address='A1:B2')".format(item_id, quote_plus(worksheets_id))
+    def excel_get_range(self, item_id, worksheets_id, address=u'A1:B2', **kwargs):
+        url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/workbook/worksheets/{1}/range(address='{2}')".format(item_id, quote_plus(worksheets_id), address)
         return self._get(url, **kwargs)
 
     @token_required
-    def excel_update_range(self, item_id, worksheets_id, **kwargs):
-        url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/workbook/worksheets/{1}/range(address='A1:B2')".format(item_id, quote_plus(worksheets_id))
+    def excel_update_range(self, item_id, worksheets_id, address=u'A1:B2', **kwargs):
+        url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/workbook/worksheets/{1}/range(address='{2}')".format(item_id, quote_plus(worksheets_id), address)
         return self._patch(url, **kwargs)
 
+    @token_required
+    def excel_get_used_range(self, item_id, worksheets_id, values_only=False, **kwargs):
+        url = u"https://graph.microsoft.com/beta/me/drive/items/{0}/workbook/worksheets/{1}/usedRange(valuesOnly={2})".format(item_id, quote_plus(worksheets_id), u'true' if values_only else u'false')
+        return self._get(url, **kwargs)
+
+    @token_required
+    def excel_write_values(self, item_id, worksheets_id, values, start_cell=u'A1', max_cells=excel.DEFAULT_MAX_CELLS,
+                           max_workers=4, session_id=None, max_bytes=excel.DEFAULT_MAX_BYTES):
+        u"""Write a 2-D block of values of any size, starting at start_cell.
+
+        The block is split into rectangular ranges of at most max_cells cells and max_bytes bytes of JSON body,
+        written max_workers at a time within one workbook session.
+
+        Args:
+            item_id:
+            worksheets_id:
+            values: A list of rows (lists of the same length) or a 2-D NumPy array.
+            start_cell: The top left cell, e.g. 'B2'.
+            max_cells: Maximum number of cells per request.
+            max_workers: Number of requests sent at the same time.
+            session_id: An existing workbook session id. By default a session is created and closed.
+            max_bytes: Maximum size of a request body, below the 4 MB Graph accepts. A row larger than that is
+                written in several ranges.
+
+        Returns:
+            A list of the updated ranges.
+
+        """
+        return excel.write_values(self, item_id, worksheets_id, values, start_cell=start_cell, max_cells=max_cells,
+                                  max_workers=max_workers, session_id=session_id, max_bytes=max_bytes)
+
+    @token_required
+    def excel_read_values(self, item_id, worksheets_id, address=None, block_rows=excel.DEFAULT_BLOCK_ROWS,
+                          session_id=None):
+        u"""Iterate over the rows of a range, fetching them block_rows rows at a time.
+
+        Args:
+            item_id:
+            worksheets_id:
+            address: The range to read, e.g. 'A1:F100000'. Defaults to the used range of the worksheet.
+            block_rows: Number of rows per request.
+            session_id: An existing workbook session id. By default a session is created and closed.
+
+        Returns:
+            A generator of rows.
+
+        """
+        return excel.read_values(self, item_id, worksheets_id, address=address, block_rows=block_rows,
+                                 session_id=session_id)
+
     def _get(self, url, **kwargs):
         return self._request(u'GET', url, **kwargs)
 
@@ -583,27 +1020,201 @@ class Client(object):
         return self._request(u'DELETE', url, **kwargs)
 
     def _request(self, method, url, headers=None, **kwargs):
+        if method.upper() == u'GET':
+            kwargs[u'params'] = project(url, kwargs.get(u'params'), self.projections, self.strict_projection)
+        elif isinstance(kwargs.get(u'params'), Query):
+            kwargs[u'params'] = kwargs[u'params'].to_params()
+        session_id = self.workbook_sessions.session_id(url) if self.workbook_sessions.active else None
+        if session_id is not None:
+            session_headers = {u'workbook-session-id': session_id}
+            session_headers.update(headers or {})
+            headers = session_headers
+        batch = getattr(self._local, u'batch', None)
+        if batch is not None:
+            return batch.add(method, url, headers=headers, **kwargs)
         _headers = {
             u'Accept': u'application/json',
+            u'Accept-Encoding': ACCEPT_ENCODING,
         }
-        if self.office365:
-            _headers[u'Authorization'] = u'Bearer ' + self.office365_token[u'access_token']
-        else:
-            _headers[u'Authorization'] = u'Bearer ' + self.token[u'access_token']
+        access_token = self._access_token()
+        _headers[u'Authorization'] = u'Bearer ' + access_token
         if headers:
             _headers.update(headers)
         if u'files' not in kwargs:
             # If you use the 'files' keyword, the library will set the Content-Type to multipart/form-data
             # and will generate a boundary.
-            _headers[u'Content-Type'] = u'application/json'
-        return self._parse(requests.request(method, url, headers=_headers, **kwargs))
+            _headers.setdefault(u'Content-Type', u'application/json')
+        kwargs.setdefault(u'timeout', self.timeout)
+        cache_key = cache_entry = None
+        if self.cache is not None:
+            if method.upper() != u'GET':
+                self.cache.invalidate(url)
+            elif not kwargs.get(u'stream'):
+                cache_key = self.cache.key(access_token, method, url, kwargs.get(u'params'), headers)
+                fresh, cache_entry = self.cache.get(cache_key)
+                if fresh:
+                    return self._cached_result(cache_entry)
+                if cache_entry is not None and cache_entry[u'etag']:
+                    _headers[u'If-None-Match'] = cache_entry[u'etag']
+        if self.single_flight is not None and method.upper() == u'GET' and not kwargs.get(u'stream'):
+            params = kwargs.get(u'params')
+            key = (url, repr(sorted(params.items()) if isinstance(params, dict) else params),
+                   tuple(sorted(_headers.items())))
+            return self.single_flight.do(key, lambda: self._send(method, url, _headers, access_token, cache_key,
+                                                                 cache_entry, **kwargs))
+        if self.cache is not None and method.upper() != u'GET':
+            try:
+                return self._send(method, url, _headers, access_token, cache_key, cache_entry, **kwargs)
+            finally:
+                # A GET sent while the write was in flight may have cached the previous state.
+                self.cache.invalidate(url)
+        return self._send(method, url, _headers, access_token, cache_key, cache_entry, **kwargs)
+
+    def _send(self, method, url, _headers, access_token, cache_key, cache_entry, **kwargs):
+        can_retry = self.retry_policy.can_retry(method, kwargs)
+        attempt, start, token_refreshed = 0, time.time(), False
+        limit_key = (self.rate_limit_account, resource_family(url)) if self.rate_limiter is not None else None
+        original_json, body_size, refused_gzip = None, None, False
+        if self.compress_request_size is not None and kwargs.get(u'json') is not None and \
+                method.upper() in (u'POST', u'PUT', u'PATCH') and url_template(url) not in self._uncompressible:
+            data, body_size = compress_json(kwargs[u'json'], self.compress_request_size)
+            if data is not None:
+                original_json = kwargs.pop(u'json')
+                kwargs[u'data'] = data
+                _headers[u'Content-Encoding'] = u'gzip'
+        while True:
+            if limit_key is not None:
+                self.rate_limiter.acquire(limit_key)
+            info = None
+            if self.hooks:
+                info = RequestInfo(method, url, attempt, _headers.get(u'client-request-id'))
+                _headers[u'client-request-id'] = info.client_request_id
+                self._run_hooks(u'pre_request', info)
+            try:
+                response = self.transport.request(method, url, headers=_headers, **kwargs)
+            except Exception as e:
+                if info is not None:
+                    info.set_exception(e)
+                    self._run_hooks(u'on_exception', info)
+                raise
+            self._note_status(response.status_code)
+            if info is not None:
+                info.set_response(response, kwargs.get(u'stream', False))
+            if limit_key is not None:
+                self.rate_limiter.feedback(limit_key, response.status_code)
+            self._record_transfer(response, kwargs, body_size if original_json is not None else None)
+            if original_json is not None and response.status_code in (400, 415) and \
+                    url_template(url) not in self._compressible:
+                # The endpoint may not take gzipped bodies: send this one plain. A 415 says so, and the next bodies
+                # are sent plain too. A 400 may be a plain validation error, so the endpoint is only marked when
+                # the plain body is accepted.
+                response.close()
+                if response.status_code == 415:
+                    self._uncompressible.add(url_template(url))
+                else:
+                    refused_gzip = True
+                del kwargs[u'data'], _headers[u'Content-Encoding']
+                kwargs[u'json'], original_json = original_json, None
+                self._retried(info)
+                continue
+            if response.status_code < 400:
+                if original_json is not None:
+                    self._compressible.add(url_template(url))
+                elif refused_gzip:
+                    self._uncompressible.add(url_template(url))
+            if response.status_code == 401 and self.token_manager is not None and not token_refreshed:
+                # The token was revoked or expired early: refresh it once and send the request again.
+                response.close()
+                _headers[u'Authorization'] = u'Bearer ' + self.token_manager.invalidate(access_token)
+                if hasattr(kwargs.get(u'data'), u'seek'):
+                    kwargs[u'data'].seek(0)
+                token_refreshed = True
+                self._retried(info)
+                continue
+            delay = self.retry_policy.get_delay(response, attempt, time.time() - start) if can_retry else None
+            if delay is None:
+                if info is None:
+                    return self._result(response, cache_key, cache_entry)
+                parse_start = time.time()
+                try:
+                    return self._result(response, cache_key, cache_entry)
+                except Exception as e:
+                    info.exception = e
+                    raise
+                finally:
+                    info.parse_time = time.time() - parse_start
+                    self._run_hooks(u'post_response', info)
+                    if info.exception is not None:
+                        self._run_hooks(u'on_exception', info)
+            response.close()
+            self._retried(info)
+            time.sleep(delay)
+            attempt += 1
+
+    def _result(self, response, cache_key, cache_entry):
+        if cache_key is not None:
+            if response.status_code == 304 and cache_entry is not None:
+                self.cache.revalidate(cache_key, cache_entry)
+                return self._cached_result(cache_entry)
+            self.cache.set(cache_key, response)
+        return self._parse(response)
+
+    def _cached_result(self, entry):
+        # Decoded like _parse decodes a 200 response, so a call returns the same types from the cache.
+        if u'application/json' in entry[u'content_type']:
+            content = entry[u'text'].encode(u'utf-8')
+            return decoding.decode(self.json_decoder, content, self.compact) if content else None
+        return entry[u'text']
+
+    def _record_transfer(self, response, kwargs, body_size):
+        try:
+            wire_size = len(response.request.body or b'')
+        except TypeError:
+            # A body streamed from an iterator.
+            wire_size = 0
+        self.transfer.record_request(wire_size, body_size if body_size is not None else wire_size)
+        if not kwargs.get(u'stream'):
+            self.transfer.record_response(response)
+
+    def _note_status(self, status_code):
+        # Counts the throttled responses received by the call a FanOut runs in this thread, see FanOut._call.
+        if status_code in THROTTLE_STATUS_CODES:
+            throttled = getattr(self._local, u'throttled', None)
+            if throttled is not None:
+                self._local.throttled = throttled + 1
+
+    def _retried(self, info):
+        if info is not None:
+            info.retry = True
+            self._run_hooks(u'post_response', info)
+
+    def _run_hooks(self, name, info):
+        for hook in self.hooks:
+            callback = getattr(hook, name, None)
+            if callback is not None:
+                callback(info)
+
+    def _access_token(self):
+        if self.token_manager is not None:
+            return self.token_manager.get_access_token()
+        if self.office365:
+            return self.office365_token[u'access_token']
+        return self.token[u'access_token']
 
     def _parse(self, response):
         status_code = response.status_code
-        if u'application/json' in response.headers[u'Content-Type']:
-            r = response.json()
+        if u'application/json' in response.headers.get(u'Content-Type', u''):
+            content = response.content
+            r = decoding.decode(self.json_decoder, content, self.compact and status_code == 200) if content else None
         else:
             r = response.text
+        try:
+            return self._check_status(status_code, r)
+        except exceptions.BaseError as e:
+            e.response = response
+            raise
+
+    def _check_status(self, status_code, r):
         if status_code in (200, 201, 202):
             return r
         elif status_code == 204:
@@ -636,6 +1247,8 @@ class Client(object):
             raise exceptions.RequestedRangeNotSatisfiable(r)
         elif status_code == 422:
             raise exceptions.UnprocessableEntity(r)
+        elif status_code == 424:
+            raise exceptions.FailedDependency(r)
         elif status_code == 429:
             raise exceptions.TooManyRequests(r)
         elif status_code == 500:
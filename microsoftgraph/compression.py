@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+import json
+import threading
+import zlib
+
+ACCEPT_ENCODING = u'gzip, deflate'
+
+
+def gzip_bytes(data, level=6):
+    u"""Returns data compressed in the gzip format."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_json(document, min_size, level=6):
+    u"""Returns (gzipped body, size before compression) for a JSON document of at least min_size bytes, or
+    (None, size) when it is smaller."""
+    body = json.dumps(document)
+    if isinstance(body, unicode):
+        body = body.encode(u'utf-8')
+    if len(body) < min_size:
+        return None, len(body)
+    return gzip_bytes(body, level), len(body)
+
+
+class TransferStats(object):
+    u"""Counts the bytes sent and received by a Client, as they travel on the wire and once decoded.
+
+    Streamed responses (downloads) are not counted, their body being read by the caller.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.request_bytes = 0
+        self.request_body_bytes = 0
+        self.compressed_requests = 0
+        self.responses = 0
+        self.response_bytes = 0
+        self.response_body_bytes = 0
+        self.compressed_responses = 0
+
+    def record_request(self, wire_size, body_size):
+        with self._lock:
+            self.requests += 1
+            self.request_bytes += wire_size
+            self.request_body_bytes += body_size
+            if wire_size != body_size:
+                self.compressed_requests += 1
+
+    def record_response(self, response):
+        body_size = len(response.content or b'')
+        raw = response.raw
+        wire_size = raw.tell() if raw is not None and hasattr(raw, u'tell') else body_size
+        with self._lock:
+            self.responses += 1
+            self.response_bytes += wire_size
+            self.response_body_bytes += body_size
+            if response.headers.get(u'Content-Encoding', u'').lower() in (u'gzip', u'deflate'):
+                self.compressed_responses += 1
+
+    @property
+    def stats(self):
+        u"""A dict of the counters. The *_bytes counters are on the wire, the *_body_bytes ones decoded."""
+        with self._lock:
+            return {u'requests': self.requests, u'request_bytes': self.request_bytes,
+                    u'request_body_bytes': self.request_body_bytes, u'compressed_requests': self.compressed_requests,
+                    u'responses': self.responses, u'response_bytes': self.response_bytes,
+                    u'response_body_bytes': self.response_body_bytes,
+                    u'compressed_responses': self.compressed_responses}
@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+import json
+
+
+def _orjson():
+    import orjson
+    return orjson.loads
+
+
+def _ujson():
+    import ujson
+    return ujson.loads
+
+
+DECODERS = [
+    (u'orjson', _orjson),
+    (u'ujson', _ujson),
+    (u'json', lambda: json.loads),
+]
+
+
+def get_decoder(decoder=None):
+    u"""Returns a function decoding JSON bytes.
+
+    Args:
+        decoder: The name of a module of DECODERS (orjson, ujson or json), a callable, or None for the fastest
+        one installed.
+
+    """
+    if callable(decoder):
+        return decoder
+    for name, load in DECODERS:
+        if decoder is None or decoder == name:
+            try:
+                return load()
+            except ImportError:
+                if decoder is not None:
+                    raise
+    raise ValueError(u'Unknown JSON decoder: {}'.format(decoder))
+
+
+def decode(loads, content, compact_page=False):
+    u"""Decodes JSON bytes with loads.
+
+    Args:
+        loads: The decoder, see get_decoder.
+        content: The JSON bytes.
+        compact_page: If True, the result goes through compact().
+
+    """
+    result = loads(content)
+    return compact(result) if compact_page else result
+
+
+class Item(object):
+    u"""A read-only, dict-like collection item storing its values in a tuple.
+
+    The items of a page with the same properties share one field index, so an item costs a tuple instead of a
+    dict. Use to_dict() to get a regular dict.
+
+    """
+    __slots__ = (u'_fields', u'_values')
+
+    def __init__(self, fields, values):
+        self._fields = fields
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._fields[key]]
+
+    def get(self, key, default=None):
+        index = self._fields.get(key)
+        return default if index is None else self._values[index]
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        return sorted(self._fields, key=self._fields.get)
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return zip(self.keys(), self._values)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return self.to_dict() == (other.to_dict() if isinstance(other, Item) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return u'Item({!r})'.format(self.to_dict())
+
+
+def compact(page):
+    u"""Replaces the dict items of a collection page (its 'value' list) by Items. Other results are returned as is."""
+    value = page.get(u'value') if isinstance(page, dict) else None
+    if not isinstance(value, list):
+        return page
+    schemas = {}
+    items = []
+    for item in value:
+        if not isinstance(item, dict):
+            items.append(item)
+            continue
+        keys = tuple(item)
+        fields = schemas.get(keys)
+        if fields is None:
+            fields = schemas[keys] = dict((key, index) for index, key in enumerate(keys))
+        items.append(Item(fields, tuple(item.values())))
+    page[u'value'] = items
+    return page
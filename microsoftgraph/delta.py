@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+
+from microsoftgraph import exceptions
+from microsoftgraph.stores import MemoryStore
+
+
+class DeltaSync(object):
+    u"""Streams the changes of a collection through its /delta function, keeping the deltaLink between runs.
+
+    The first run of a resource returns every item; the next runs only return what changed since the previous
+    one. The deltaLink is saved once a run has been fully consumed, so a run stopped halfway is replayed. When
+    Graph answers 410 Gone (the deltaLink expired), the checkpoint is dropped and a full sync starts over.
+
+    Example:
+        sync = DeltaSync(client, SQLiteStore('sync.db', table='delta'))
+        for message in sync.changes(u'messages', folder=u'inbox'):
+            if u'@removed' in message:
+                ...
+
+    Args:
+        client: The Client used for the requests.
+        store: Where the deltaLinks are kept, a store from microsoftgraph.stores.
+        on_resync: A callable receiving the checkpoint key when a full sync starts over after a 410 Gone.
+
+    """
+    RESOURCES = {
+        u'messages': u'me/mailFolders/{folder}/messages/delta',
+        u'events': u'me/calendarView/delta',
+        u'contacts': u'me/contactFolders/{folder}/contacts/delta',
+        u'drive': u'me/drive/root/delta',
+    }
+
+    def __init__(self, client, store=None, on_resync=None):
+        self.client = client
+        self.store = store if store is not None else MemoryStore()
+        self.on_resync = on_resync
+
+    def changes(self, resource, key=None, params=None, page_size=None, **kwargs):
+        u"""Yields the items that changed since the last complete run.
+
+        Args:
+            resource: One of RESOURCES (messages, events, contacts, drive) or a path relative to base_url.
+            key: The checkpoint key, the resource path by default.
+            params: Query parameters of the first request, e.g. $select, or startDateTime and endDateTime for
+            events. The next requests reuse the links given by Graph.
+            page_size: Maximum number of items per page, sent as a Prefer: odata.maxpagesize header.
+            kwargs: Values of the resource path, e.g. folder for messages and contacts.
+
+        """
+        path = self.RESOURCES.get(resource, resource).format(**kwargs)
+        key = key or path
+        headers = {u'Prefer': u'odata.maxpagesize={}'.format(page_size)} if page_size else None
+        delta_link = self.store.get(key)
+        url = delta_link or self.client.base_url + path
+        first = delta_link is None
+        while True:
+            try:
+                page = self.client._get(url, params=params if first else None, headers=headers)
+            except exceptions.Gone:
+                if delta_link is None:
+                    raise
+                self.store.delete(key)
+                if self.on_resync is not None:
+                    self.on_resync(key)
+                delta_link, url, first = None, self.client.base_url + path, True
+                continue
+            first = False
+            for item in page.get(u'value', []):
+                yield item
+            if u'@odata.nextLink' in page:
+                url = page[u'@odata.nextLink']
+            else:
+                if u'@odata.deltaLink' in page:
+                    self.store.set(key, page[u'@odata.deltaLink'])
+                return
+
+    def reset(self, resource, key=None, **kwargs):
+        u"""Forgets the checkpoint of a resource so that the next run is a full sync."""
+        self.store.delete(key or self.RESOURCES.get(resource, resource).format(**kwargs))
@@ -0,0 +1,196 @@
+from __future__ import absolute_import
+import base64
+import binascii
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import open
+
+from microsoftgraph import exceptions
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+class QuickXorHash(object):
+    u"""The quickXorHash of OneDrive for Business and SharePoint, with the hashlib update/digest interface."""
+    WIDTH = 160
+    SHIFT = 11
+    MASK = (1 << WIDTH) - 1
+
+    def __init__(self):
+        self._state = 0
+        self._length = 0
+
+    def update(self, data):
+        if not data:
+            return
+        columns = self._xor_columns(data)
+        for column in range(min(len(data), self.WIDTH)):
+            value = ord(columns[column])
+            if value:
+                offset = (self.SHIFT * ((self._length + column) % self.WIDTH)) % self.WIDTH
+                self._state ^= ((value << offset) | (value >> (self.WIDTH - offset))) & self.MASK
+        self._length += len(data)
+
+    def _xor_columns(self, data):
+        u"""XORs the 160 bytes wide rows of data together, folding its halves as big integers."""
+        row = self.WIDTH
+        size = row
+        while size < len(data):
+            size *= 2
+        value = int(binascii.hexlify(bytes(data) + b'\0' * (size - len(data))), 16)
+        while size > row:
+            size //= 2
+            value = (value >> (size * 8)) ^ (value & ((1 << (size * 8)) - 1))
+        return binascii.unhexlify(u'{:0{}x}'.format(value, row * 2))
+
+    def digest(self):
+        value = self._state ^ (self._length << (self.WIDTH - 64))
+        return binascii.unhexlify(u'{:040x}'.format(value))[::-1]
+
+    def b64digest(self):
+        return base64.b64encode(self.digest()).decode(u'ascii')
+
+
+def _hashers(item):
+    hashes = (item.get(u'file') or {}).get(u'hashes') or {}
+    hashers = {}
+    if u'sha256Hash' in hashes:
+        hashers[u'sha256Hash'] = hashlib.sha256()
+    elif u'sha1Hash' in hashes:
+        hashers[u'sha1Hash'] = hashlib.sha1()
+    elif u'quickXorHash' in hashes:
+        hashers[u'quickXorHash'] = QuickXorHash()
+    return hashers
+
+
+def _verify(item, hashers, size):
+    if size != item[u'size']:
+        raise IOError(u'Downloaded {} bytes instead of {}.'.format(size, item[u'size']))
+    for name, hasher in hashers.items():
+        expected = item[u'file'][u'hashes'][name]
+        actual = hasher.b64digest() if name == u'quickXorHash' else hasher.hexdigest()
+        if actual.lower() != expected.lower():
+            raise IOError(u'{} mismatch: {} instead of {}.'.format(name, actual, expected))
+
+
+def _get(client, url, start=None, end=None, headers=None):
+    headers = dict(headers or {})
+    if start is not None:
+        headers[u'Range'] = u'bytes={}-{}'.format(start, end - 1)
+    attempt, begin = 0, time.time()
+    while True:
+        response = client.transport.request(u'GET', url, headers=headers, stream=True, timeout=client.timeout)
+        client._note_status(response.status_code)
+        if response.status_code in (200, 206):
+            if start is not None and response.status_code != 206:
+                response.close()
+                raise IOError(u'The server ignored the Range header.')
+            return response
+        delay = client.retry_policy.get_delay(response, attempt, time.time() - begin)
+        if delay is None:
+            client._parse(response)
+            raise exceptions.UnknownError(u'Unexpected status {} for a download.'.format(response.status_code))
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def download_item(client, item_id, destination, max_workers=1, segment_size=DEFAULT_SEGMENT_SIZE,
+                  chunk_size=DEFAULT_CHUNK_SIZE, verify=True, on_progress=None):
+    u"""Downloads the content of a drive item, see Client.drive_download_item."""
+    item = client.drive_get_item(item_id)
+    url = item[u'@microsoft.graph.downloadUrl']
+    size = item[u'size']
+    hashers = _hashers(item) if verify else {}
+
+    if hasattr(destination, u'write'):
+        response = _get(client, url)
+        written = 0
+        try:
+            for chunk in response.iter_content(chunk_size):
+                destination.write(chunk)
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                written += len(chunk)
+                if on_progress is not None:
+                    on_progress(written, size)
+        finally:
+            response.close()
+        _verify(item, hashers, written)
+        return item
+
+    part = destination + u'.part'
+    state_path = part + u'.json'
+    tag = item.get(u'cTag') or item.get(u'eTag')
+    state = None
+    if os.path.exists(part) and os.path.exists(state_path):
+        with open(state_path, u'r', encoding=u'utf-8') as f:
+            state = json.load(f)
+        if state[u'tag'] != tag or state[u'size'] != size or state[u'segment_size'] != segment_size:
+            state = None
+    if state is None:
+        state = {u'tag': tag, u'size': size, u'segment_size': segment_size, u'done': []}
+        with open(part, u'wb') as f:
+            f.truncate(size)
+
+    lock = threading.Lock()
+    done = set(state[u'done'])
+    progress = [sum(min(segment_size, size - index * segment_size) for index in done)]
+    segments = [(index, start, min(start + segment_size, size))
+                for index, start in enumerate(range(0, size, segment_size)) if index not in done]
+
+    def fetch(segment):
+        index, start, end = segment
+        ranged = start > 0 or end < size
+        response = _get(client, url, start, end) if ranged else _get(client, url)
+        written = 0
+        try:
+            with open(part, u'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size):
+                    if written + len(chunk) > end - start:
+                        raise IOError(u'Segment {} is longer than {} bytes.'.format(index, end - start))
+                    f.write(chunk)
+                    written += len(chunk)
+                    with lock:
+                        progress[0] += len(chunk)
+                        if on_progress is not None:
+                            on_progress(progress[0], size)
+        finally:
+            response.close()
+        if written != end - start:
+            # Left out of the state, so that a later call fetches it again.
+            raise IOError(u'Segment {}: received {} bytes instead of {}.'.format(index, written, end - start))
+        with lock:
+            state[u'done'].append(index)
+            with open(state_path, u'wb') as f:
+                f.write(json.dumps(state).encode(u'utf-8'))
+
+    if max_workers == 1:
+        for segment in segments:
+            fetch(segment)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            list(executor.map(fetch, segments))
+        finally:
+            executor.shutdown(wait=True)
+
+    if verify:
+        with open(part, u'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+    # The .part file is created with the final size: check the bytes the segments actually received.
+    _verify(item, hashers, progress[0])
+    if os.path.exists(destination):
+        os.remove(destination)
+    os.rename(part, destination)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return item
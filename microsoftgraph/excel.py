@@ -0,0 +1,297 @@
+from __future__ import absolute_import
+import json
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from microsoftgraph import exceptions
+
+logger = logging.getLogger(u'microsoftgraph')
+
+DEFAULT_MAX_CELLS = 5000
+# Graph refuses request bodies above 4 MB.
+DEFAULT_MAX_BYTES = 4 * 1000 * 1000
+_BODY_SIZE = len(json.dumps({u'values': []}))
+DEFAULT_BLOCK_ROWS = 1000
+
+_CELL = re.compile(u'^\\$?([A-Za-z]+)\\$?([0-9]+)$')
+_WORKBOOK_URL = re.compile(u'/drive/items/([^/]+)/workbook/(?!createSession)')
+
+
+def column_index(letters):
+    u"""Returns the 0-based index of a column: A -> 0, AA -> 26."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord(u'A') + 1
+    return index - 1
+
+
+def column_letters(index):
+    u"""Returns the letters of a 0-based column index: 0 -> A, 26 -> AA."""
+    letters = u''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = unichr(ord(u'A') + remainder) + letters
+    return letters
+
+
+def parse_cell(cell):
+    u"""Returns the 0-based (row, column) of a cell like B3."""
+    match = _CELL.match(cell.strip())
+    if not match:
+        raise ValueError(u'Invalid cell: {}'.format(cell))
+    return int(match.group(2)) - 1, column_index(match.group(1))
+
+
+def parse_address(address):
+    u"""Returns the 0-based (first row, first column, last row, last column) of an address like Sheet1!A1:C10."""
+    address = address.rpartition(u'!')[2]
+    first, _, last = address.partition(u':')
+    row, column = parse_cell(first)
+    last_row, last_column = parse_cell(last) if last else (row, column)
+    return row, column, last_row, last_column
+
+
+def format_address(row, column, last_row, last_column):
+    u"""The inverse of parse_address."""
+    return u'{}{}:{}{}'.format(column_letters(column), row + 1, column_letters(last_column), last_row + 1)
+
+
+def _line_size(cells):
+    # The bytes a row adds to the {"values": [...]} body, with its separator.
+    return len(json.dumps(cells)) + 2
+
+
+def _chunk(block, row, column):
+    return format_address(row, column, row + len(block) - 1, column + len(block[0]) - 1), block
+
+
+def _split_row(cells, row, column, max_bytes):
+    u"""Splits a row too large for one request into narrower ranges."""
+    if _BODY_SIZE + _line_size(cells) <= max_bytes:
+        return [_chunk([cells], row, column)]
+    if len(cells) == 1:
+        raise ValueError(u'The value of {}{} does not fit in {} bytes.'.format(column_letters(column), row + 1,
+                                                                               max_bytes))
+    half = len(cells) // 2
+    return _split_row(cells[:half], row, column, max_bytes) + \
+        _split_row(cells[half:], row, column + half, max_bytes)
+
+
+def split_values(values, row, column, max_cells=DEFAULT_MAX_CELLS, max_bytes=DEFAULT_MAX_BYTES):
+    u"""Splits a 2-D block of values starting at (row, column) into rectangles of at most max_cells cells, whose
+    JSON body is at most max_bytes bytes.
+
+    Returns:
+        A list of (address, values) tuples.
+
+    Raises:
+        ValueError: If the rows are not of the same length, or a single value is larger than max_bytes.
+
+    """
+    if hasattr(values, u'tolist'):
+        values = values.tolist()
+    width = len(values[0]) if values else 0
+    if any(len(line) != width for line in values):
+        raise ValueError(u'Every row must have the same number of values.')
+    if not width:
+        return []
+    columns = min(width, max_cells)
+    rows = max(1, max_cells // columns)
+    chunks = []
+    for left in range(0, width, columns):
+        block, size = [], _BODY_SIZE
+        for top, line in enumerate(values):
+            cells = line[left:left + columns]
+            line_size = _line_size(cells)
+            if block and (len(block) == rows or size + line_size > max_bytes):
+                chunks.append(_chunk(block, row + top - len(block), column + left))
+                block, size = [], _BODY_SIZE
+            if size + line_size > max_bytes:
+                chunks.extend(_split_row(cells, row + top, column + left, max_bytes))
+                continue
+            block.append(cells)
+            size += line_size
+        if block:
+            chunks.append(_chunk(block, row + len(values) - len(block), column + left))
+    return chunks
+
+
+class WorkbookSessionPool(object):
+    u"""Shares the workbook sessions of each item between the threads using a Client.
+
+    The sessions are shared by item and persistChanges, so a writer never joins a session whose changes are
+    discarded. While a session is held, Client._request adds its workbook-session-id header to every request on
+    that workbook: a thread uses the session it holds, and the other threads use the persistent session of the
+    workbook if there is one. A timer refreshes each session so that it does not time out, and the last release
+    closes it.
+
+    Args:
+        client: The Client.
+        refresh_interval: Seconds between two refreshes of a session.
+
+    """
+
+    def __init__(self, client, refresh_interval=240):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        return bool(self._sessions)
+
+    def session_id(self, url):
+        u"""Returns the id of the session to use for the workbook of url, or None."""
+        match = _WORKBOOK_URL.search(url)
+        if match is None:
+            return None
+        item_id = match.group(1)
+        keys = [key for key in reversed(getattr(self._local, u'held', [])) if key[0] == item_id]
+        keys.extend([(item_id, True), (item_id, False)])
+        for key in keys:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session[u'id']
+        return None
+
+    def acquire(self, item_id, persist_changes=True):
+        u"""Returns the id of the session of item_id with this persistChanges, creating it if no thread holds one.
+
+        The session is created outside of the pool lock: the threads acquiring it meanwhile wait for its creation,
+        the other workbooks are not held up.
+
+        """
+        key = (item_id, persist_changes)
+        with self._lock:
+            session = self._sessions.get(key)
+            creating = session is None
+            if creating:
+                session = self._sessions[key] = {u'id': None, u'count': 0, u'persist_changes': persist_changes,
+                                                 u'timer': None, u'ready': Future()}
+            session[u'count'] += 1
+        if creating:
+            try:
+                created = self.client.drive_create_session(item_id, json={u'persistChanges': persist_changes})
+            except Exception as e:
+                with self._lock:
+                    if self._sessions.get(key) is session:
+                        del self._sessions[key]
+                session[u'ready'].set_exception(e)
+                raise
+            with self._lock:
+                session[u'id'] = created[u'id']
+                self._schedule(item_id, session)
+            session[u'ready'].set_result(created[u'id'])
+        return session[u'ready'].result()
+
+    def release(self, item_id, persist_changes=True):
+        u"""Releases a session, closing it when no thread holds it anymore."""
+        key = (item_id, persist_changes)
+        with self._lock:
+            session = self._sessions[key]
+            session[u'count'] -= 1
+            if session[u'count']:
+                return
+            del self._sessions[key]
+            timer = session[u'timer']
+            timer.cancel()
+        if timer is not threading.current_thread():
+            # A refresh running now finishes before the session is closed, and no timer outlives the pool.
+            timer.join()
+        if session[u'id'] is not None:
+            self.client.drive_close_session(item_id, headers={u'workbook-session-id': session[u'id']})
+
+    def _schedule(self, item_id, session):
+        timer = threading.Timer(self.refresh_interval, self._refresh, (item_id, session))
+        timer.daemon = True
+        session[u'timer'] = timer
+        timer.start()
+
+    def _refresh(self, item_id, session):
+        try:
+            if session[u'id'] is None:
+                raise exceptions.NotFound(u'The previous refresh could not recreate the session.')
+            self.client.drive_refresh_session(item_id, headers={u'workbook-session-id': session[u'id']})
+        except exceptions.BaseError:
+            # The session expired anyway: replace it by a new one. Until that succeeds, the requests on the
+            # workbook are sent without a session rather than with a dead one.
+            session[u'id'] = None
+            try:
+                created = self.client.drive_create_session(item_id,
+                                                           json={u'persistChanges': session[u'persist_changes']})
+                session[u'id'] = created[u'id']
+            except Exception:
+                logger.warning(u'Could not recreate the workbook session of %s, retrying in %ss.', item_id,
+                               self.refresh_interval, exc_info=True)
+        except Exception:
+            # A network error: the session may still be alive, try again at the next interval.
+            logger.warning(u'Could not refresh the workbook session of %s, retrying in %ss.', item_id,
+                           self.refresh_interval, exc_info=True)
+        finally:
+            with self._lock:
+                if self._sessions.get((item_id, session[u'persist_changes'])) is session:
+                    self._schedule(item_id, session)
+
+    @contextmanager
+    def session(self, item_id, persist_changes=True):
+        u"""Holds the session of item_id within a with block, see Client.workbook_session."""
+        session_id = self.acquire(item_id, persist_changes)
+        held = self._local.__dict__.setdefault(u'held', [])
+        held.append((item_id, persist_changes))
+        try:
+            yield session_id
+        finally:
+            held.remove((item_id, persist_changes))
+            self.release(item_id, persist_changes)
+
+
+@contextmanager
+def workbook_session(client, item_id, session_id=None, persist_changes=True):
+    u"""Yields the headers to send to use session_id, or the session held by the client pool for item_id."""
+    if session_id is not None:
+        yield {u'workbook-session-id': session_id}
+        return
+    with client.workbook_session(item_id, persist_changes):
+        yield {}
+
+
+def write_values(client, item_id, worksheet_id, values, start_cell=u'A1', max_cells=DEFAULT_MAX_CELLS,
+                 max_workers=4, session_id=None, max_bytes=DEFAULT_MAX_BYTES):
+    u"""Writes a 2-D block of values, see Client.excel_write_values."""
+    row, column = parse_cell(start_cell)
+    chunks = split_values(values, row, column, max_cells, max_bytes)
+    with workbook_session(client, item_id, session_id) as headers:
+        def write(chunk):
+            address, block = chunk
+            return client.excel_update_range(item_id, worksheet_id, address=address, json={u'values': block},
+                                             headers=headers)
+
+        if max_workers == 1 or len(chunks) == 1:
+            return [write(chunk) for chunk in chunks]
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            return list(executor.map(write, chunks))
+        finally:
+            executor.shutdown(wait=True)
+
+
+def read_values(client, item_id, worksheet_id, address=None, block_rows=DEFAULT_BLOCK_ROWS, session_id=None):
+    u"""Yields the rows of a range block by block, see Client.excel_read_values."""
+    with workbook_session(client, item_id, session_id, persist_changes=False) as headers:
+        if address is None:
+            used = client.excel_get_used_range(item_id, worksheet_id, values_only=True,
+                                               params={u'$select': u'address'}, headers=headers)
+            address = used[u'address']
+        row, column, last_row, last_column = parse_address(address)
+        for top in range(row, last_row + 1, block_rows):
+            block = format_address(top, column, min(top + block_rows, last_row + 1) - 1, last_column)
+            response = client.excel_get_range(item_id, worksheet_id, address=block,
+                                              params={u'$select': u'values'}, headers=headers)
+            for line in response[u'values']:
+                yield line
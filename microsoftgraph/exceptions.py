@@ -1,5 +1,6 @@
 class BaseError(Exception):
-    pass
+    # The requests.Response that raised the error, when there is one (not for batched requests).
+    response = None
 
 
 class UnknownError(BaseError):
@@ -66,6 +67,10 @@ class UnprocessableEntity(BaseError):
     pass
 
 
+class FailedDependency(BaseError):
+    pass
+
+
 class TooManyRequests(BaseError):
     pass
 
@@ -0,0 +1,139 @@
+from __future__ import absolute_import
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from microsoftgraph import exceptions
+
+THROTTLE_EXCEPTIONS = (exceptions.TooManyRequests, exceptions.ServiceUnavailable)
+THROTTLE_STATUS_CODES = frozenset([429, 503])
+
+
+class Result(object):
+    u"""The outcome of one call of a FanOut: the parsed response in value, or the exception raised."""
+    __slots__ = (u'index', u'item', u'value', u'exception')
+
+    def __init__(self, index, item, value=None, exception=None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.exception = exception
+
+    @property
+    def ok(self):
+        return self.exception is None
+
+    def __repr__(self):
+        return u'<Result {} {}>'.format(self.index, u'ok' if self.ok else repr(self.exception))
+
+
+class FanOut(object):
+    u"""Runs a Client method once per item on a pool of threads and yields a Result per item.
+
+    Only a bounded number of items is read ahead from the iterable, so it can be a generator over a huge list. An
+    item that is a tuple is passed as positional arguments, any other item as the single argument. When `adaptive`
+    is set, the number of calls in flight is halved whenever a call gets throttled (the client received a 429/503
+    while running it, even if it was retried) and grows back by one after each window of successful calls. Only
+    the responses of this FanOut's own calls count, so clients sharing a RetryPolicy do not slow each other down.
+
+    Args:
+        client: The Client.
+        method: A Client method, its name, or any callable using the client.
+        items: An iterable of arguments.
+        kwargs: Keyword arguments of every call.
+        max_workers: Maximum number of calls in flight.
+        ordered: If True, the results are yielded in input order, otherwise in completion order.
+        on_progress: A callable receiving (done, failed) after each completed call.
+        adaptive: If True, the concurrency follows the throttling feedback.
+        min_workers: The lowest concurrency an adaptive run goes down to.
+
+    """
+
+    def __init__(self, client, method, items, kwargs=None, max_workers=8, ordered=True, on_progress=None,
+                 adaptive=True, min_workers=1):
+        self.client = client
+        self.method = method if callable(method) else getattr(client, method)
+        self.items = items
+        self.kwargs = kwargs or {}
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.on_progress = on_progress
+        self.adaptive = adaptive
+        self.min_workers = min(min_workers, max_workers)
+        self.window = max_workers
+        self.done = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def _call(self, item):
+        u"""Returns (throttled responses, value, exception) of the call of an item."""
+        args = item if isinstance(item, tuple) else (item,)
+        local = self.client._local
+        local.throttled = 0
+        try:
+            value, exception = self.method(*args, **self.kwargs), None
+        except Exception as e:
+            value, exception = None, e
+        finally:
+            throttled, local.throttled = local.throttled, None
+        return throttled, value, exception
+
+    def _adapt(self, results, throttled):
+        throttled = throttled or any(isinstance(result.exception, THROTTLE_EXCEPTIONS) for result in results)
+        if throttled:
+            self.throttled += 1
+            self.window = max(self.min_workers, self.window // 2)
+            self._successes = 0
+            return
+        self._successes += len(results)
+        if self._successes >= self.window:
+            self.window = min(self.max_workers, self.window + 1)
+            self._successes = 0
+
+    def __iter__(self):
+        items = iter(self.items)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = {}
+        buffered = {}
+        submitted = next_index = 0
+        exhausted = False
+        self._successes = 0
+        try:
+            while True:
+                while not exhausted and len(pending) < self.window and (
+                        not self.ordered or submitted - next_index < 4 * self.max_workers):
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(self._call, item)] = (submitted, item)
+                    submitted += 1
+                if not pending:
+                    return
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                results = []
+                throttled = False
+                for future in done:
+                    index, item = pending.pop(future)
+                    responses, value, exception = future.result()
+                    throttled = throttled or responses > 0
+                    results.append(Result(index, item, value, exception))
+                    if exception is not None:
+                        self.failed += 1
+                    self.done += 1
+                    if self.on_progress is not None:
+                        self.on_progress(self.done, self.failed)
+                if self.adaptive:
+                    self._adapt(results, throttled)
+                if not self.ordered:
+                    for result in results:
+                        yield result
+                    continue
+                for result in results:
+                    buffered[result.index] = result
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
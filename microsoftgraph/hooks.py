@@ -0,0 +1,300 @@
+from __future__ import absolute_import
+import bisect
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from urlparse import urlparse
+
+from microsoftgraph.ratelimit import resource_family
+
+logger = logging.getLogger(u'microsoftgraph')
+
+_GUID = re.compile(u'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+_FUNCTION = re.compile(u'^([^(]+)\\(.*\\)$')
+
+
+def url_template(url):
+    u"""Returns the path of a Graph url without its API version, with the ids replaced by {id}.
+
+    Example:
+        https://graph.microsoft.com/v1.0/me/messages/AAMkAD.../attachments -> me/messages/{id}/attachments
+
+    """
+    segments = [segment for segment in urlparse(url).path.split(u'/') if segment][1:]
+    template = []
+    for segment in segments:
+        function = _FUNCTION.match(segment)
+        if function:
+            template.append(function.group(1) + u'(...)')
+        elif segment.isdigit() or _GUID.match(segment) or (
+                len(segment) >= 16 and any(character.isdigit() for character in segment)):
+            template.append(u'{id}')
+        else:
+            template.append(segment)
+    return u'/'.join(template)
+
+
+def _size(body):
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+class RequestInfo(object):
+    u"""What the hooks of a Client know about one HTTP exchange.
+
+    Attributes:
+        method: The HTTP method.
+        url: The url, without the query string parameters given in params.
+        template: The url_template of url, to group the requests by endpoint.
+        family: The resource family of url (mail, drive, onenote, subscriptions or default).
+        attempt: 0 for the first try, then the number of retries.
+        client_request_id: The client-request-id header sent, the same for all the attempts of a request.
+        request_id: The request-id header received.
+        status: The response status, None if no response was received.
+        request_bytes: Size of the request body, None when it is streamed without a known size.
+        response_bytes: Size of the response body, None when it is streamed without a Content-Length.
+        start: time.time() at which the request was sent.
+        ttfb: Seconds until the response headers were parsed (requests' response.elapsed). Connect and TLS time
+        are included, requests does not measure them apart.
+        elapsed: Seconds until the response body was read.
+        parse_time: Seconds spent in Client._parse.
+        retry: True if the response is going to be retried.
+        exception: The exception raised by the transport or by Client._parse.
+        data: A dict where hooks can keep their own state for this request.
+
+    """
+    __slots__ = (u'method', u'url', u'template', u'family', u'attempt', u'client_request_id', u'request_id',
+                 u'status', u'request_bytes', u'response_bytes', u'start', u'ttfb', u'elapsed', u'parse_time',
+                 u'retry', u'exception', u'data')
+
+    def __init__(self, method, url, attempt, client_request_id=None):
+        self.method = method.upper()
+        self.url = url
+        self.template = url_template(url)
+        self.family = resource_family(url)
+        self.attempt = attempt
+        self.client_request_id = client_request_id or unicode(uuid.uuid4())
+        self.request_id = None
+        self.status = None
+        self.request_bytes = None
+        self.response_bytes = None
+        self.start = time.time()
+        self.ttfb = None
+        self.elapsed = None
+        self.parse_time = None
+        self.retry = False
+        self.exception = None
+        self.data = {}
+
+    def set_response(self, response, stream=False):
+        self.elapsed = time.time() - self.start
+        self.status = response.status_code
+        self.request_id = response.headers.get(u'request-id')
+        self.ttfb = response.elapsed.total_seconds()
+        self.request_bytes = _size(response.request.body)
+        if stream:
+            length = response.headers.get(u'Content-Length')
+            self.response_bytes = int(length) if length is not None and length.isdigit() else None
+        else:
+            self.response_bytes = len(response.content or b'')
+
+    def set_exception(self, exception):
+        if self.elapsed is None:
+            self.elapsed = time.time() - self.start
+        self.exception = exception
+
+
+class Hook(object):
+    u"""Base class of the objects given to Client(hooks=[...]). Override the callbacks you need.
+
+    The callbacks run in the thread sending the request and receive a RequestInfo.
+
+    """
+
+    def pre_request(self, info):
+        u"""Called before each HTTP request, retries included."""
+
+    def post_response(self, info):
+        u"""Called for each response received, once it is parsed or known to be retried."""
+
+    def on_exception(self, info):
+        u"""Called when the transport or Client._parse raised info.exception."""
+
+
+class LatencyHistogram(Hook):
+    u"""Counts the response latencies (elapsed) per resource family in cumulative buckets.
+
+    Args:
+        buckets: The upper bounds of the buckets, in seconds.
+
+    """
+
+    def __init__(self, buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def post_response(self, info):
+        with self._lock:
+            family = self._families.get(info.family)
+            if family is None:
+                family = self._families[info.family] = {u'counts': [0] * (len(self.buckets) + 1), u'count': 0,
+                                                        u'sum': 0.0, u'max': 0.0}
+            family[u'counts'][bisect.bisect_left(self.buckets, info.elapsed)] += 1
+            family[u'count'] += 1
+            family[u'sum'] += info.elapsed
+            family[u'max'] = max(family[u'max'], info.elapsed)
+
+    def snapshot(self):
+        u"""Returns {family: {'buckets': [(upper bound, cumulative count)], 'count', 'sum', 'max'}}, the last
+        upper bound being float('inf')."""
+        with self._lock:
+            result = {}
+            for name, family in self._families.items():
+                total, buckets = 0, []
+                for bound, count in zip(self.buckets + (float(u'inf'),), family[u'counts']):
+                    total += count
+                    buckets.append((bound, total))
+                result[name] = {u'buckets': buckets, u'count': family[u'count'], u'sum': family[u'sum'],
+                                u'max': family[u'max']}
+            return result
+
+    def quantile(self, family, q):
+        u"""Returns the upper bound of the bucket holding the q quantile (0 < q <= 1) of a family, or None."""
+        snapshot = self.snapshot().get(family)
+        if not snapshot:
+            return None
+        rank = q * snapshot[u'count']
+        for bound, count in snapshot[u'buckets']:
+            if count >= rank:
+                return bound
+
+
+class RequestCounters(Hook):
+    u"""Counts the requests, retries, throttled responses and exceptions per endpoint template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _counters(self, info):
+        key = (info.method, info.template)
+        counters = self._endpoints.get(key)
+        if counters is None:
+            counters = self._endpoints[key] = {u'requests': 0, u'retries': 0, u'throttled': 0, u'exceptions': 0,
+                                               u'statuses': {}, u'request_bytes': 0, u'response_bytes': 0,
+                                               u'elapsed': 0.0}
+        return counters
+
+    def post_response(self, info):
+        with self._lock:
+            counters = self._counters(info)
+            counters[u'requests'] += 1
+            counters[u'statuses'][info.status] = counters[u'statuses'].get(info.status, 0) + 1
+            counters[u'retries'] += 1 if info.retry else 0
+            counters[u'throttled'] += 1 if info.status in (429, 503) else 0
+            counters[u'request_bytes'] += info.request_bytes or 0
+            counters[u'response_bytes'] += info.response_bytes or 0
+            counters[u'elapsed'] += info.elapsed
+
+    def on_exception(self, info):
+        with self._lock:
+            self._counters(info)[u'exceptions'] += 1
+
+    def snapshot(self):
+        u"""Returns {(method, template): counters}."""
+        with self._lock:
+            return dict((key, dict(counters, statuses=dict(counters[u'statuses'])))
+                        for key, counters in self._endpoints.items())
+
+    def hottest(self, n=10, by=u'elapsed'):
+        u"""Returns the n endpoints with the highest counter `by` (elapsed, requests, throttled...)."""
+        return sorted(self.snapshot().items(), key=lambda item: item[1][by], reverse=True)[:n]
+
+
+class CorrelationLog(Hook):
+    u"""Keeps the ids of the last requests and logs the failed ones, to quote them to Microsoft support.
+
+    Every response is logged at DEBUG level, and the exceptions at WARNING level, on the microsoftgraph logger.
+
+    Args:
+        max_size: Number of requests remembered.
+
+    """
+
+    def __init__(self, max_size=1000):
+        self.entries = deque(maxlen=max_size)
+
+    def _record(self, info):
+        entry = (info.client_request_id, info.request_id, info.method, info.template, info.status, info.elapsed)
+        self.entries.append(entry)
+        return entry
+
+    def post_response(self, info):
+        if info.exception is None:
+            logger.debug(u'%s %s -> %s in %.3fs (client-request-id %s, request-id %s)', info.method, info.template,
+                         info.status, info.elapsed, info.client_request_id, info.request_id)
+            self._record(info)
+
+    def on_exception(self, info):
+        logger.warning(u'%s %s -> %s %r (client-request-id %s, request-id %s)', info.method, info.template,
+                       info.status, info.exception, info.client_request_id, info.request_id)
+        self._record(info)
+
+    def find(self, client_request_id):
+        u"""Returns the (client_request_id, request_id, method, template, status, elapsed) of a request, or None."""
+        for entry in reversed(self.entries):
+            if entry[0] == client_request_id:
+                return entry
+        return None
+
+
+class OpenTelemetryHook(Hook):
+    u"""Exports one OpenTelemetry client span per HTTP request. Needs the opentelemetry-api package.
+
+    Args:
+        tracer: An opentelemetry Tracer, the one of the global tracer provider by default.
+
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError(u'OpenTelemetryHook needs the opentelemetry-api package.')
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer(u'microsoftgraph')
+
+    def pre_request(self, info):
+        span = self.tracer.start_span(u'{} {}'.format(info.method, info.template),
+                                      kind=self._trace.SpanKind.CLIENT)
+        span.set_attribute(u'http.method', info.method)
+        span.set_attribute(u'http.url', info.url)
+        span.set_attribute(u'graph.family', info.family)
+        span.set_attribute(u'graph.attempt', info.attempt)
+        span.set_attribute(u'graph.client_request_id', info.client_request_id)
+        info.data[u'span'] = span
+
+    def post_response(self, info):
+        span = info.data[u'span']
+        span.set_attribute(u'http.status_code', info.status)
+        if info.request_id:
+            span.set_attribute(u'graph.request_id', info.request_id)
+        if info.response_bytes is not None:
+            span.set_attribute(u'http.response_content_length', info.response_bytes)
+        if info.exception is None:
+            span.end()
+
+    def on_exception(self, info):
+        span = info.data.pop(u'span', None)
+        if span is not None:
+            span.record_exception(info.exception)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+            span.end()
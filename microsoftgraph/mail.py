@@ -0,0 +1,136 @@
+from __future__ import absolute_import
+import base64
+import json
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import open
+
+from microsoftgraph.upload import UploadSession
+
+INLINE_ATTACHMENT_LIMIT = 3 * 1024 * 1024
+READ_SIZE = 3 * 64 * 1024
+
+_PLACEHOLDER = u'\0attachments\0'
+
+
+class Base64File(object):
+    u"""A part of a StreamingBody: the base64 encoding of a file, read READ_SIZE bytes at a time."""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __len__(self):
+        return (os.path.getsize(self.filename) + 2) // 3 * 4
+
+    def __iter__(self):
+        with open(self.filename, u'rb') as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), b''):
+                yield base64.b64encode(chunk)
+
+
+class StreamingBody(object):
+    u"""A file-like request body made of bytes and Base64File parts, streamed with a known Content-Length.
+
+    Rewinding it with seek(0) starts the stream over, so the request can be sent again.
+
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.seek(0)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                for chunk in part:
+                    yield chunk
+
+    def read(self, size=-1):
+        result = []
+        while size:
+            if self._offset == len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk, self._offset = chunk, 0
+                continue
+            end = len(self._chunk) if size < 0 else min(len(self._chunk), self._offset + size)
+            result.append(self._chunk[self._offset:end])
+            if size > 0:
+                size -= end - self._offset
+            self._offset = end
+        data = b''.join(result)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if offset or whence:
+            raise IOError(u'A StreamingBody can only be rewound to its start.')
+        self._chunks = iter(self)
+        self._chunk, self._offset, self._position = b'', 0, 0
+
+
+def attachment_parts(filename):
+    u"""Returns the StreamingBody parts of a fileAttachment."""
+    mime_type = mimetypes.guess_type(filename)[0]
+    metadata = {u'@odata.type': u'#microsoft.graph.fileAttachment', u'ContentType': mime_type or u'',
+                u'Name': filename}
+    return [json.dumps(metadata)[:-1] + b', "ContentBytes": "', Base64File(filename), b'"}']
+
+
+def message_parts(document, attachments):
+    u"""Returns the StreamingBody parts of a JSON document whose _PLACEHOLDER value is the attachment list."""
+    before, after = json.dumps(document).split(json.dumps(_PLACEHOLDER))
+    parts = [before, b'[']
+    for index, filename in enumerate(attachments):
+        if index:
+            parts.append(b', ')
+        parts.extend(attachment_parts(filename))
+    parts.extend([b']', after])
+    return parts
+
+
+def send_mail(client, message, attachments, max_workers=4):
+    u"""Sends a message with attachments, see Client.send_mail.
+
+    Attachments totalling less than INLINE_ATTACHMENT_LIMIT are streamed inside the sendMail request. Otherwise
+    a draft is created, each attachment is added on its own (through an upload session when it is larger than
+    INLINE_ATTACHMENT_LIMIT), max_workers at a time, and the draft is sent.
+
+    """
+    if sum(os.path.getsize(filename) for filename in attachments) <= INLINE_ATTACHMENT_LIMIT:
+        document = {u'Message': dict(message, Attachments=_PLACEHOLDER), u'SaveToSentItems': u'true'}
+        return client._post(client.base_url + u'me/microsoft.graph.sendMail',
+                            data=StreamingBody(message_parts(document, attachments)))
+
+    draft = client._post(client.base_url + u'me/messages', json=message)
+    message_url = client.base_url + u'me/messages/' + draft[u'id']
+
+    def attach(filename):
+        size = os.path.getsize(filename)
+        if size <= INLINE_ATTACHMENT_LIMIT:
+            return client._post(message_url + u'/attachments', data=StreamingBody(attachment_parts(filename)))
+        item = {u'attachmentType': u'file', u'name': filename, u'size': size,
+                u'contentType': mimetypes.guess_type(filename)[0] or u'application/octet-stream'}
+        session = client._post(message_url + u'/attachments/createUploadSession', json={u'AttachmentItem': item})
+        return UploadSession(client, session[u'uploadUrl'], filename).upload(session.get(u'nextExpectedRanges'))
+
+    try:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            list(executor.map(attach, attachments))
+        finally:
+            executor.shutdown(wait=True)
+        return client._post(message_url + u'/send')
+    except Exception:
+        client._delete(message_url)
+        raise
@@ -0,0 +1,225 @@
+from __future__ import absolute_import
+import json
+import threading
+import time
+from collections import OrderedDict
+from Queue import Empty, Queue
+from urlparse import parse_qs
+
+
+class Notification(object):
+    u"""A change notification, see https://docs.microsoft.com/en-us/graph/api/resources/changenotification."""
+    __slots__ = (u'subscription_id', u'client_state', u'change_type', u'resource', u'resource_id', u'tenant_id',
+                 u'lifecycle_event', u'received_at')
+
+    def __init__(self, subscription_id, client_state, change_type, resource, resource_id=None, tenant_id=None,
+                 lifecycle_event=None):
+        self.subscription_id = subscription_id
+        self.client_state = client_state
+        self.change_type = change_type
+        self.resource = resource
+        self.resource_id = resource_id
+        self.tenant_id = tenant_id
+        self.lifecycle_event = lifecycle_event
+        self.received_at = time.time()
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get(u'subscriptionId'), data.get(u'clientState'), data.get(u'changeType'),
+                   data.get(u'resource'), (data.get(u'resourceData') or {}).get(u'id'), data.get(u'tenantId'),
+                   data.get(u'lifecycleEvent'))
+
+    def key(self):
+        return self.subscription_id, self.change_type, self.resource, self.lifecycle_event
+
+    def __repr__(self):
+        return u'<Notification {} {}>'.format(self.change_type or self.lifecycle_event, self.resource)
+
+
+class NotificationProcessor(object):
+    u"""Receives the change notifications of subscriptions and queues them for workers.
+
+    handle() (or the WSGI application wsgi_app) answers the validationToken handshake, drops the notifications
+    whose clientState does not match, and puts the others on a bounded queue read with get(). The notifications of
+    a request are queued all together: when the queue has no room for them for `put_timeout` seconds, none is
+    queued and the request is answered with 503, so that Graph delivers them again later. Optionally, a notification already received within `dedup_window` seconds is dropped, and a notification
+    for a resource already waiting in the queue is merged into the waiting one (coalesce), so each resource is
+    fetched once.
+
+    Example:
+        processor = NotificationProcessor(subscriptions=manager, coalesce=True)
+        # serve processor.wsgi_app at the notification url, then in the workers:
+        notification = processor.get()
+        message = client.get_message(notification.resource_id)
+
+    Args:
+        client_state: The expected clientState, either a string or a callable receiving the subscription id.
+        subscriptions: A SubscriptionManager whose stored clientState is expected, instead of client_state.
+        max_size: Maximum number of queued notifications. A request carrying more is accepted by an empty queue.
+        put_timeout: Seconds to wait for room for a request in a full queue before answering 503.
+        dedup_window: Seconds during which a repeated notification is dropped, 0 to keep them all.
+        dedup_size: Maximum number of notifications remembered for the deduplication.
+        coalesce: If True, the notifications for a resource already in the queue are merged into it.
+
+    """
+
+    def __init__(self, client_state=None, subscriptions=None, max_size=10000, put_timeout=1, dedup_window=0,
+                 dedup_size=100000, coalesce=False):
+        self.client_state = client_state
+        self.subscriptions = subscriptions
+        self.put_timeout = put_timeout
+        self.dedup_window = dedup_window
+        self.dedup_size = dedup_size
+        self.coalesce = coalesce
+        self.max_size = max_size
+        # Unbounded: the room is counted in _size, so that the notifications of a request are accepted together.
+        self.queue = Queue()
+        self._size = 0
+        self._not_full = threading.Condition(threading.Lock())
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+        self._pending = {}
+        self.received = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.coalesced = 0
+
+    def _expected_client_state(self, subscription_id):
+        if self.subscriptions is not None:
+            record = self.subscriptions.get(subscription_id)
+            return record[u'clientState'] if record is not None else False
+        if callable(self.client_state):
+            return self.client_state(subscription_id)
+        return self.client_state
+
+    def _is_duplicate(self, notification, now):
+        key = notification.key()
+        with self._lock:
+            seen_at = self._seen.pop(key, None)
+            self._seen[key] = now
+            while len(self._seen) > self.dedup_size:
+                self._seen.popitem(last=False)
+            if seen_at is not None and now - seen_at < self.dedup_window:
+                self.duplicates += 1
+                return True
+        return False
+
+    def _merge(self, notification):
+        with self._lock:
+            pending = self._pending.get(notification.resource)
+            if pending is None:
+                self._pending[notification.resource] = notification
+                return False
+            pending.change_type = notification.change_type
+            self.coalesced += 1
+            return True
+
+    def handle(self, query_string, body):
+        u"""Handles a request sent to the notification url.
+
+        Args:
+            query_string: The query string of the request.
+            body: The request body.
+
+        Returns:
+            A (status, headers, body) tuple.
+
+        """
+        validation_token = parse_qs(query_string).get(u'validationToken')
+        if validation_token:
+            return 200, {u'Content-Type': u'text/plain'}, validation_token[0]
+        try:
+            values = json.loads(body)[u'value']
+        except (ValueError, KeyError, TypeError):
+            return 400, {}, b''
+        now = time.time()
+        accepted = []
+        for data in values:
+            notification = Notification.from_json(data)
+            with self._lock:
+                self.received += 1
+            if notification.client_state != self._expected_client_state(notification.subscription_id):
+                with self._lock:
+                    self.rejected += 1
+                continue
+            if self.dedup_window and self._is_duplicate(notification, now):
+                continue
+            if self.coalesce and notification.resource is not None and self._merge(notification):
+                continue
+            accepted.append(notification)
+        if not self._reserve(len(accepted)):
+            # Graph delivers the whole request again: forget these notifications so that they are not dropped
+            # as duplicates or merged into nothing then.
+            with self._lock:
+                for notification in accepted:
+                    if self.coalesce and self._pending.get(notification.resource) is notification:
+                        del self._pending[notification.resource]
+                    if self.dedup_window:
+                        self._seen.pop(notification.key(), None)
+            return 503, {u'Retry-After': u'{}'.format(max(1, int(self.put_timeout)))}, b''
+        for notification in accepted:
+            self.queue.put(notification)
+        return 202, {}, b''
+
+    def _reserve(self, count):
+        u"""Waits up to put_timeout seconds for room for count notifications, and takes it."""
+        deadline = time.time() + self.put_timeout
+        with self._not_full:
+            while self._size and self._size + count > self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._not_full.wait(remaining)
+            self._size += count
+        return True
+
+    def wsgi_app(self, environ, start_response):
+        u"""A WSGI application calling handle()."""
+        if environ[u'REQUEST_METHOD'] != u'POST':
+            start_response(b'405 Method Not Allowed', [])
+            return [b'']
+        length = int(environ.get(u'CONTENT_LENGTH') or 0)
+        body = environ[u'wsgi.input'].read(length) if length else b''
+        status, headers, body = self.handle(environ.get(u'QUERY_STRING', u''), body)
+        reasons = {200: b'OK', 202: b'Accepted', 400: b'Bad Request', 503: b'Service Unavailable'}
+        start_response(b'{} {}'.format(status, reasons[status]),
+                       [(str(key), str(value)) for key, value in headers.items()])
+        return [body.encode(u'utf-8') if isinstance(body, unicode) else body]
+
+    def get(self, block=True, timeout=None):
+        u"""Removes and returns the next notification, see Queue.get.
+
+        Raises:
+            Queue.Empty: If no notification arrived in time.
+
+        """
+        notification = self.queue.get(block, timeout)
+        with self._not_full:
+            self._size -= 1
+            self._not_full.notify_all()
+        if self.coalesce:
+            with self._lock:
+                if self._pending.get(notification.resource) is notification:
+                    del self._pending[notification.resource]
+        return notification
+
+    def __iter__(self):
+        u"""Yields the notifications as they arrive."""
+        while True:
+            yield self.get()
+
+    def drain(self):
+        u"""Returns the notifications currently queued without waiting."""
+        notifications = []
+        while True:
+            try:
+                notifications.append(self.get(block=False))
+            except Empty:
+                return notifications
+
+    @property
+    def stats(self):
+        u"""A dict with the number of notifications received, rejected, deduplicated, coalesced and queued."""
+        with self._lock:
+            return {u'received': self.received, u'rejected': self.rejected, u'duplicates': self.duplicates,
+                    u'coalesced': self.coalesced, u'queued': self.queue.qsize()}
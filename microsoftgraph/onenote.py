@@ -0,0 +1,217 @@
+from __future__ import absolute_import
+import json
+import mimetypes
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import open
+from urlparse import urlparse
+
+from microsoftgraph import exceptions
+from microsoftgraph.download import DEFAULT_CHUNK_SIZE, _get
+from microsoftgraph.stores import SQLiteStore
+
+# Links of a page content to its images and attachments, e.g.
+# https://graph.microsoft.com/v1.0/users('me')/onenote/resources/0-8f8d0a2b!1-34C3/$value
+_RESOURCE_URL = re.compile(u'https://[^"\\s<>]+/onenote/resources/([^/"\\s<>]+)/\\$value')
+_UNSAFE = re.compile(u'[\\\\/:*?"<>|\\x00-\\x1f]')
+
+
+class MultipartBody(object):
+    u"""A multipart/form-data body read from its files while it is sent, instead of being built in memory.
+
+    Its length is known in advance, so requests sends it with a Content-Length rather than chunked.
+
+    Args:
+        parts: A list of (name, path, content type).
+        boundary: The multipart boundary, random by default.
+
+    """
+
+    def __init__(self, parts, boundary=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = u'multipart/form-data; boundary=' + self.boundary
+        self._segments = []
+        for name, path, content_type in parts:
+            self._segments.append(u'--{}\r\nContent-Disposition: form-data; name="{}"\r\nContent-Type: {}\r\n\r\n'
+                                  .format(self.boundary, name, content_type).encode(u'utf-8'))
+            self._segments.append((path, os.path.getsize(path)))
+            self._segments.append(b'\r\n')
+        self._segments.append(u'--{}--\r\n'.format(self.boundary).encode(u'utf-8'))
+        self._length = sum(len(segment) if isinstance(segment, bytes) else segment[1] for segment in self._segments)
+        self._file = None
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(DEFAULT_CHUNK_SIZE), b'')
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if offset != 0 or whence != 0:
+            raise IOError(u'A multipart body can only be rewound.')
+        self.close()
+        self._index = self._offset = self._position = 0
+
+    def read(self, size=-1):
+        remaining = self._length - self._position if size is None or size < 0 else size
+        chunks = []
+        while remaining > 0 and self._index < len(self._segments):
+            segment = self._segments[self._index]
+            if isinstance(segment, bytes):
+                chunk = segment[self._offset:self._offset + remaining]
+                segment_size = len(segment)
+            else:
+                path, segment_size = segment
+                if self._file is None:
+                    self._file = open(path, u'rb')
+                chunk = self._file.read(min(remaining, segment_size - self._offset))
+                if not chunk:
+                    raise IOError(u'{} changed while it was sent.'.format(path))
+            chunks.append(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+            remaining -= len(chunk)
+            if self._offset >= segment_size:
+                self.close()
+                self._index += 1
+                self._offset = 0
+        return b''.join(chunks)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def create_page(client, section_id, html_path, resources=None):
+    u"""Creates a page from an HTML file and its resources, streaming them from disk. See Client.create_pages.
+
+    A POST is not retried by the client, but a 429 means the page was not created: the creation is sent again
+    after the delay given by the retry policy, which follows the Retry-After header of the response.
+
+    """
+    parts = [(u'Presentation', html_path, u'text/html')]
+    for name, resource in sorted((resources or {}).items()):
+        path, content_type = resource if isinstance(resource, tuple) else (resource, None)
+        parts.append((name, path, content_type or mimetypes.guess_type(path)[0] or u'application/octet-stream'))
+    body = MultipartBody(parts)
+    url = client.base_url + u'me/onenote/sections/{}/pages'.format(section_id)
+    attempt, start = 0, time.time()
+    try:
+        while True:
+            body.seek(0)
+            try:
+                return client._post(url, data=body, headers={u'Content-Type': body.content_type})
+            except exceptions.TooManyRequests as e:
+                delay = client.retry_policy.get_delay(e.response, attempt, time.time() - start) \
+                    if e.response is not None else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+    finally:
+        body.close()
+
+
+def safe_name(name, default):
+    u"""Returns a display name usable as a file name."""
+    name = _UNSAFE.sub(u'_', name or u'').strip(u' .')[:100]
+    return name or default
+
+
+def _download_resource(client, url, path):
+    if os.path.exists(path):
+        return False
+    response = _get(client, url, headers={u'Authorization': u'Bearer ' + client._access_token()})
+    part = path + u'.part'
+    try:
+        with open(part, u'wb') as f:
+            for chunk in response.iter_content(DEFAULT_CHUNK_SIZE):
+                f.write(chunk)
+    finally:
+        response.close()
+    os.rename(part, path)
+    return True
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        # Pages of a section are exported concurrently and may create its directory together.
+        if not os.path.isdir(path):
+            raise
+
+
+def _write(path, text):
+    if isinstance(text, bytes):
+        text = text.decode(u'utf-8')
+    part = path + u'.part'
+    with open(part, u'w', encoding=u'utf-8') as f:
+        f.write(text)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(part, path)
+
+
+def export_notebooks(client, directory, state_store=None, notebook_ids=None, max_workers=4, on_progress=None):
+    u"""Exports the pages of notebooks to a directory, see Client.export_notebooks."""
+    _makedirs(directory)
+    if state_store is None:
+        state_store = SQLiteStore(os.path.join(directory, u'.export.sqlite'))
+    stats = {u'notebooks': 0, u'sections': 0, u'pages': 0, u'skipped': 0, u'resources': 0, u'failed': []}
+
+    def walk():
+        for notebook in client.iter(client.list_notebooks):
+            if notebook_ids is not None and notebook[u'id'] not in notebook_ids:
+                continue
+            stats[u'notebooks'] += 1
+            notebook_dir = os.path.join(directory, safe_name(notebook.get(u'displayName'), notebook[u'id']))
+            for section in client.iter(client.get_notebook_sections, notebook[u'id']):
+                stats[u'sections'] += 1
+                section_dir = os.path.join(notebook_dir, safe_name(section.get(u'displayName'), section[u'id']))
+                for page in client.iter(client.list_section_pages, section[u'id'], page_size=100):
+                    state = state_store.get(page[u'id'])
+                    if state is not None and state[u'modified'] == page.get(u'lastModifiedDateTime'):
+                        stats[u'skipped'] += 1
+                        continue
+                    yield page, os.path.join(section_dir, safe_name(page[u'id'], u'page'))
+
+    resource_pool = ThreadPoolExecutor(max_workers=max_workers)
+    graph_host = urlparse(client.RESOURCE).netloc
+
+    def export_page(page, page_dir):
+        _makedirs(os.path.join(page_dir, u'resources'))
+        html = client.get_page_content(page[u'id'])
+        local = {}
+        for match in _RESOURCE_URL.finditer(html):
+            # The page content is authored by users: the token is only sent to Graph itself.
+            if urlparse(match.group(0)).netloc == graph_host:
+                local.setdefault(match.group(0), u'resources/' + safe_name(match.group(1), u'resource'))
+        downloads = [resource_pool.submit(_download_resource, client, url, os.path.join(page_dir, relative))
+                     for url, relative in local.items()]
+        downloaded = sum(1 for future in downloads if future.result())
+        _write(os.path.join(page_dir, u'page.html'),
+               _RESOURCE_URL.sub(lambda match: local.get(match.group(0), match.group(0)), html))
+        _write(os.path.join(page_dir, u'page.json'), json.dumps(dict(page.items()), indent=2, ensure_ascii=False))
+        state_store.set(page[u'id'], {u'modified': page.get(u'lastModifiedDateTime'), u'path': page_dir})
+        return downloaded
+
+    try:
+        for result in client.map(export_page, walk(), max_workers=max_workers, ordered=False,
+                                 on_progress=on_progress):
+            if result.ok:
+                stats[u'pages'] += 1
+                stats[u'resources'] += result.value
+            else:
+                stats[u'failed'].append((result.item[0][u'id'], result.exception))
+    finally:
+        resource_pool.shutdown(wait=True)
+    return stats
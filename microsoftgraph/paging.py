@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PageIterator(object):
+    u"""Lazily walks a collection by following its @odata.nextLink.
+
+    Iterating yields the items of the 'value' arrays one at a time; pages() yields the raw page dicts. Only the
+    page being consumed is kept in memory (plus the next one when prefetch is enabled).
+
+    Args:
+        client: The Client used to fetch the next pages.
+        fetch: A callable returning the first page.
+        max_items: Stop after this many items.
+        prefetch: If True, the next page is requested in a background thread while the current one is consumed.
+
+    """
+
+    def __init__(self, client, fetch, max_items=None, prefetch=False):
+        self.client = client
+        self.fetch = fetch
+        self.max_items = max_items
+        self.prefetch = prefetch
+
+    def __iter__(self):
+        if self.max_items is not None and self.max_items <= 0:
+            return
+        count = 0
+        for page in self.pages():
+            for item in page.get(u'value', []):
+                yield item
+                count += 1
+                if self.max_items is not None and count >= self.max_items:
+                    return
+
+    def pages(self):
+        u"""Yields every page of the collection."""
+        if not self.prefetch:
+            page = self.fetch()
+            while page is not None:
+                yield page
+                next_link = page.get(u'@odata.nextLink')
+                page = self.client._get(next_link) if next_link else None
+            return
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self.fetch)
+            while future is not None:
+                page = future.result()
+                next_link = page.get(u'@odata.nextLink')
+                future = executor.submit(self.client._get, next_link) if next_link else None
+                yield page
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
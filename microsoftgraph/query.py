@@ -0,0 +1,224 @@
+from __future__ import absolute_import
+import warnings
+from urlparse import parse_qs, urlparse
+
+from microsoftgraph.hooks import url_template
+
+DEFAULT_PROJECTIONS = {}
+
+_MESSAGE_LIST = (u'id', u'subject', u'from', u'toRecipients', u'receivedDateTime', u'isRead', u'hasAttachments',
+                 u'importance', u'bodyPreview', u'conversationId', u'parentFolderId')
+_MESSAGE = _MESSAGE_LIST + (u'body', u'ccRecipients', u'bccRecipients', u'replyTo', u'sentDateTime',
+                            u'internetMessageId')
+_EVENT_LIST = (u'id', u'subject', u'start', u'end', u'isAllDay', u'showAs', u'isCancelled', u'location',
+               u'organizer', u'bodyPreview', u'webLink')
+_EVENT = _EVENT_LIST + (u'body', u'attendees', u'recurrence', u'onlineMeeting')
+_CONTACT = (u'id', u'displayName', u'givenName', u'surname', u'emailAddresses', u'businessPhones', u'mobilePhone',
+            u'companyName', u'jobTitle')
+
+# Projections of the common mail, calendar, contacts and profile endpoints, keeping the properties most
+# applications use. They are not applied unless enabled, see use_recommended_projections.
+RECOMMENDED_PROJECTIONS = {
+    u'me': (u'id', u'displayName', u'givenName', u'surname', u'mail', u'userPrincipalName', u'jobTitle',
+            u'preferredLanguage'),
+    u'me/messages': _MESSAGE_LIST,
+    u'me/messages/{id}': _MESSAGE,
+    u'me/mailFolders/inbox/messages': _MESSAGE_LIST,
+    u'me/mailFolders/{id}/messages': _MESSAGE_LIST,
+    u'me/events': _EVENT_LIST,
+    u'me/events/{id}': _EVENT,
+    u'me/calendars/{id}/events': _EVENT_LIST,
+    u'me/contacts': _CONTACT,
+    u'me/contacts/{id}': _CONTACT,
+    u'me/contactFolders/{id}/contacts': _CONTACT,
+}
+
+# Endpoints whose responses are not entities that $select could trim.
+_UNPROJECTABLE = (u'content', u'$value', u'$count', u'$batch', u'delta')
+
+
+class ProjectionWarning(UserWarning):
+    u"""Warns about a GET request fetching whole entities, see Client(strict_projection=True)."""
+
+
+class Query(object):
+    u"""Builds the OData query parameters of a request. Pass it as the params of any Client method.
+
+    Every method returns a new Query, so a base query can be shared and refined.
+
+    Example:
+        query = Query().select(u'id', u'subject', u'from').filter(u'isRead eq false').orderby(
+            u'receivedDateTime desc').top(50)
+        client.get_message(message_id, params=query)
+
+    Args:
+        select: Properties to return.
+        expand: Relationships to expand, e.g. u'attachments($select=name)'.
+        filter: The $filter expression.
+        orderby: Properties to sort by, each optionally followed by asc or desc.
+        top: Page size.
+        skip: Number of items to skip.
+        search: The $search text.
+        count: If True, the response carries @odata.count.
+        params: Other query parameters.
+
+    """
+
+    def __init__(self, select=None, expand=None, filter=None, orderby=None, top=None, skip=None, search=None,
+                 count=None, params=None):
+        self._select = tuple(select or ())
+        self._expand = tuple(expand or ())
+        self._filter = filter
+        self._orderby = tuple(orderby or ())
+        self._top = top
+        self._skip = skip
+        self._search = search
+        self._count = count
+        self._params = dict(params or {})
+
+    def _copy(self, **changes):
+        values = {u'select': self._select, u'expand': self._expand, u'filter': self._filter,
+                  u'orderby': self._orderby, u'top': self._top, u'skip': self._skip, u'search': self._search,
+                  u'count': self._count, u'params': self._params}
+        values.update(changes)
+        return Query(**values)
+
+    @staticmethod
+    def _names(names):
+        for name in names:
+            if not isinstance(name, basestring) or not name:
+                raise TypeError(u'Expected a property name, got {!r}'.format(name))
+        return tuple(names)
+
+    def select(self, *properties):
+        u"""Adds properties to $select."""
+        return self._copy(select=self._select + self._names(properties))
+
+    def expand(self, *relationships):
+        u"""Adds relationships to $expand."""
+        return self._copy(expand=self._expand + self._names(relationships))
+
+    def filter(self, expression):
+        u"""Sets $filter, or combines it with the current one with 'and'."""
+        if not isinstance(expression, basestring):
+            raise TypeError(u'Expected a filter expression, got {!r}'.format(expression))
+        if self._filter:
+            expression = u'({}) and ({})'.format(self._filter, expression)
+        return self._copy(filter=expression)
+
+    def orderby(self, *properties):
+        u"""Adds properties to $orderby, e.g. orderby(u'receivedDateTime desc')."""
+        return self._copy(orderby=self._orderby + self._names(properties))
+
+    def top(self, count):
+        u"""Sets $top."""
+        if not isinstance(count, (int, long)) or isinstance(count, bool) or count <= 0:
+            raise TypeError(u'$top must be a positive integer, got {!r}'.format(count))
+        return self._copy(top=count)
+
+    def skip(self, count):
+        u"""Sets $skip."""
+        if not isinstance(count, (int, long)) or isinstance(count, bool) or count < 0:
+            raise TypeError(u'$skip must be a non-negative integer, got {!r}'.format(count))
+        return self._copy(skip=count)
+
+    def search(self, text):
+        u"""Sets $search. The text is quoted if it is not already."""
+        if not isinstance(text, basestring):
+            raise TypeError(u'Expected a search text, got {!r}'.format(text))
+        if not (text.startswith(u'"') and text.endswith(u'"')):
+            text = u'"{}"'.format(text.replace(u'"', u'\\"'))
+        return self._copy(search=text)
+
+    def count(self, enabled=True):
+        u"""Sets $count."""
+        return self._copy(count=enabled)
+
+    def params(self, **params):
+        u"""Adds other query parameters."""
+        return self._copy(params=dict(self._params, **params))
+
+    @property
+    def selected(self):
+        return self._select
+
+    def to_params(self):
+        u"""Returns the query parameters dict."""
+        params = dict(self._params)
+        if self._select:
+            params[u'$select'] = u','.join(self._select)
+        if self._expand:
+            params[u'$expand'] = u','.join(self._expand)
+        if self._filter:
+            params[u'$filter'] = self._filter
+        if self._orderby:
+            params[u'$orderby'] = u','.join(self._orderby)
+        if self._top is not None:
+            params[u'$top'] = self._top
+        if self._skip is not None:
+            params[u'$skip'] = self._skip
+        if self._search is not None:
+            params[u'$search'] = self._search
+        if self._count is not None:
+            params[u'$count'] = u'true' if self._count else u'false'
+        return params
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.to_params() == other.to_params()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return u'Query({!r})'.format(self.to_params())
+
+
+def set_default_projection(template, properties):
+    u"""Sets the properties selected by default on an endpoint for every Client.
+
+    Args:
+        template: The endpoint, as given by microsoftgraph.hooks.url_template, e.g. u'me/messages/{id}'.
+        properties: The properties to $select, or None to remove the default.
+
+    """
+    if properties is None:
+        DEFAULT_PROJECTIONS.pop(template, None)
+    else:
+        DEFAULT_PROJECTIONS[template] = tuple(properties)
+
+
+def use_recommended_projections():
+    u"""Enables RECOMMENDED_PROJECTIONS for every Client, keeping the default projections already set.
+
+    To enable them for one client only, pass Client(projections=RECOMMENDED_PROJECTIONS).
+
+    """
+    for template, properties in RECOMMENDED_PROJECTIONS.items():
+        DEFAULT_PROJECTIONS.setdefault(template, properties)
+
+
+def project(url, params, projections=None, strict=False):
+    u"""Returns the query parameters of a GET request with the default projection of its endpoint applied.
+
+    Args:
+        url: The request url.
+        params: The query parameters, a dict or a Query, or None.
+        projections: Projections of the client, taking precedence over DEFAULT_PROJECTIONS.
+        strict: If True, a ProjectionWarning is issued when the request selects nothing.
+
+    """
+    if isinstance(params, Query):
+        params = params.to_params()
+    if (params and u'$select' in params) or (not DEFAULT_PROJECTIONS and not projections and not strict):
+        return params
+    query = urlparse(url).query
+    if query and u'$select' in parse_qs(query):
+        return params
+    template = url_template(url)
+    properties = (projections or {}).get(template) or DEFAULT_PROJECTIONS.get(template)
+    if properties:
+        return dict(params or {}, **{u'$select': u','.join(properties)})
+    if strict and template.rpartition(u'/')[2] not in _UNPROJECTABLE:
+        warnings.warn(u'GET {} fetches whole entities, add a $select or a default projection.'.format(template),
+                      ProjectionWarning, stacklevel=6)
+    return params
@@ -0,0 +1,159 @@
+from __future__ import absolute_import
+import json
+import sqlite3
+import threading
+import time
+from urlparse import urlparse
+
+FAMILIES = (
+    (u'subscriptions', (u'/subscriptions',)),
+    (u'onenote', (u'/onenote/',)),
+    (u'drive', (u'/drive', u'/workbook/')),
+    (u'mail', (u'/messages', u'/mailfolders', u'/sendmail', u'/events', u'/calendar', u'/contacts',
+               u'/contactfolders')),
+)
+
+
+def resource_family(url):
+    u"""Returns the throttling family of a Graph url: mail, drive, onenote, subscriptions or default."""
+    path = urlparse(url).path.lower()
+    for family, markers in FAMILIES:
+        if any(marker in path for marker in markers):
+            return family
+    return u'default'
+
+
+class MemoryBackend(object):
+    u"""Keeps the limiter state in this process, shared by every thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def update(self, key, func):
+        u"""Atomically replaces the state of key by func(state)[0] and returns func(state)[1]. The state is None
+        the first time."""
+        with self._lock:
+            state, result = func(self._states.get(key))
+            self._states[key] = state
+            return result
+
+
+class SQLiteBackend(object):
+    u"""Keeps the limiter state in a SQLite database so that every process of a host shares the same rates.
+
+    Args:
+        path: The database file.
+        timeout: Seconds to wait for the database lock.
+
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(u'CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, state TEXT)')
+        connection.commit()
+
+    def _connection(self):
+        connection = getattr(self._local, u'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def update(self, key, func):
+        connection = self._connection()
+        key = json.dumps(key)
+        connection.execute(u'BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(u'SELECT state FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            state, result = func(json.loads(row[0]) if row else None)
+            connection.execute(u'INSERT OR REPLACE INTO rate_limits (key, state) VALUES (?, ?)',
+                               (key, json.dumps(state)))
+        except Exception:
+            connection.execute(u'ROLLBACK')
+            raise
+        connection.execute(u'COMMIT')
+        return result
+
+
+class RateLimiter(object):
+    u"""Token bucket limiter with an AIMD rate per (account, resource family).
+
+    Every request takes a token; the bucket is refilled at the current rate. A throttled response halves the rate
+    (multiplicative decrease) and each successful one adds `increase` requests per second back (additive
+    increase), between min_rate and max_rate.
+
+    Args:
+        rate: Initial requests per second of each key.
+        burst: Size of the bucket, i.e. how many requests can be sent at once after an idle period.
+        min_rate: Lower bound of the rate.
+        max_rate: Upper bound of the rate.
+        increase: Requests per second added after each successful response.
+        decrease: Factor applied to the rate after a throttled response.
+        backend: Where the state is kept, MemoryBackend() by default. Use a SQLiteBackend, or any object with the
+        same update method, to share the limits between processes.
+
+    """
+    THROTTLE_STATUS_CODES = frozenset([429, 503])
+
+    def __init__(self, rate=10.0, burst=10, min_rate=0.5, max_rate=100.0, increase=0.1, decrease=0.5,
+                 backend=None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def _new_state(self, now):
+        return {u'rate': self.rate, u'tokens': float(self.burst), u'updated': now}
+
+    def acquire(self, key):
+        u"""Blocks until a request can be sent for key.
+
+        Returns:
+            The seconds spent waiting.
+
+        """
+        waited = 0.0
+        while True:
+            delay = self.backend.update(key, self._take)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def _take(self, state):
+        now = time.time()
+        if state is None:
+            state = self._new_state(now)
+        tokens = min(float(self.burst), state[u'tokens'] + (now - state[u'updated']) * state[u'rate'])
+        state = {u'rate': state[u'rate'], u'tokens': tokens, u'updated': now}
+        if tokens >= 1:
+            state[u'tokens'] = tokens - 1
+            return state, 0
+        return state, (1 - tokens) / state[u'rate']
+
+    def feedback(self, key, status_code):
+        u"""Adjusts the rate of key after a response with status_code."""
+        throttled = status_code in self.THROTTLE_STATUS_CODES
+
+        def adjust(state):
+            state = state or self._new_state(time.time())
+            if throttled:
+                state[u'rate'] = max(self.min_rate, state[u'rate'] * self.decrease)
+                state[u'tokens'] = min(state[u'tokens'], 0.0)
+            else:
+                state[u'rate'] = min(self.max_rate, state[u'rate'] + self.increase)
+            return state, state[u'rate']
+
+        return self.backend.update(key, adjust)
+
+    def get_rate(self, key):
+        u"""Returns the current requests per second of key."""
+        return self.backend.update(key, lambda state: (state or self._new_state(time.time()),
+                                                       (state or {}).get(u'rate', self.rate)))
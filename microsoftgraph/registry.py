@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+
+from microsoftgraph.client import Client
+from microsoftgraph.retry import RetryPolicy
+from microsoftgraph.stores import MemoryStore
+
+
+class ClientRegistry(object):
+    u"""Hands out one Client per account, all sharing the same connection pool, rate limiter and retry policy.
+
+    The clients are cheap views: only the most recently used max_clients are kept, the others are rebuilt on
+    demand from the token store.
+
+    Args:
+        client_id: The application id.
+        client_secret: The application secret.
+        token_store: Where the tokens are kept, a MemoryStore, FileStore or SQLiteStore from microsoftgraph.stores.
+        redirect_uri: If set, the tokens are refreshed automatically and the new ones saved in the token store.
+        max_clients: Number of clients kept in memory.
+        rate_limiter: A RateLimiter shared by every client, each account having its own rates.
+        retry_policy: A RetryPolicy shared by every client.
+        pool_connections: Number of per-host connection pools to cache.
+        pool_maxsize: Maximum number of connections kept alive per host.
+        kwargs: Other Client arguments (api_version, account_type, office365, timeout...).
+
+    """
+
+    def __init__(self, client_id, client_secret, token_store=None, redirect_uri=None, max_clients=1024,
+                 rate_limiter=None, retry_policy=None, pool_connections=10, pool_maxsize=10, **kwargs):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_store = token_store if token_store is not None else MemoryStore()
+        self.redirect_uri = redirect_uri
+        self.max_clients = max_clients
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.session = kwargs.pop(u'session', None) or Client._create_session(
+            pool_connections, pool_maxsize, kwargs.pop(u'pool_block', False), kwargs.pop(u'keep_alive', True))
+        self.client_kwargs = kwargs
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._loading = {}
+
+    def get(self, account):
+        u"""Returns the Client of an account, with its token loaded from the token store.
+
+        A missing client is built outside of the registry lock, so reading its token does not hold up the other
+        accounts; the threads asking for the same account meanwhile wait for it.
+
+        Args:
+            account: The account key, e.g. the user principal name or the tenant id.
+
+        Returns:
+            A Client.
+
+        """
+        with self._lock:
+            client = self._clients.pop(account, None)
+            if client is not None:
+                self._clients[account] = client
+                return client
+            loading = self._loading.get(account)
+            creating = loading is None
+            if creating:
+                loading = self._loading[account] = {u'ready': Future(), u'token': None, u'removed': False}
+        if not creating:
+            return loading[u'ready'].result()
+        try:
+            client = self._create(account)
+        except Exception as e:
+            with self._lock:
+                del self._loading[account]
+            loading[u'ready'].set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[account]
+            # The token store may have changed while it was read.
+            if loading[u'token'] is not None:
+                client.set_token(loading[u'token'])
+            if not loading[u'removed']:
+                self._clients[account] = client
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+        loading[u'ready'].set_result(client)
+        return client
+
+    __getitem__ = get
+
+    def _create(self, account):
+        client = Client(self.client_id, self.client_secret, session=self.session, rate_limiter=self.rate_limiter,
+                        rate_limit_account=account, retry_policy=self.retry_policy, **self.client_kwargs)
+        token = self.token_store.get(account)
+        if token is not None:
+            client.set_token(token)
+        if self.redirect_uri is not None:
+            client.manage_token(self.redirect_uri, on_refresh=partial(self.token_store.set, account))
+        return client
+
+    def set_token(self, account, token):
+        u"""Saves the token of an account and hands it to its client if it is loaded."""
+        self.token_store.set(account, token)
+        with self._lock:
+            client = self._clients.get(account)
+            if client is None and account in self._loading:
+                self._loading[account][u'token'] = token
+        if client is not None:
+            client.set_token(token)
+
+    def remove(self, account):
+        u"""Forgets an account and its token."""
+        self.token_store.delete(account)
+        with self._lock:
+            self._clients.pop(account, None)
+            if account in self._loading:
+                self._loading[account][u'removed'] = True
+
+    def close(self):
+        u"""Closes the shared connection pool."""
+        self.session.close()
@@ -0,0 +1,200 @@
+from __future__ import absolute_import
+import base64
+import json
+import re
+import threading
+import time
+from datetime import timedelta
+from urlparse import parse_qsl, urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from microsoftgraph.stores import MemoryStore
+
+
+def fixture_key(method, url):
+    u"""Returns the key of a request in a fixture store: the method and the url without host, with a decoded and
+    sorted query string, e.g. 'GET /v1.0/me/messages?$top=10'."""
+    parsed = urlparse(url)
+    pairs = sorted(parse_qsl(parsed.query, keep_blank_values=True))
+    query = u'&'.join(u'{}={}'.format(*[value.decode(u'utf-8') if isinstance(value, bytes) else value
+                                         for value in pair]) for pair in pairs)
+    path = parsed.path.decode(u'utf-8') if isinstance(parsed.path, bytes) else parsed.path
+    return u'{} {}{}'.format(method.upper(), path, u'?' + query if query else u'')
+
+
+def _not_found(key):
+    return (404, {u'Content-Type': u'application/json'},
+            json.dumps({u'error': {u'code': u'itemNotFound', u'message': u'No fixture for ' + key}}))
+
+
+def fixture(status=200, json_body=None, body=b'', headers=None):
+    u"""Returns a recorded response, the value kept in a fixture store."""
+    headers = dict(headers or {})
+    if json_body is not None:
+        body = json.dumps(json_body)
+        headers.setdefault(u'Content-Type', u'application/json')
+    if isinstance(body, unicode):
+        body = body.encode(u'utf-8')
+    return {u'status': status, u'headers': headers, u'body': base64.b64encode(body)}
+
+
+class ReplayTransport(object):
+    u"""Serves recorded or synthetic Graph responses instead of sending the requests, see Client(transport=...).
+
+    The responses are looked up in a fixture store by fixture_key(). A key holds a list of responses served in
+    turn, the last one being repeated, so a 429 followed by a 200 replays a throttled request. Routes (a regular
+    expression on the key and a callable) answer the requests whose response depends on their content, such as
+    JSON batches, Range downloads or upload sessions. A request matching nothing gets a 404, or is sent through
+    `record_from` and stored when it is set.
+
+    Example:
+        transport = ReplayTransport(FileStore('fixtures'), latency=0.02)
+        transport.add(u'GET', u'https://graph.microsoft.com/v1.0/me', json_body={u'id': u'1'})
+        client = Client(u'id', u'secret', transport=transport)
+
+    Args:
+        store: The fixture store, a store from microsoftgraph.stores.
+        latency: Seconds to wait before answering, or a callable receiving the PreparedRequest and returning them.
+        record_from: A requests.Session sending the requests missing from the store, whose responses are recorded.
+
+    """
+
+    def __init__(self, store=None, latency=0, record_from=None):
+        self.store = store if store is not None else MemoryStore()
+        self.latency = latency
+        self.record_from = record_from
+        self.routes = []
+        self.requests = []
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._served = {}
+        self._decoded = {}
+
+    def add(self, method, url, status=200, json_body=None, body=b'', headers=None):
+        u"""Appends a response to the ones served for a request."""
+        key = fixture_key(method, url)
+        with self._lock:
+            self.store.set(key, (self.store.get(key) or []) + [fixture(status, json_body, body, headers)])
+
+    def add_throttling(self, method, url, count=1, retry_after=1):
+        u"""Makes the next `count` responses of a request 429 Too Many Requests with a Retry-After header.
+
+        The responses added before are served after them.
+
+        """
+        key = fixture_key(method, url)
+        throttled = fixture(429, {u'error': {u'code': u'TooManyRequests', u'message': u'Throttled'}},
+                            headers={u'Retry-After': u'{}'.format(retry_after)})
+        with self._lock:
+            self.store.set(key, [throttled] * count + (self.store.get(key) or []))
+            self._served.pop(key, None)
+
+    def add_pages(self, url, items, page_size):
+        u"""Serves a collection of items as pages of page_size items linked by @odata.nextLink.
+
+        Returns:
+            The number of pages.
+
+        """
+        pages = [items[start:start + page_size] for start in range(0, len(items), page_size)] or [[]]
+        page_url = url
+        for index, page in enumerate(pages):
+            body = {u'value': page}
+            if index + 1 < len(pages):
+                separator = u'&' if urlparse(url).query else u'?'
+                body[u'@odata.nextLink'] = u'{}{}$skiptoken={}'.format(url, separator, index + 1)
+            self.add(u'GET', page_url, json_body=body)
+            page_url = body.get(u'@odata.nextLink')
+        return len(pages)
+
+    def route(self, pattern, handler):
+        u"""Answers the requests whose fixture key matches a regular expression with a handler.
+
+        Args:
+            pattern: The regular expression, e.g. u'^POST /v1.0/\\$batch$'.
+            handler: A callable receiving the requests.PreparedRequest and returning (status, headers, body).
+
+        """
+        self.routes.append((re.compile(pattern), handler))
+
+    def request(self, method, url, params=None, data=None, headers=None, json=None, files=None, stream=False,
+                timeout=None, **kwargs):
+        u"""Answers a request like requests.Session.request."""
+        prepared = requests.Request(method, url, headers=headers, params=params, data=data, json=json,
+                                    files=files).prepare()
+        key = fixture_key(prepared.method, prepared.url)
+        with self._lock:
+            self.requests.append(key)
+        start = time.time()
+        latency = self.latency(prepared) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        response = self._route(key, prepared) or self._replay(key)
+        if response is None:
+            if self.record_from is not None:
+                response = self.record_from.send(prepared, stream=False, timeout=timeout)
+                with self._lock:
+                    self.store.set(key, (self.store.get(key) or []) + [fixture(
+                        response.status_code, body=response.content, headers=self._recorded_headers(response))])
+                return response
+            with self._lock:
+                self.misses += 1
+            response = _not_found(key)
+        return self._response(prepared, response, timedelta(seconds=time.time() - start))
+
+    def _route(self, key, prepared):
+        for pattern, handler in self.routes:
+            if pattern.search(key):
+                status, headers, body = handler(prepared)
+                headers = dict(headers or {})
+                if not isinstance(body, (bytes, unicode)):
+                    body = json.dumps(body)
+                    headers.setdefault(u'Content-Type', u'application/json')
+                return status, headers, body.encode(u'utf-8') if isinstance(body, unicode) else body
+        return None
+
+    def _replay(self, key):
+        with self._lock:
+            responses = self.store.get(key)
+            if not responses:
+                return None
+            index = min(self._served.get(key, 0), len(responses) - 1)
+            self._served[key] = index + 1
+            recorded = responses[index]
+            decoded = self._decoded.get(recorded[u'body'])
+            if decoded is None:
+                decoded = self._decoded[recorded[u'body']] = base64.b64decode(recorded[u'body'])
+            return recorded[u'status'], recorded[u'headers'], decoded
+
+    @staticmethod
+    def _recorded_headers(response):
+        # The body is stored decoded, so its transfer headers do not apply anymore.
+        return dict((name, value) for name, value in response.headers.items()
+                    if name.lower() not in (u'content-encoding', u'content-length', u'transfer-encoding'))
+
+    @staticmethod
+    def _response(prepared, replayed, elapsed):
+        status, headers, body = replayed
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response._content_consumed = True
+        response.encoding = u'utf-8'
+        response.url = prepared.url
+        response.request = prepared
+        response.elapsed = elapsed
+        return response
+
+    def reset(self):
+        u"""Serves every request from its first response again and forgets the requests received."""
+        with self._lock:
+            self._served.clear()
+            self._decoded.clear()
+            del self.requests[:]
+            self.misses = 0
+
+    def close(self):
+        pass
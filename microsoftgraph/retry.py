@@ -0,0 +1,91 @@
+from __future__ import absolute_import
+import random
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+
+class RetryPolicy(object):
+    u"""Decides when Client._request sends a throttled request again and how long it waits before.
+
+    The wait is the Retry-After header of the response when there is one, otherwise an exponential backoff with
+    full jitter so that clients throttled together do not come back together. A request is never retried before
+    its Retry-After: when that is longer than max_backoff or than the time left, the response is given up on.
+
+    Args:
+        max_retries: Maximum number of retries of one request.
+        backoff_factor: Base of the exponential backoff, in seconds.
+        max_backoff: Upper bound of a single wait, in seconds. A longer Retry-After is not waited for.
+        max_total_time: Maximum time spent on one request including the retries, in seconds.
+        retry_non_idempotent: If True, POST and PATCH requests are retried too.
+        status_codes: The status codes that are retried.
+
+    """
+    IDEMPOTENT_METHODS = frozenset([u'GET', u'HEAD', u'OPTIONS', u'PUT', u'DELETE'])
+    STATUS_CODES = frozenset([429, 503, 504])
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60, max_total_time=300,
+                 retry_non_idempotent=False, status_codes=STATUS_CODES):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_total_time = max_total_time
+        self.retry_non_idempotent = retry_non_idempotent
+        self.status_codes = frozenset(status_codes)
+
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+        self.throttled_time = 0.0
+
+    def can_retry(self, method, kwargs):
+        u"""Whether a request may be sent again at all: its method is idempotent (or opted in) and its body can
+        be replayed."""
+        if method.upper() not in self.IDEMPOTENT_METHODS and not self.retry_non_idempotent:
+            return False
+        data = kwargs.get(u'data')
+        return u'files' not in kwargs and not hasattr(data, u'read') and not hasattr(data, u'next')
+
+    def get_delay(self, response, attempt, elapsed):
+        u"""Returns the seconds to wait before retrying the response, or None if it must not be retried.
+
+        Args:
+            response: The requests.Response received.
+            attempt: Number of retries already done.
+            elapsed: Seconds spent on the request so far.
+
+        """
+        if response.status_code not in self.status_codes or attempt >= self.max_retries:
+            return None
+        delay = self._retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+        elif delay > self.max_backoff:
+            return None
+        if elapsed + delay > self.max_total_time:
+            return None
+        with self._lock:
+            self.retries += 1
+            if response.status_code == 429:
+                self.throttled += 1
+            self.throttled_time += delay
+        return delay
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get(u'Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = parsedate_tz(value)
+            if date is None:
+                return None
+            return max(0.0, mktime_tz(date) - time.time())
+
+    @property
+    def stats(self):
+        u"""A dict with the number of retries, of 429 responses and the seconds spent waiting."""
+        with self._lock:
+            return {u'retries': self.retries, u'throttled': self.throttled, u'throttled_time': self.throttled_time}
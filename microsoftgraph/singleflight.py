@@ -0,0 +1,50 @@
+from __future__ import absolute_import
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight(object):
+    u"""Runs one call per key at a time: callers arriving while a call is in flight wait for its result.
+
+    Client uses it to send identical concurrent GET requests once. The waiting callers get the very same parsed
+    result (or exception) as the caller that sent the request, so treat the results as read-only.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, func):
+        u"""Returns func(), or the result of the call in flight for key."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._calls[key] = Future()
+            else:
+                self.hits += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self._done(key)
+            future.set_exception(e)
+            raise
+        self._done(key)
+        future.set_result(result)
+        return result
+
+    def _done(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    @property
+    def stats(self):
+        u"""A dict with the number of calls that joined one in flight (hits) and that were sent (misses)."""
+        with self._lock:
+            return {u'hits': self.hits, u'misses': self.misses, u'in_flight': len(self._calls)}
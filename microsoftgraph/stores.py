@@ -0,0 +1,140 @@
+from __future__ import absolute_import
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from io import open
+
+
+class MemoryStore(object):
+    u"""Key/value store kept in memory.
+
+    Args:
+        max_size: If set, the least recently used keys are dropped beyond this size.
+
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if self.max_size is not None:
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+
+class FileStore(object):
+    u"""Key/value store writing one JSON file per key in a directory.
+
+    Args:
+        directory: The directory, created if needed.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode(u'utf-8')).hexdigest() + u'.json')
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), u'r', encoding=u'utf-8') as f:
+                return json.load(f)[u'value']
+        except (IOError, OSError, ValueError):
+            return default
+
+    def set(self, key, value):
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=u'.tmp')
+        with os.fdopen(fd, u'wb') as f:
+            f.write(json.dumps({u'key': key, u'value': value}).encode(u'utf-8'))
+        os.rename(path, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def keys(self):
+        keys = []
+        for name in os.listdir(self.directory):
+            if name.endswith(u'.json'):
+                try:
+                    with open(os.path.join(self.directory, name), u'r', encoding=u'utf-8') as f:
+                        keys.append(json.load(f)[u'key'])
+                except (IOError, OSError, ValueError):
+                    pass
+        return keys
+
+
+class SQLiteStore(object):
+    u"""Key/value store kept in a table of a SQLite database, usable from several threads and processes.
+
+    Args:
+        path: The database file.
+        table: The table name, so that several stores can share one database.
+        timeout: Seconds to wait for the database lock.
+
+    """
+
+    def __init__(self, path, table=u'store', timeout=30):
+        if not re.match(u'^[A-Za-z_][A-Za-z0-9_]*$', table):
+            raise ValueError(u'Invalid table name: {}'.format(table))
+        self.path = path
+        self.table = table
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(u'CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, value TEXT)'.format(table))
+
+    def _connection(self):
+        connection = getattr(self._local, u'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key, default=None):
+        row = self._connection().execute(u'SELECT value FROM {} WHERE key = ?'.format(self.table),
+                                         (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        with self._connection() as connection:
+            connection.execute(u'INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)'.format(self.table),
+                               (key, json.dumps(value)))
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute(u'DELETE FROM {} WHERE key = ?'.format(self.table), (key,))
+
+    def keys(self):
+        return [row[0] for row in self._connection().execute(u'SELECT key FROM {}'.format(self.table))]
@@ -0,0 +1,239 @@
+from __future__ import absolute_import
+import calendar
+import heapq
+import logging
+import threading
+import time
+
+from requests import RequestException
+
+from microsoftgraph import exceptions
+from microsoftgraph.stores import MemoryStore
+
+logger = logging.getLogger(u'microsoftgraph')
+
+
+def format_datetime(timestamp):
+    u"""Returns the ISO 8601 UTC string of a timestamp, as expected by expirationDateTime."""
+    return time.strftime(u'%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+def parse_datetime(value):
+    u"""Returns the timestamp of an ISO 8601 UTC string like 2016-11-20T18:23:45.9356913Z."""
+    return calendar.timegm(time.strptime(value[:19], u'%Y-%m-%dT%H:%M:%S'))
+
+
+class SubscriptionManager(object):
+    u"""Keeps a set of subscriptions alive by renewing them shortly before they expire.
+
+    The subscriptions are kept in a store (one key per subscription id) and indexed in memory by renewal time, so a
+    restarted process picks up where it stopped without listing the subscriptions. renew_due() renews the due
+    subscriptions in waves of `wave_size` PATCH requests sent as JSON batches, waiting `wave_interval` seconds
+    between two waves. A subscription answered with 404 is created again with the same settings; other failures
+    are retried `retry_interval` seconds later.
+
+    Example:
+        manager = SubscriptionManager(client, SQLiteStore('subscriptions.db', table='subscriptions'))
+        manager.create('created', 'https://example.com/notify', 'me/mailFolders/inbox/messages', client_state)
+        manager.start()
+
+    Args:
+        client: The Client used for the requests.
+        store: Where the subscriptions are kept, a store from microsoftgraph.stores used for nothing else.
+        lifetime: Seconds between a renewal and the new expiration, 4230 minutes (the mail maximum) by default.
+        renew_before: Seconds before the expiration at which a subscription is renewed.
+        wave_size: Number of subscriptions renewed per wave.
+        wave_interval: Seconds to wait between two waves.
+        retry_interval: Seconds to wait before renewing again a subscription whose renewal failed.
+        batch_size: Number of requests per JSON batch, 20 at most.
+
+    """
+
+    def __init__(self, client, store=None, lifetime=4230 * 60, renew_before=6 * 3600, wave_size=200,
+                 wave_interval=1, retry_interval=300, batch_size=20):
+        self.client = client
+        self.store = store if store is not None else MemoryStore()
+        self.lifetime = lifetime
+        self.renew_before = renew_before
+        self.wave_size = wave_size
+        self.wave_interval = wave_interval
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._heap = []
+        self._stop = threading.Event()
+        self._thread = None
+        for subscription_id in self.store.keys():
+            record = self.store.get(subscription_id)
+            if record is not None:
+                heapq.heappush(self._heap, (record[u'due'], subscription_id))
+
+    def _save(self, record, due=None):
+        record[u'due'] = due if due is not None else record[u'expires'] - self.renew_before
+        with self._lock:
+            self.store.set(record[u'id'], record)
+            heapq.heappush(self._heap, (record[u'due'], record[u'id']))
+
+    def _record(self, subscription):
+        return {
+            u'id': subscription[u'id'],
+            u'changeType': subscription[u'changeType'],
+            u'notificationUrl': subscription[u'notificationUrl'],
+            u'resource': subscription[u'resource'],
+            u'clientState': subscription.get(u'clientState'),
+            u'expires': parse_datetime(subscription[u'expirationDateTime']),
+        }
+
+    def add(self, subscription):
+        u"""Manages a subscription created elsewhere, given as the dict returned by Graph."""
+        record = self._record(subscription)
+        self._save(record)
+        return record
+
+    def create(self, change_type, notification_url, resource, client_state=None):
+        u"""Creates a subscription and manages it, see Client.create_subscription.
+
+        Returns:
+            A dict.
+
+        """
+        subscription = self.client.create_subscription(change_type, notification_url, resource,
+                                                       format_datetime(time.time() + self.lifetime), client_state)
+        self.add(subscription)
+        return subscription
+
+    def get(self, subscription_id):
+        u"""Returns the stored record of a subscription, or None."""
+        return self.store.get(subscription_id)
+
+    def delete(self, subscription_id):
+        u"""Deletes a subscription and stops managing it."""
+        self.forget(subscription_id)
+        try:
+            self.client.delete_subscription(subscription_id)
+        except exceptions.NotFound:
+            pass
+
+    def forget(self, subscription_id):
+        u"""Stops managing a subscription without deleting it."""
+        with self._lock:
+            self.store.delete(subscription_id)
+
+    def due(self, now=None):
+        u"""Removes from the index and returns the records whose renewal time has come."""
+        now = time.time() if now is None else now
+        records = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, subscription_id = heapq.heappop(self._heap)
+                record = self.store.get(subscription_id)
+                # Entries left behind by a renewal or a forget() are skipped.
+                if record is not None and record[u'due'] == due:
+                    records.append(record)
+        return records
+
+    def next_due(self):
+        u"""Returns the time of the next renewal, or None."""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def renew_due(self, now=None):
+        u"""Renews the due subscriptions wave by wave.
+
+        Returns:
+            A dict with the number of subscriptions renewed, recreated and failed.
+
+        """
+        records = self.due(now)
+        popped = [(record[u'id'], record[u'due']) for record in records]
+        stats = {u'renewed': 0, u'recreated': 0, u'failed': 0}
+        try:
+            for start in range(0, len(records), self.wave_size):
+                if start:
+                    time.sleep(self.wave_interval)
+                self._renew_wave(records[start:start + self.wave_size], stats)
+        finally:
+            # The records are out of the index until they are saved again: put back the ones an error left
+            # unprocessed, those still stored with the due time they were popped with.
+            for subscription_id, due in popped:
+                record = self.store.get(subscription_id)
+                if record is not None and record[u'due'] == due:
+                    self._save(record, due=time.time() + self.retry_interval)
+        return stats
+
+    def _renew_wave(self, records, stats):
+        expiration = format_datetime(time.time() + self.lifetime)
+        with self.client.batch(max_size=self.batch_size) as batch:
+            futures = [batch.renew_subscription(record[u'id'], expiration) for record in records]
+        missing = []
+        for record, future in zip(records, futures):
+            try:
+                subscription = future.result()
+            except exceptions.NotFound:
+                missing.append(record)
+                continue
+            except (exceptions.BaseError, RequestException):
+                stats[u'failed'] += 1
+                self._save(record, due=time.time() + self.retry_interval)
+                continue
+            try:
+                record[u'expires'] = parse_datetime(subscription[u'expirationDateTime'])
+            except (KeyError, TypeError, ValueError):
+                logger.warning(u'Unexpected renewal of subscription %s: %r', record[u'id'], subscription)
+                stats[u'failed'] += 1
+                self._save(record, due=time.time() + self.retry_interval)
+                continue
+            self._save(record)
+            stats[u'renewed'] += 1
+        if missing:
+            self._recreate(missing, expiration, stats)
+
+    def _recreate(self, records, expiration, stats):
+        with self.client.batch(max_size=self.batch_size) as batch:
+            futures = [batch.create_subscription(record[u'changeType'], record[u'notificationUrl'],
+                                                 record[u'resource'], expiration, record[u'clientState'])
+                       for record in records]
+        for record, future in zip(records, futures):
+            try:
+                subscription = future.result()
+            except (exceptions.BaseError, RequestException):
+                stats[u'failed'] += 1
+                self._save(record, due=time.time() + self.retry_interval)
+                continue
+            try:
+                self.add(subscription)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(u'Unexpected creation of subscription %s: %r', record[u'id'], subscription)
+                stats[u'failed'] += 1
+                self._save(record, due=time.time() + self.retry_interval)
+                continue
+            if subscription[u'id'] != record[u'id']:
+                self.forget(record[u'id'])
+            stats[u'recreated'] += 1
+
+    def start(self):
+        u"""Starts a daemon thread calling renew_due() whenever a subscription is due."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        u"""Stops the renewal thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            due = self.next_due()
+            delay = 60 if due is None else min(60, max(0, due - time.time()))
+            if self._stop.wait(delay):
+                return
+            try:
+                self.renew_due()
+            except Exception:
+                # The records of the failed renewals are back in the index: keep the thread alive for them.
+                logger.exception(u'Renewing the due subscriptions failed.')
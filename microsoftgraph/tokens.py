@@ -0,0 +1,121 @@
+from __future__ import absolute_import
+import threading
+import time
+
+from requests import RequestException
+
+from microsoftgraph import exceptions
+
+
+class TokenManager(object):
+    u"""Refreshes the token of a Client shortly before it expires.
+
+    The first caller that sees the token within `margin` seconds of its expiry refreshes it while the others keep
+    using the still valid token; once the token is expired, the callers wait for a single refresh instead of all
+    calling the token endpoint. Use Client.manage_token to create one.
+
+    Args:
+        client: The Client whose token is managed.
+        redirect_uri: The redirect_uri used to get the token.
+        margin: Seconds before the expiry at which the token is refreshed.
+        background: If True, a daemon thread refreshes the token even when the client is idle.
+        on_refresh: A callable receiving every new token, e.g. to persist it.
+
+    """
+
+    def __init__(self, client, redirect_uri, margin=300, background=False, on_refresh=None):
+        self.client = client
+        self.redirect_uri = redirect_uri
+        self.margin = margin
+        self.on_refresh = on_refresh
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if background:
+            self.start()
+
+    def _token(self):
+        return self.client.office365_token if self.client.office365 else self.client.token
+
+    def _expires_at(self, token):
+        if u'expires_at' not in token:
+            if u'expires_in' not in token:
+                return None
+            token[u'expires_at'] = time.time() + int(token[u'expires_in'])
+        return float(token[u'expires_at'])
+
+    def get_access_token(self):
+        u"""Returns a valid access token, refreshing it first if needed."""
+        token = self._token()
+        expires_at = self._expires_at(token)
+        now = time.time()
+        if expires_at is None or now < expires_at - self.margin:
+            return token[u'access_token']
+        if now < expires_at:
+            if self._lock.acquire(False):
+                try:
+                    if self._token() is token:
+                        self._refresh(token)
+                except (exceptions.BaseError, RequestException):
+                    # The current token is still valid, the next caller will try again.
+                    pass
+                finally:
+                    self._lock.release()
+            return self._token()[u'access_token']
+        with self._lock:
+            token = self._token()
+            if time.time() >= self._expires_at(token):
+                self._refresh(token)
+            return self._token()[u'access_token']
+
+    def invalidate(self, access_token):
+        u"""Refreshes the token if it is still access_token, e.g. after it got a 401 response.
+
+        Returns:
+            The new access token.
+
+        """
+        with self._lock:
+            token = self._token()
+            if token[u'access_token'] == access_token:
+                self._refresh(token)
+            return self._token()[u'access_token']
+
+    def _refresh(self, token):
+        new_token = dict(self.client.refresh_token(self.redirect_uri, token[u'refresh_token']))
+        new_token.setdefault(u'refresh_token', token[u'refresh_token'])
+        self._expires_at(new_token)
+        self.client.set_token(new_token)
+        self.refreshes += 1
+        if self.on_refresh is not None:
+            self.on_refresh(new_token)
+
+    def start(self):
+        u"""Starts the background refresh thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        u"""Stops the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            token = self._token()
+            expires_at = self._expires_at(token) if token else None
+            delay = 60 if expires_at is None else max(1, expires_at - self.margin - time.time())
+            if self._stop.wait(delay):
+                return
+            if not self._token():
+                continue
+            try:
+                self.get_access_token()
+            except (exceptions.BaseError, RequestException):
+                pass
@@ -0,0 +1,165 @@
+from __future__ import absolute_import
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import open
+
+from microsoftgraph import exceptions
+
+CHUNK_MULTIPLE = 320 * 1024
+DEFAULT_CHUNK_SIZE = 10 * CHUNK_MULTIPLE
+
+
+def parse_ranges(ranges, size):
+    u"""Turns nextExpectedRanges values like '0-' or '26-49' into (start, end) tuples, end excluded."""
+    result = []
+    for value in ranges:
+        start, _, end = value.partition(u'-')
+        result.append((int(start), int(end) + 1 if end else size))
+    return result
+
+
+def split_ranges(ranges, chunk_size):
+    u"""Splits (start, end) ranges into chunks of at most chunk_size bytes."""
+    for start, end in ranges:
+        while start < end:
+            yield start, min(start + chunk_size, end)
+            start += chunk_size
+
+
+class UploadSession(object):
+    u"""Uploads a local file to the uploadUrl of a Graph upload session, one byte range per request.
+
+    The file is memory-mapped and each request only copies its own range. The upload url is pre-authenticated,
+    so the ranges are sent without the Authorization header.
+
+    Args:
+        client: The Client whose connection pool, timeout and retry policy are used.
+        upload_url: The uploadUrl returned by createUploadSession.
+        path: The local file.
+        chunk_size: Bytes per request, a multiple of 320 KiB.
+        max_workers: Number of ranges uploaded at the same time. OneDrive expects the ranges in order, so only
+        raise it for endpoints accepting parallel ranges.
+        on_progress: A callable receiving (uploaded bytes, total bytes) after each acknowledged range.
+
+    """
+
+    def __init__(self, client, upload_url, path, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1, on_progress=None):
+        if chunk_size % CHUNK_MULTIPLE:
+            raise ValueError(u'chunk_size must be a multiple of {} bytes'.format(CHUNK_MULTIPLE))
+        self.client = client
+        self.upload_url = upload_url
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.uploaded = 0
+        self._lock = threading.Lock()
+
+    def status(self):
+        u"""Returns the session status, with its nextExpectedRanges."""
+        return self.client._parse(self.client.transport.request(u'GET', self.upload_url, timeout=self.client.timeout))
+
+    def cancel(self):
+        u"""Deletes the upload session."""
+        return self.client._parse(self.client.transport.request(u'DELETE', self.upload_url,
+                                                                timeout=self.client.timeout))
+
+    def upload(self, next_expected_ranges=None):
+        u"""Uploads the missing ranges.
+
+        Args:
+            next_expected_ranges: The ranges still expected by the server, the whole file by default.
+
+        Returns:
+            The response of the last range, the created item for a drive upload.
+
+        """
+        ranges = parse_ranges(next_expected_ranges or [u'0-'], self.size)
+        self.uploaded = self.size - sum(end - start for start, end in ranges)
+        chunks = split_ranges(ranges, self.chunk_size)
+        result = None
+        with open(self.path, u'rb') as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if self.max_workers == 1:
+                    for start, end in chunks:
+                        result = self._put(view, start, end) or result
+                else:
+                    executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                    try:
+                        for response in executor.map(lambda chunk: self._put(view, *chunk), chunks):
+                            result = response or result
+                    finally:
+                        executor.shutdown(wait=True)
+            finally:
+                view.close()
+        return result
+
+    def _put(self, view, start, end):
+        headers = {
+            u'Content-Length': str(end - start),
+            u'Content-Range': u'bytes {}-{}/{}'.format(start, end - 1, self.size),
+        }
+        data = view[start:end]
+        attempt, begin = 0, time.time()
+        while True:
+            response = self.client.transport.request(u'PUT', self.upload_url, data=data, headers=headers,
+                                                     timeout=self.client.timeout)
+            self.client._note_status(response.status_code)
+            delay = self.client.retry_policy.get_delay(response, attempt, time.time() - begin)
+            if delay is None:
+                break
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+        result = self.client._parse(response)
+        with self._lock:
+            self.uploaded += end - start
+            uploaded = self.uploaded
+        if self.on_progress is not None:
+            self.on_progress(uploaded, self.size)
+        return result if response.status_code in (200, 201) else None
+
+
+def upload_large_file(client, path, remote_path, parent_id=None, conflict_behavior=u'rename',
+                      chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1, state_store=None, on_progress=None):
+    u"""Uploads a file through a drive upload session, resuming the session saved in state_store if any.
+
+    See Client.drive_upload_large_file.
+
+    """
+    size = os.path.getsize(path)
+    if not size:
+        raise ValueError(u'Upload sessions cannot upload an empty file.')
+    mtime = os.path.getmtime(path)
+    key = u'{}|{}|{}'.format(os.path.abspath(path), parent_id or u'', remote_path)
+
+    state = state_store.get(key) if state_store is not None else None
+    if state and state[u'size'] == size and state[u'mtime'] == mtime:
+        session = UploadSession(client, state[u'upload_url'], path, chunk_size=chunk_size,
+                                max_workers=max_workers, on_progress=on_progress)
+        try:
+            ranges = session.status().get(u'nextExpectedRanges')
+        except exceptions.BaseError:
+            state = None
+    else:
+        state = None
+
+    if state is None:
+        body = {u'item': {u'@microsoft.graph.conflictBehavior': conflict_behavior}}
+        created = client.drive_create_upload_session(remote_path, parent_id=parent_id, json=body)
+        session = UploadSession(client, created[u'uploadUrl'], path, chunk_size=chunk_size,
+                                max_workers=max_workers, on_progress=on_progress)
+        ranges = created.get(u'nextExpectedRanges')
+        if state_store is not None:
+            state_store.set(key, {u'upload_url': created[u'uploadUrl'], u'size': size, u'mtime': mtime,
+                                  u'expiration': created.get(u'expirationDateTime')})
+
+    item = session.upload(ranges)
+    if state_store is not None:
+        state_store.delete(key)
+    return item
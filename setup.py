@@ -19,5 +19,6 @@ setup(name=u'microsoftgraph-python',
       packages=['microsoftgraph'],
       install_requires=[
           u'requests',
+          u'futures; python_version < "3.2"',
       ],
       zip_safe=False)
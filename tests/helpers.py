@@ -0,0 +1,21 @@
+from __future__ import absolute_import
+import json
+
+from microsoftgraph.client import Client
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.retry import RetryPolicy
+
+BASE = u'https://graph.microsoft.com/v1.0/'
+
+
+def make_client(transport=None, token=None, **kwargs):
+    u"""Returns a Client answered by a ReplayTransport, whose retries do not wait."""
+    kwargs.setdefault(u'retry_policy', RetryPolicy(backoff_factor=0.001, max_backoff=0.01))
+    client = Client(u'id', u'secret', transport=transport if transport is not None else ReplayTransport(), **kwargs)
+    client.set_token(token or {u'access_token': u'token'})
+    return client
+
+
+def batch_requests(prepared):
+    u"""Returns the sub-requests of a $batch request received by a route."""
+    return json.loads(prepared.body)[u'requests']
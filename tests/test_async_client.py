@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from Queue import Full
+from concurrent.futures import Future
+
+from microsoftgraph.async_client import AsyncClient
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.tokens import TokenManager
+from tests.helpers import BASE
+
+
+class AsyncClientTest(unittest.TestCase):
+
+    def make_client(self, **kwargs):
+        transport = ReplayTransport()
+        transport.add(u'GET', BASE + u'me', json_body={u'id': u'me'})
+        client = AsyncClient(u'id', u'secret', transport=transport, **kwargs)
+        client.set_token({u'access_token': u'token', u'refresh_token': u'refresh', u'expires_at': time.time() + 3600})
+        self.addCleanup(client.close)
+        return client
+
+    def test_api_calls_return_futures(self):
+        client = self.make_client(max_workers=2)
+        futures = [client.get_me() for _ in range(5)]
+        self.assertTrue(all(isinstance(future, Future) for future in futures))
+        self.assertEqual([future.result() for future in futures], [{u'id': u'me'}] * 5)
+
+    def test_local_methods_are_not_submitted(self):
+        client = self.make_client()
+        self.assertIsInstance(client.manage_token(u'https://example.com/callback'), TokenManager)
+        self.assertIsInstance(client.authorization_url(u'https://example.com/callback', [u'User.Read']), unicode)
+
+    def test_submit_fails_fast_when_max_pending_calls_wait(self):
+        client = self.make_client(max_workers=1, max_pending=2)
+        release = threading.Event()
+        futures = [client.submit(release.wait), client.submit(release.wait)]
+        start = time.time()
+        with self.assertRaises(Full):
+            client.submit(release.wait)
+        self.assertLess(time.time() - start, 0.1)
+        release.set()
+        for future in futures:
+            future.result()
+        self.assertEqual(client.get_me().result(), {u'id': u'me'})
+
+    def test_calls_are_queued_without_max_pending(self):
+        client = self.make_client(max_workers=1)
+        release = threading.Event()
+        futures = [client.submit(release.wait, 5) for _ in range(20)]
+        release.set()
+        self.assertTrue(all(future.result() for future in futures))
+
+
+if __name__ == u'__main__':
+    unittest.main()
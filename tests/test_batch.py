@@ -0,0 +1,122 @@
+from __future__ import absolute_import
+import unittest
+
+from microsoftgraph import exceptions
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, batch_requests, make_client
+
+
+class BatchService(object):
+    u"""Answers each sub-request with the next status listed for its url, 200 once the list is exhausted.
+
+    Like Graph, a sub-request whose dependency failed is answered with 424.
+
+    """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.batches = []
+
+    def __call__(self, prepared):
+        requests = batch_requests(prepared)
+        self.batches.append(requests)
+        failed = set()
+        responses = []
+        for request in requests:
+            responses.append(self.respond(request, failed))
+            if responses[-1][u'status'] != 200:
+                failed.add(request[u'id'])
+        return 200, {}, {u'responses': responses}
+
+    def respond(self, request, failed):
+        statuses = self.statuses.get(request[u'url'], [])
+        status = statuses.pop(0) if statuses else 200
+        if failed.intersection(request.get(u'dependsOn', [])):
+            status = 424
+        if status == 200:
+            return {u'id': request[u'id'], u'status': 200, u'body': {u'url': request[u'url']}}
+        return {u'id': request[u'id'], u'status': status, u'headers': {u'Retry-After': u'0'},
+                u'body': {u'error': {u'code': u'error{}'.format(status), u'message': u''}}}
+
+
+class BatchTest(unittest.TestCase):
+
+    def batch_client(self, **statuses):
+        self.service = BatchService(dict((u'/me/messages/' + key, value) for key, value in statuses.items()))
+        transport = ReplayTransport()
+        transport.route(u'^POST /v1.0/\\$batch$', self.service)
+        return make_client(transport)
+
+    def test_calls_are_sent_in_chunks_of_max_size(self):
+        client = self.batch_client()
+        with client.batch(max_size=2) as batch:
+            futures = [batch.get_message(u'{}'.format(index)) for index in range(5)]
+        self.assertEqual([future.result()[u'url'] for future in futures],
+                         [u'/me/messages/{}'.format(index) for index in range(5)])
+        self.assertEqual([len(requests) for requests in self.service.batches], [2, 2, 1])
+
+    def test_depends_on_is_sent_within_the_chunk(self):
+        client = self.batch_client()
+        with client.batch() as batch:
+            first = batch.get_message(u'1')
+            with batch.depends_on(first):
+                second = batch.get_message(u'2')
+        self.assertEqual(second.result()[u'url'], u'/me/messages/2')
+        requests = self.service.batches[0]
+        self.assertNotIn(u'dependsOn', requests[0])
+        self.assertEqual(requests[1][u'dependsOn'], [requests[0][u'id']])
+
+    def test_throttled_request_is_retried_with_its_failed_dependents(self):
+        client = self.batch_client(**{u'1': [429], u'3': [424]})
+        with client.batch() as batch:
+            first = batch.get_message(u'1')
+            with batch.depends_on(first):
+                second = batch.get_message(u'2')
+            third = batch.get_message(u'3')
+        self.assertEqual(first.result()[u'url'], u'/me/messages/1')
+        self.assertEqual(second.result()[u'url'], u'/me/messages/2')
+        # A 424 without a retried dependency is a final answer.
+        with self.assertRaises(exceptions.FailedDependency):
+            third.result()
+        self.assertEqual([[request[u'url'] for request in requests] for requests in self.service.batches],
+                         [[u'/me/messages/1', u'/me/messages/2', u'/me/messages/3'],
+                          [u'/me/messages/1', u'/me/messages/2']])
+        self.assertEqual(self.service.batches[1][1][u'dependsOn'], [self.service.batches[1][0][u'id']])
+
+    def test_retries_are_limited(self):
+        client = self.batch_client(**{u'1': [503] * 5})
+        with client.batch(max_retries=2) as batch:
+            future = batch.get_message(u'1')
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            future.result()
+        self.assertEqual(len(self.service.batches), 3)
+
+    def test_dependents_of_a_failed_request_are_not_sent(self):
+        client = self.batch_client(**{u'1': [404]})
+        with client.batch() as batch:
+            first = batch.get_message(u'1')
+            with batch.depends_on(first):
+                second = batch.get_message(u'2')
+        with self.assertRaises(exceptions.NotFound):
+            first.result()
+        self.assertRaises(exceptions.FailedDependency, second.result)
+
+    def test_dependency_in_another_chunk_is_awaited(self):
+        client = self.batch_client(**{u'1': [404]})
+        with client.batch(max_size=1) as batch:
+            first = batch.get_message(u'1')
+            with batch.depends_on(first):
+                second = batch.get_message(u'2')
+        self.assertRaises(exceptions.FailedDependency, second.result)
+        self.assertEqual(len(self.service.batches), 1)
+
+    def test_calls_outside_the_block_are_sent_directly(self):
+        client = self.batch_client()
+        client.transport.add(u'GET', BASE + u'me/messages/1', json_body={u'id': u'1'})
+        with client.batch():
+            pass
+        self.assertEqual(client.get_message(u'1'), {u'id': u'1'})
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+import shutil
+import tempfile
+import time
+import unittest
+
+from microsoftgraph.cache import ResponseCache
+from microsoftgraph.decoding import Item
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.stores import FileStore
+from tests.helpers import BASE, batch_requests, make_client
+
+
+class Contacts(object):
+    u"""Serves me/contacts with an ETag, answering 304 to a matching If-None-Match."""
+
+    def __init__(self):
+        self.version = 1
+        self.statuses = []
+        self.on_write = None
+
+    def __call__(self, prepared):
+        etag = u'"{}"'.format(self.version)
+        if prepared.headers.get(u'If-None-Match') == etag:
+            self.statuses.append(304)
+            return 304, {u'ETag': etag}, b''
+        self.statuses.append(200)
+        return 200, {u'ETag': etag}, {u'value': [{u'id': u'1', u'version': self.version}]}
+
+    def write(self, prepared):
+        if self.on_write is not None:
+            self.on_write()
+        self.version += 1
+        return 204, {}, b''
+
+
+def cached_client(ttl=60, store=None, **kwargs):
+    contacts = Contacts()
+    transport = ReplayTransport()
+    transport.route(u'^GET /v1.0/me/contacts$', contacts)
+    transport.route(u'^(POST|PATCH|DELETE) /v1.0/me/contacts', contacts.write)
+    transport.route(u'^POST /v1.0/\\$batch$', lambda prepared: (200, {}, {u'responses': [
+        {u'id': request[u'id'], u'status': 204, u'body': None} for request in batch_requests(prepared)]}))
+    client = make_client(transport, cache=ResponseCache(store, ttl=ttl), **kwargs)
+    return client, contacts
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_fresh_response_is_served_from_cache(self):
+        client, contacts = cached_client()
+        self.assertEqual(client.outlook_get_me_contacts(), client.outlook_get_me_contacts())
+        self.assertEqual(contacts.statuses, [200])
+        self.assertEqual(client.cache.stats, {u'hits': 1, u'misses': 1, u'revalidated': 0})
+
+    def test_stale_response_is_revalidated_with_its_etag(self):
+        client, contacts = cached_client(ttl=0)
+        first = client.outlook_get_me_contacts()
+        self.assertEqual(client.outlook_get_me_contacts(), first)
+        contacts.version = 2
+        self.assertEqual(client.outlook_get_me_contacts()[u'value'][0][u'version'], 2)
+        self.assertEqual(contacts.statuses, [200, 304, 200])
+        self.assertEqual(client.cache.stats[u'revalidated'], 1)
+
+    def test_cached_results_are_decoded_like_responses(self):
+        client, contacts = cached_client(ttl=0.05, compact=True)
+        self.assertIsInstance(client.outlook_get_me_contacts()[u'value'][0], Item)
+        self.assertIsInstance(client.outlook_get_me_contacts()[u'value'][0], Item)
+        time.sleep(0.1)
+        self.assertIsInstance(client.outlook_get_me_contacts()[u'value'][0], Item)
+        self.assertEqual(contacts.statuses, [200, 304])
+
+    def test_write_invalidates_the_resource_its_children_and_its_parent(self):
+        client, contacts = cached_client()
+        client.outlook_get_me_contacts()
+        client.cache.store.set(u'me/contacts/1/photo|x', {})
+        client.cache.store.set(u'me/events|x', {})
+        client.cache._rebuild_index()
+        client._delete(BASE + u'me/contacts')
+        self.assertEqual(client.cache.store.keys(), [u'me/events|x'])
+        client.outlook_get_me_contacts()
+        self.assertEqual(contacts.statuses, [200, 200])
+
+    def test_write_to_a_child_invalidates_the_collection(self):
+        client, contacts = cached_client()
+        client.outlook_get_me_contacts()
+        client._patch(BASE + u'me/contacts/1', json={u'givenName': u'Pavel'})
+        client.outlook_get_me_contacts()
+        self.assertEqual(contacts.statuses, [200, 200])
+
+    def test_batched_write_invalidates(self):
+        client, contacts = cached_client()
+        client.outlook_get_me_contacts()
+        with client.batch() as batch:
+            batch._delete(BASE + u'me/contacts/1')
+        client.outlook_get_me_contacts()
+        self.assertEqual(contacts.statuses, [200, 200])
+
+    def test_caller_headers_are_part_of_the_key(self):
+        client, contacts = cached_client()
+        client._get(BASE + u'me/contacts')
+        client._get(BASE + u'me/contacts', headers={u'Prefer': u'outlook.body-content-type="text"'})
+        client._get(BASE + u'me/contacts', headers={u'prefer': u'outlook.body-content-type="text"'})
+        client._get(BASE + u'me/contacts', headers={u'ConsistencyLevel': u'eventual'})
+        self.assertEqual(contacts.statuses, [200, 200, 200])
+
+    def test_response_cached_while_a_write_is_in_flight_is_dropped(self):
+        client, contacts = cached_client()
+        # Another thread reads the resource before the write is applied.
+        contacts.on_write = client.outlook_get_me_contacts
+        client._patch(BASE + u'me/contacts/1', json={u'givenName': u'Pavel'})
+        self.assertEqual(client.outlook_get_me_contacts()[u'value'][0][u'version'], 2)
+        self.assertEqual(contacts.statuses, [200, 200])
+
+    def test_persistent_store_is_indexed_when_the_cache_starts(self):
+        directory = tempfile.mkdtemp()
+        try:
+            client, contacts = cached_client(store=FileStore(directory))
+            client.outlook_get_me_contacts()
+            client, contacts = cached_client(store=FileStore(directory))
+            client.outlook_get_me_contacts()
+            self.assertEqual(contacts.statuses, [])
+            client._patch(BASE + u'me/contacts/1', json={})
+            self.assertEqual(client.cache.store.keys(), [])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+import gzip
+import io
+import json
+import unittest
+
+from microsoftgraph import exceptions
+from microsoftgraph.compression import compress_json, gzip_bytes
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+CONTACT = {u'displayName': u'x' * 2000}
+
+
+class Endpoint(object):
+    u"""Answers the POST requests, with `gzip_status` to gzipped bodies and `plain_status` to the others."""
+
+    def __init__(self, gzip_status=201, plain_status=201):
+        self.gzip_status = gzip_status
+        self.plain_status = plain_status
+        self.encodings = []
+
+    def __call__(self, prepared):
+        encoding = prepared.headers.get(u'Content-Encoding')
+        self.encodings.append(encoding)
+        body = prepared.body
+        if encoding == u'gzip':
+            body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+            status = self.gzip_status
+        else:
+            status = self.plain_status
+        if status >= 400:
+            return status, {}, {u'error': {u'code': u'BadRequest', u'message': u'Refused'}}
+        return status, {}, json.loads(body)
+
+
+class CompressionTest(unittest.TestCase):
+
+    def client(self, endpoint):
+        transport = ReplayTransport()
+        transport.route(u'^POST /v1.0/me/contacts$', endpoint)
+        return make_client(transport, compress_request_size=1000)
+
+    def test_gzip_bytes(self):
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(gzip_bytes(b'data' * 100))).read(), b'data' * 100)
+        self.assertEqual(compress_json({u'a': 1}, 100), (None, 8))
+        self.assertEqual(compress_json(CONTACT, 100)[1], len(json.dumps(CONTACT)))
+
+    def test_large_bodies_are_gzipped(self):
+        endpoint = Endpoint()
+        client = self.client(endpoint)
+        self.assertEqual(client._post(BASE + u'me/contacts', json=CONTACT), CONTACT)
+        client._post(BASE + u'me/contacts', json={u'displayName': u'small'})
+        self.assertEqual(endpoint.encodings, [u'gzip', None])
+        stats = client.transfer.stats
+        self.assertEqual(stats[u'compressed_requests'], 1)
+        self.assertLess(stats[u'request_bytes'], stats[u'request_body_bytes'])
+
+    def test_415_sends_the_body_plain_from_then_on(self):
+        endpoint = Endpoint(gzip_status=415)
+        client = self.client(endpoint)
+        self.assertEqual(client._post(BASE + u'me/contacts', json=CONTACT), CONTACT)
+        client._post(BASE + u'me/contacts', json=CONTACT)
+        self.assertEqual(endpoint.encodings, [u'gzip', None, None])
+
+    def test_400_to_gzip_only_marks_the_endpoint_once_the_plain_body_is_accepted(self):
+        endpoint = Endpoint(gzip_status=400)
+        client = self.client(endpoint)
+        client._post(BASE + u'me/contacts', json=CONTACT)
+        client._post(BASE + u'me/contacts', json=CONTACT)
+        self.assertEqual(endpoint.encodings, [u'gzip', None, None])
+
+    def test_400_to_both_bodies_does_not_mark_the_endpoint(self):
+        endpoint = Endpoint(gzip_status=400, plain_status=400)
+        client = self.client(endpoint)
+        with self.assertRaises(exceptions.BadRequest):
+            client._post(BASE + u'me/contacts', json=CONTACT)
+        endpoint.gzip_status = endpoint.plain_status = 201
+        client._post(BASE + u'me/contacts', json=CONTACT)
+        self.assertEqual(endpoint.encodings, [u'gzip', None, u'gzip'])
+
+    def test_endpoint_accepting_gzip_keeps_its_errors(self):
+        endpoint = Endpoint()
+        client = self.client(endpoint)
+        client._post(BASE + u'me/contacts', json=CONTACT)
+        endpoint.gzip_status = 400
+        with self.assertRaises(exceptions.BadRequest):
+            client._post(BASE + u'me/contacts', json=CONTACT)
+        self.assertEqual(endpoint.encodings, [u'gzip', u'gzip'])
+
+
+if __name__ == u'__main__':
+    unittest.main()
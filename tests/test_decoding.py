@@ -0,0 +1,70 @@
+from __future__ import absolute_import
+import json
+import unittest
+
+from microsoftgraph.decoding import Item, compact, decode, get_decoder
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+PAGE = {u'value': [{u'id': u'1', u'subject': u'a'}, {u'id': u'2', u'subject': u'b'}, {u'id': u'3'}],
+        u'@odata.nextLink': BASE + u'me/messages?$skip=3'}
+
+
+class DecoderTest(unittest.TestCase):
+
+    def test_decoders(self):
+        self.assertIs(get_decoder(u'json'), json.loads)
+        self.assertIs(get_decoder(len), len)
+        self.assertTrue(callable(get_decoder()))
+        with self.assertRaises(ValueError):
+            get_decoder(u'yaml')
+
+    def test_decode(self):
+        content = json.dumps(PAGE).encode(u'utf-8')
+        self.assertEqual(decode(json.loads, content), PAGE)
+        self.assertIsInstance(decode(json.loads, content, True)[u'value'][0], Item)
+
+
+class CompactTest(unittest.TestCase):
+
+    def setUp(self):
+        self.page = compact(json.loads(json.dumps(PAGE)))
+
+    def test_items_behave_like_read_only_dicts(self):
+        item = self.page[u'value'][0]
+        self.assertEqual((item[u'id'], item.get(u'subject'), item.get(u'body', u'none')), (u'1', u'a', u'none'))
+        self.assertIn(u'subject', item)
+        self.assertEqual((len(item), sorted(item), sorted(item.values())), (2, [u'id', u'subject'], [u'1', u'a']))
+        with self.assertRaises(KeyError):
+            item[u'body']
+        with self.assertRaises(TypeError):
+            item[u'id'] = u'2'
+
+    def test_items_equal_their_dict(self):
+        items = self.page[u'value']
+        self.assertEqual(items, PAGE[u'value'])
+        self.assertEqual(items[2].to_dict(), {u'id': u'3'})
+        self.assertNotEqual(items[0], items[1])
+        self.assertEqual(self.page[u'@odata.nextLink'], PAGE[u'@odata.nextLink'])
+
+    def test_items_with_the_same_properties_share_their_fields(self):
+        items = self.page[u'value']
+        self.assertIs(items[0]._fields, items[1]._fields)
+        self.assertIsNot(items[0]._fields, items[2]._fields)
+
+    def test_other_results_are_unchanged(self):
+        self.assertEqual(compact({u'id': u'1'}), {u'id': u'1'})
+        self.assertEqual(compact({u'value': [1, {u'id': u'1'}]})[u'value'][0], 1)
+        self.assertEqual(compact([1]), [1])
+
+    def test_client_compacts_collection_pages_only(self):
+        transport = ReplayTransport()
+        transport.add(u'GET', BASE + u'me/messages', json_body=PAGE)
+        transport.add(u'GET', BASE + u'me/messages/1', json_body=PAGE[u'value'][0])
+        client = make_client(transport, compact=True, json_decoder=u'json')
+        self.assertIsInstance(client._get(BASE + u'me/messages')[u'value'][0], Item)
+        self.assertIsInstance(client.get_message(u'1'), dict)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+import unittest
+
+from microsoftgraph import exceptions
+from microsoftgraph.delta import DeltaSync
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+DELTA = BASE + u'me/mailFolders/inbox/messages/delta'
+
+
+class DeltaSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = ReplayTransport()
+        self.transport.add(u'GET', DELTA, json_body={
+            u'value': [{u'id': u'1'}], u'@odata.nextLink': DELTA + u'?$skiptoken=page2'})
+        self.transport.add(u'GET', DELTA + u'?$skiptoken=page2', json_body={
+            u'value': [{u'id': u'2'}], u'@odata.deltaLink': DELTA + u'?$deltatoken=first'})
+        self.resyncs = []
+        self.sync = DeltaSync(make_client(self.transport), on_resync=self.resyncs.append)
+
+    def ids(self):
+        return [item[u'id'] for item in self.sync.changes(u'messages', folder=u'inbox')]
+
+    def test_delta_link_is_saved_after_a_complete_run_and_reused(self):
+        self.transport.add(u'GET', DELTA + u'?$deltatoken=first', json_body={
+            u'value': [{u'id': u'2', u'@removed': {u'reason': u'deleted'}}],
+            u'@odata.deltaLink': DELTA + u'?$deltatoken=second'})
+        self.assertEqual(self.ids(), [u'1', u'2'])
+        self.assertEqual(self.sync.store.get(u'me/mailFolders/inbox/messages/delta'), DELTA + u'?$deltatoken=first')
+        self.assertEqual(self.ids(), [u'2'])
+        self.assertEqual(self.sync.store.get(u'me/mailFolders/inbox/messages/delta'),
+                         DELTA + u'?$deltatoken=second')
+
+    def test_interrupted_run_keeps_the_previous_checkpoint(self):
+        changes = self.sync.changes(u'messages', folder=u'inbox')
+        next(changes)
+        changes.close()
+        self.assertIsNone(self.sync.store.get(u'me/mailFolders/inbox/messages/delta'))
+
+    def test_gone_drops_the_checkpoint_and_resyncs(self):
+        self.transport.add(u'GET', DELTA + u'?$deltatoken=expired', status=410,
+                           json_body={u'error': {u'code': u'resyncRequired', u'message': u'Expired'}})
+        self.sync.store.set(u'me/mailFolders/inbox/messages/delta', DELTA + u'?$deltatoken=expired')
+        self.assertEqual(self.ids(), [u'1', u'2'])
+        self.assertEqual(self.resyncs, [u'me/mailFolders/inbox/messages/delta'])
+        self.assertEqual(self.sync.store.get(u'me/mailFolders/inbox/messages/delta'), DELTA + u'?$deltatoken=first')
+
+    def test_gone_without_checkpoint_is_raised(self):
+        transport = ReplayTransport()
+        transport.add(u'GET', DELTA, status=410, json_body={u'error': {u'code': u'resyncRequired', u'message': u''}})
+        sync = DeltaSync(make_client(transport), on_resync=self.resyncs.append)
+        with self.assertRaises(exceptions.Gone):
+            list(sync.changes(u'messages', folder=u'inbox'))
+        self.assertEqual(self.resyncs, [])
+
+
+if __name__ == u'__main__':
+    unittest.main()
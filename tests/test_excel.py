@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+import json
+import threading
+import unittest
+
+from microsoftgraph import excel
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import make_client
+
+
+class Workbook(object):
+    u"""Creates and closes workbook sessions, and records the session of each range request."""
+
+    def __init__(self):
+        self.persistent = {}
+        self.closed = []
+        self.ranges = []
+        self._lock = threading.Lock()
+
+    def create(self, prepared):
+        with self._lock:
+            session_id = u'session{}'.format(len(self.persistent) + 1)
+            self.persistent[session_id] = json.loads(prepared.body)[u'persistChanges']
+        return 201, {}, {u'id': session_id, u'persistChanges': self.persistent[session_id]}
+
+    def close(self, prepared):
+        self.closed.append(prepared.headers[u'workbook-session-id'])
+        return 204, {}, b''
+
+    def range(self, prepared):
+        self.ranges.append((prepared.method, prepared.headers.get(u'workbook-session-id')))
+        return 200, {}, {u'address': u'Sheet1!A1:B2', u'values': [[1, 2], [3, 4]]}
+
+
+class AddressTest(unittest.TestCase):
+
+    def test_columns(self):
+        for index, letters in [(0, u'A'), (25, u'Z'), (26, u'AA'), (701, u'ZZ'), (702, u'AAA'), (16383, u'XFD')]:
+            self.assertEqual(excel.column_letters(index), letters)
+            self.assertEqual(excel.column_index(letters), index)
+        self.assertEqual(excel.column_index(u'ab'), 27)
+
+    def test_addresses(self):
+        self.assertEqual(excel.parse_cell(u'$B$3'), (2, 1))
+        self.assertEqual(excel.parse_address(u"Sheet1!A1:C10"), (0, 0, 9, 2))
+        self.assertEqual(excel.parse_address(u'D4'), (3, 3, 3, 3))
+        self.assertEqual(excel.format_address(0, 0, 9, 2), u'A1:C10')
+        with self.assertRaises(ValueError):
+            excel.parse_cell(u'A0B')
+
+
+class SplitValuesTest(unittest.TestCase):
+
+    def test_rows_are_grouped_up_to_max_cells(self):
+        values = [[row * 10 + column for column in range(3)] for row in range(5)]
+        chunks = excel.split_values(values, 1, 1, max_cells=6)
+        self.assertEqual([address for address, _ in chunks], [u'B2:D3', u'B4:D5', u'B6:D6'])
+        self.assertEqual(sum((block for _, block in chunks), []), values)
+
+    def test_wide_rows_are_split_by_columns(self):
+        chunks = excel.split_values([list(range(5)), list(range(5, 10))], 0, 0, max_cells=2)
+        self.assertEqual(chunks, [(u'A1:B1', [[0, 1]]), (u'A2:B2', [[5, 6]]), (u'C1:D1', [[2, 3]]),
+                                  (u'C2:D2', [[7, 8]]), (u'E1:E1', [[4]]), (u'E2:E2', [[9]])])
+
+    def test_chunks_are_bounded_by_their_encoded_size(self):
+        values = [[u'x' * 300, u'\xe9' * 100] for _ in range(40)]
+        chunks = excel.split_values(values, 0, 0, max_cells=5000, max_bytes=4000)
+        self.assertGreater(len(chunks), 1)
+        for address, block in chunks:
+            self.assertLessEqual(len(json.dumps({u'values': block})), 4000)
+        self.assertEqual(sum((block for _, block in chunks), []), values)
+        self.assertEqual(excel.parse_address(chunks[1][0])[0], len(chunks[0][1]))
+
+    def test_row_larger_than_max_bytes_is_split_into_cells(self):
+        chunks = excel.split_values([[u'a' * 100, u'b' * 100, u'c' * 100]], 4, 0, max_bytes=250)
+        self.assertEqual([address for address, _ in chunks], [u'A5:A5', u'B5:C5'])
+        with self.assertRaises(ValueError):
+            excel.split_values([[u'a' * 300]], 0, 0, max_bytes=250)
+
+    def test_rows_must_have_the_same_length(self):
+        self.assertEqual(excel.split_values([], 0, 0), [])
+        with self.assertRaises(ValueError):
+            excel.split_values([[1, 2], [3]], 0, 0)
+
+
+class WorkbookSessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workbook = Workbook()
+        transport = ReplayTransport()
+        transport.route(u'^POST /v1.0/me/drive/items/item/workbook/createSession$', self.workbook.create)
+        transport.route(u'^POST /beta/me/drive/items/item/workbook/closeSession$', self.workbook.close)
+        transport.route(u'/workbook/worksheets/[^/]+/(range|usedRange)', self.workbook.range)
+        self.client = make_client(transport)
+
+    def test_threads_share_one_session(self):
+        with self.client.workbook_session(u'item') as session_id:
+            thread = threading.Thread(target=self.client.excel_get_range, args=(u'item', u'Sheet1', u'A1:B2'))
+            thread.start()
+            thread.join()
+            with self.client.workbook_session(u'item') as nested_id:
+                self.assertEqual(nested_id, session_id)
+            self.assertEqual(self.workbook.closed, [])
+        self.assertEqual(self.workbook.ranges, [(u'GET', session_id)])
+        self.assertEqual(self.workbook.closed, [session_id])
+        self.client.excel_get_range(u'item', u'Sheet1', u'A1:B2')
+        self.assertEqual(self.workbook.ranges[-1], (u'GET', None))
+
+    def test_writes_during_a_read_use_a_persistent_session(self):
+        rows = self.client.excel_read_values(u'item', u'Sheet1', address=u'A1:B4', block_rows=2)
+        next(rows)
+        writer = threading.Thread(target=self.client.excel_write_values, args=(u'item', u'Sheet1', [[5, 6]]))
+        writer.start()
+        writer.join()
+        list(rows)
+        self.assertEqual(self.workbook.persistent, {u'session1': False, u'session2': True})
+        self.assertEqual([session for method, session in self.workbook.ranges if method == u'PATCH'],
+                         [u'session2'])
+        self.assertEqual([session for method, session in self.workbook.ranges if method == u'GET'],
+                         [u'session1', u'session1'])
+        self.assertEqual(sorted(self.workbook.closed), [u'session1', u'session2'])
+
+    def test_threads_outside_a_block_use_the_persistent_session(self):
+        with self.client.workbook_session(u'item', persist_changes=False):
+            with self.client.workbook_session(u'item'):
+                thread = threading.Thread(target=self.client.excel_update_range,
+                                          args=(u'item', u'Sheet1', u'A1'), kwargs={u'json': {u'values': [[1]]}})
+                thread.start()
+                thread.join()
+            self.client.excel_get_range(u'item', u'Sheet1', u'A1')
+        self.assertEqual(self.workbook.ranges, [(u'PATCH', u'session2'), (u'GET', u'session1')])
+
+
+if __name__ == u'__main__':
+    unittest.main()
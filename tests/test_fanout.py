@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+import threading
+import unittest
+
+from microsoftgraph import exceptions
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import make_client
+
+
+class FanOutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = ReplayTransport()
+        self.transport.route(u'^GET /v1.0/me/contacts/', self.contact)
+        self.client = make_client(self.transport)
+        self.missing = set()
+        self.throttled = set()
+
+    def contact(self, prepared):
+        contact_id = prepared.url.rpartition(u'/')[2]
+        if contact_id in self.throttled:
+            self.throttled.remove(contact_id)
+            return 429, {u'Retry-After': u'0'}, {u'error': {u'code': u'TooManyRequests', u'message': u'Throttled'}}
+        if contact_id in self.missing:
+            return 404, {}, {u'error': {u'code': u'ErrorItemNotFound', u'message': u'Not found'}}
+        return 200, {}, {u'id': contact_id}
+
+    def test_results_come_in_input_order(self):
+        self.transport.latency = lambda prepared: 0.05 if prepared.url.endswith(u'/0') else 0
+        results = list(self.client.map(self.client.outlook_get_me_contacts, [unicode(i) for i in range(10)],
+                                       max_workers=4))
+        self.assertEqual([result.value[u'id'] for result in results], [unicode(i) for i in range(10)])
+        self.assertEqual([result.index for result in results], range(10))
+
+    def test_unordered_results_come_as_they_complete(self):
+        self.transport.latency = lambda prepared: 0.1 if prepared.url.endswith(u'/0') else 0
+        results = list(self.client.map(u'outlook_get_me_contacts', [u'0', u'1', u'2'], ordered=False))
+        self.assertEqual(results[-1].item, u'0')
+        self.assertEqual(sorted(result.item for result in results), [u'0', u'1', u'2'])
+
+    def test_failures_are_returned_with_their_item(self):
+        self.missing.add(u'1')
+        progress = []
+        results = list(self.client.map(self.client.outlook_get_me_contacts, [u'0', u'1', u'2'],
+                                       on_progress=lambda *args: progress.append(args)))
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIsInstance(results[1].exception, exceptions.NotFound)
+        self.assertEqual(results[1].item, u'1')
+        self.assertEqual([done for done, failed in progress], [1, 2, 3])
+        self.assertEqual(progress[-1], (3, 1))
+
+    def test_tuple_items_are_positional_arguments(self):
+        results = list(self.client.map(lambda client_id, suffix: self.client.outlook_get_me_contacts(
+            client_id + suffix), [(u'a', u'1'), (u'b', u'2')]))
+        self.assertEqual([result.value[u'id'] for result in results], [u'a1', u'b2'])
+
+    def test_throttled_calls_halve_the_window(self):
+        self.throttled.add(u'0')
+        fanout = self.client.map(self.client.outlook_get_me_contacts, [u'0'], max_workers=8)
+        self.assertTrue(all(result.ok for result in fanout))
+        self.assertEqual((fanout.throttled, fanout.window), (1, 4))
+
+    def test_window_grows_back_after_successes(self):
+        fanout = self.client.map(self.client.outlook_get_me_contacts, [unicode(i) for i in range(20)],
+                                 max_workers=4)
+        fanout.window = 1
+        list(fanout)
+        self.assertEqual(fanout.window, 4)
+        self.assertEqual(fanout.throttled, 0)
+
+    def test_throttling_of_other_threads_is_not_counted(self):
+        other = threading.Thread(target=lambda: [self.client._note_status(429) for _ in range(100)])
+
+        def call(contact_id):
+            other.start()
+            other.join()
+            return self.client.outlook_get_me_contacts(contact_id)
+
+        fanout = self.client.map(call, [u'0'], max_workers=8)
+        self.assertTrue(list(fanout)[0].ok)
+        self.assertEqual((fanout.throttled, fanout.window), (0, 8))
+
+    def test_non_adaptive_window_is_fixed(self):
+        self.throttled.add(u'0')
+        fanout = self.client.map(self.client.outlook_get_me_contacts, [u'0'], max_workers=8, adaptive=False)
+        self.assertTrue(list(fanout)[0].ok)
+        self.assertEqual((fanout.throttled, fanout.window), (0, 8))
+        self.assertEqual(len(self.transport.requests), 2)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+from __future__ import absolute_import
+import logging
+import unittest
+
+from microsoftgraph import exceptions
+from microsoftgraph.hooks import CorrelationLog, Hook, LatencyHistogram, RequestCounters, logger, url_template
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+GUID = u'2b2a3b4c-1d2e-4f50-8a9b-0c1d2e3f4a5b'
+MESSAGE_ID = u'AAMkADQ1ZGY0MWZkLTdhODYtNGQ2OS1hMzA5LWExZDM1YjRiMmVlNwBGAAAAAAA='
+
+
+class Calls(Hook):
+
+    def __init__(self):
+        self.calls = []
+
+    def pre_request(self, info):
+        self.calls.append((u'pre_request', info.attempt, info.client_request_id))
+
+    def post_response(self, info):
+        self.calls.append((u'post_response', info.status, info.retry))
+
+    def on_exception(self, info):
+        self.calls.append((u'on_exception', type(info.exception)))
+
+
+class Records(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class UrlTemplateTest(unittest.TestCase):
+
+    def test_ids_are_replaced(self):
+        self.assertEqual(url_template(BASE + u'me/messages/{}/attachments'.format(MESSAGE_ID)),
+                         u'me/messages/{id}/attachments')
+        self.assertEqual(url_template(BASE + u'users/{}/events/42'.format(GUID)), u'users/{id}/events/{id}')
+        self.assertEqual(url_template(BASE + u'me/mailFolders/inbox/messages?$top=5'), u'me/mailFolders/inbox/messages')
+
+    def test_function_arguments_are_dropped(self):
+        self.assertEqual(url_template(BASE + u"me/drive/root/search(q='report 2020')"), u'me/drive/root/search(...)')
+        self.assertEqual(url_template(BASE + u"users('{}')/onenote/pages".format(GUID)), u'users(...)/onenote/pages')
+
+
+class HooksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = ReplayTransport()
+        self.transport.add_throttling(u'GET', BASE + u'me/contacts', retry_after=0)
+        self.transport.add(u'GET', BASE + u'me/contacts', json_body={u'value': []},
+                           headers={u'request-id': u'server-id'})
+        self.transport.add(u'GET', BASE + u'me/contacts/1', status=404,
+                           json_body={u'error': {u'code': u'ErrorItemNotFound', u'message': u'Not found'}})
+
+    def test_callbacks_of_a_retried_request(self):
+        hook = Calls()
+        make_client(self.transport, hooks=[hook]).outlook_get_me_contacts()
+        client_request_id = hook.calls[0][2]
+        self.assertEqual(hook.calls, [(u'pre_request', 0, client_request_id), (u'post_response', 429, True),
+                                      (u'pre_request', 1, client_request_id), (u'post_response', 200, False)])
+
+    def test_error_responses_call_on_exception(self):
+        hook = Calls()
+        with self.assertRaises(exceptions.NotFound):
+            make_client(self.transport, hooks=[hook]).outlook_get_me_contacts(u'1')
+        self.assertEqual(hook.calls[1:], [(u'post_response', 404, False), (u'on_exception', exceptions.NotFound)])
+
+    def test_request_counters(self):
+        counters = RequestCounters()
+        client = make_client(self.transport, hooks=[counters])
+        client.outlook_get_me_contacts()
+        with self.assertRaises(exceptions.NotFound):
+            client.outlook_get_me_contacts(u'1')
+        snapshot = counters.snapshot()
+        contacts = snapshot[(u'GET', u'me/contacts')]
+        self.assertEqual((contacts[u'requests'], contacts[u'retries'], contacts[u'throttled']), (2, 1, 1))
+        self.assertEqual(contacts[u'statuses'], {429: 1, 200: 1})
+        self.assertEqual(snapshot[(u'GET', u'me/contacts/{id}')][u'exceptions'], 1)
+        self.assertEqual(counters.hottest(1, by=u'requests')[0][0], (u'GET', u'me/contacts'))
+
+    def test_correlation_log_keeps_the_request_ids(self):
+        records = Records()
+        logger.addHandler(records)
+        self.addCleanup(logger.removeHandler, records)
+        log = CorrelationLog(max_size=2)
+        client = make_client(self.transport, hooks=[log])
+        client.outlook_get_me_contacts()
+        with self.assertRaises(exceptions.NotFound):
+            client.outlook_get_me_contacts(u'1')
+        self.assertEqual(len(log.entries), 2)
+        self.assertEqual(log.entries[0][1:5], (u'server-id', u'GET', u'me/contacts', 200))
+        self.assertEqual(log.find(log.entries[1][0])[4], 404)
+        self.assertIsNone(log.find(u'unknown'))
+        self.assertEqual([record.levelno for record in records.records if record.levelno > logging.DEBUG],
+                         [logging.WARNING])
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(buckets=(1, 10))
+        make_client(self.transport, hooks=[histogram]).outlook_get_me_contacts()
+        mail = histogram.snapshot()[u'mail']
+        self.assertEqual(mail[u'count'], 2)
+        self.assertEqual(mail[u'buckets'], [(1, 2), (10, 2), (float(u'inf'), 2)])
+        self.assertEqual(histogram.quantile(u'mail', 0.99), 1)
+        self.assertIsNone(histogram.quantile(u'drive', 0.5))
+
+
+if __name__ == u'__main__':
+    unittest.main()
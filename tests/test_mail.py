@@ -0,0 +1,119 @@
+from __future__ import absolute_import
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import open
+
+from microsoftgraph import exceptions, mail
+from microsoftgraph.mail import StreamingBody, attachment_parts, message_parts
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import make_client
+
+
+class MailTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.files = {}
+        for name, size in ((u'report.pdf', mail.READ_SIZE * 2 + 1), (u'notes.txt', 10), (u'empty.txt', 0)):
+            path = os.path.join(self.directory, name)
+            self.files[name] = os.urandom(size)
+            with open(path, u'wb') as f:
+                f.write(self.files[name])
+        self.paths = [os.path.join(self.directory, name) for name in sorted(self.files)]
+
+    def attachments(self, document):
+        return dict((os.path.basename(attachment[u'Name']), base64.b64decode(attachment[u'ContentBytes']))
+                    for attachment in document)
+
+
+class StreamingBodyTest(MailTest):
+
+    def test_message_is_valid_json_with_base64_attachments(self):
+        document = {u'Message': {u'Subject': u'Report \xe9', u'Attachments': mail._PLACEHOLDER}, u'Save': u'true'}
+        body = StreamingBody(message_parts(document, self.paths))
+        data = body.read()
+        self.assertEqual(len(data), len(body))
+        message = json.loads(data)
+        self.assertEqual(message[u'Message'][u'Subject'], u'Report \xe9')
+        self.assertEqual(message[u'Save'], u'true')
+        self.assertEqual(self.attachments(message[u'Message'][u'Attachments']), self.files)
+        self.assertEqual(message[u'Message'][u'Attachments'][0][u'@odata.type'], u'#microsoft.graph.fileAttachment')
+
+    def test_small_reads_and_rewinding_give_the_same_bytes(self):
+        body = StreamingBody(attachment_parts(self.paths[1]))
+        data = body.read()
+        body.seek(0)
+        chunks = list(iter(lambda: body.read(1000), b''))
+        self.assertTrue(all(len(chunk) == 1000 for chunk in chunks[:-1]))
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(body.tell(), len(data))
+        self.assertEqual(b''.join(body), data)
+        with self.assertRaises(IOError):
+            body.seek(10)
+
+
+class SendMailTest(MailTest):
+
+    def setUp(self):
+        super(SendMailTest, self).setUp()
+        self.transport = ReplayTransport()
+        self.client = make_client(self.transport)
+        self.received = {}
+        self.transport.route(u'^POST /v1.0/me/microsoft.graph.sendMail$', self.receive(202, None))
+        self.transport.route(u'^POST /v1.0/me/messages$', self.receive(201, {u'id': u'draft'}))
+        self.transport.route(u'^POST /v1.0/me/messages/draft/attachments$', self.receive(201, {u'id': u'a'}))
+        self.transport.route(u'^POST /v1.0/me/messages/draft/attachments/createUploadSession$', self.receive(
+            200, {u'uploadUrl': u'https://upload.example.com/session', u'nextExpectedRanges': [u'0-']}))
+        self.upload_status = 201
+        self.transport.route(u'^PUT /session$', lambda prepared: self.receive(self.upload_status, {u'id': u'large'})(
+            prepared))
+        self.transport.route(u'^POST /v1.0/me/messages/draft/send$', self.receive(202, None))
+        self.transport.route(u'^DELETE /v1.0/me/messages/draft$', self.receive(204, None))
+
+    def receive(self, status, answer):
+        def handler(prepared):
+            body = prepared.body.read() if hasattr(prepared.body, u'read') else prepared.body
+            key = u'{} {}'.format(prepared.method, prepared.path_url)
+            self.received.setdefault(key, []).append(body)
+            if status >= 400:
+                return status, {}, {u'error': {u'code': u'BadRequest', u'message': u'Refused'}}
+            return status, {}, answer if answer is not None else b''
+        return handler
+
+    def test_small_attachments_are_sent_inline(self):
+        self.client.send_mail(u'Report', [u'a@example.com'], attachments=self.paths)
+        self.assertEqual(self.transport.requests, [u'POST /v1.0/me/microsoft.graph.sendMail'])
+        message = json.loads(self.received[u'POST /v1.0/me/microsoft.graph.sendMail'][0])[u'Message']
+        self.assertEqual(message[u'ToRecipients'], [{u'EmailAddress': {u'Address': u'a@example.com'}}])
+        self.assertEqual(self.attachments(message[u'Attachments']), self.files)
+
+    def test_large_attachments_go_through_a_draft(self):
+        limit = mail.INLINE_ATTACHMENT_LIMIT
+        mail.INLINE_ATTACHMENT_LIMIT = 100
+        self.addCleanup(setattr, mail, u'INLINE_ATTACHMENT_LIMIT', limit)
+        self.client.send_mail(u'Report', [u'a@example.com'], attachments=self.paths, max_workers=1)
+        attached = [json.loads(body) for body in self.received[u'POST /v1.0/me/messages/draft/attachments']]
+        self.assertEqual(self.attachments(attached), {u'empty.txt': b'', u'notes.txt': self.files[u'notes.txt']})
+        session = json.loads(self.received[u'POST /v1.0/me/messages/draft/attachments/createUploadSession'][0])
+        self.assertEqual(session[u'AttachmentItem'][u'size'], len(self.files[u'report.pdf']))
+        self.assertEqual(b''.join(self.received[u'PUT /session']), self.files[u'report.pdf'])
+        self.assertEqual(self.transport.requests[-1], u'POST /v1.0/me/messages/draft/send')
+
+    def test_draft_is_deleted_when_an_attachment_fails(self):
+        limit = mail.INLINE_ATTACHMENT_LIMIT
+        mail.INLINE_ATTACHMENT_LIMIT = 100
+        self.addCleanup(setattr, mail, u'INLINE_ATTACHMENT_LIMIT', limit)
+        self.upload_status = 400
+        with self.assertRaises(exceptions.BadRequest):
+            self.client.send_mail(u'Report', [u'a@example.com'], attachments=self.paths)
+        self.assertIn(u'DELETE /v1.0/me/messages/draft', self.transport.requests)
+        self.assertNotIn(u'POST /v1.0/me/messages/draft/send', self.transport.requests)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from __future__ import absolute_import
+import json
+import threading
+import unittest
+
+from microsoftgraph.notifications import NotificationProcessor
+
+
+def body(*resources, **kwargs):
+    return json.dumps({u'value': [{
+        u'subscriptionId': kwargs.get(u'subscription_id', u'subscription'),
+        u'clientState': kwargs.get(u'client_state', u'secret'),
+        u'changeType': kwargs.get(u'change_type', u'created'),
+        u'resource': resource,
+        u'resourceData': {u'id': resource.rsplit(u'/', 1)[-1]},
+    } for resource in resources]})
+
+
+class NotificationProcessorTest(unittest.TestCase):
+
+    def test_validation_token_is_echoed(self):
+        processor = NotificationProcessor(u'secret')
+        self.assertEqual(processor.handle(u'validationToken=abc%20def', b''),
+                         (200, {u'Content-Type': u'text/plain'}, u'abc def'))
+
+    def test_invalid_body_and_client_state_are_rejected(self):
+        processor = NotificationProcessor(u'secret')
+        self.assertEqual(processor.handle(u'', b'not json')[0], 400)
+        self.assertEqual(processor.handle(u'', body(u'messages/1', client_state=u'forged'))[0], 202)
+        self.assertEqual(processor.drain(), [])
+        self.assertEqual(processor.stats[u'rejected'], 1)
+
+    def test_client_state_is_looked_up_per_subscription(self):
+        processor = NotificationProcessor(lambda subscription_id: {u'a': u'secret a'}.get(subscription_id))
+        processor.handle(u'', body(u'messages/1', subscription_id=u'a', client_state=u'secret a'))
+        processor.handle(u'', body(u'messages/2', subscription_id=u'b', client_state=u'secret a'))
+        self.assertEqual([notification.resource_id for notification in processor.drain()], [u'1'])
+
+    def test_repeated_notification_is_dropped_within_the_window(self):
+        processor = NotificationProcessor(u'secret', dedup_window=60)
+        processor.handle(u'', body(u'messages/1', u'messages/2'))
+        processor.handle(u'', body(u'messages/1'))
+        processor.handle(u'', body(u'messages/1', change_type=u'updated'))
+        self.assertEqual([(notification.resource_id, notification.change_type) for notification in processor.drain()],
+                         [(u'1', u'created'), (u'2', u'created'), (u'1', u'updated')])
+        self.assertEqual(processor.stats[u'duplicates'], 1)
+
+    def test_notifications_for_a_queued_resource_are_coalesced(self):
+        processor = NotificationProcessor(u'secret', coalesce=True)
+        processor.handle(u'', body(u'messages/1', u'messages/1'))
+        processor.handle(u'', body(u'messages/1', change_type=u'updated'))
+        notifications = processor.drain()
+        self.assertEqual([(notification.resource_id, notification.change_type) for notification in notifications],
+                         [(u'1', u'updated')])
+        processor.handle(u'', body(u'messages/1'))
+        self.assertEqual(len(processor.drain()), 1)
+        self.assertEqual(processor.stats[u'coalesced'], 2)
+
+    def test_full_queue_is_answered_with_503(self):
+        processor = NotificationProcessor(u'secret', max_size=2, put_timeout=0.01, dedup_window=60)
+        self.assertEqual(processor.handle(u'', body(u'messages/1', u'messages/2'))[0], 202)
+        status, headers, _ = processor.handle(u'', body(u'messages/3'))
+        self.assertEqual((status, headers), (503, {u'Retry-After': u'1'}))
+        self.assertEqual(len(processor.drain()), 2)
+        # The refused notification is not remembered, so its redelivery is accepted.
+        self.assertEqual(processor.handle(u'', body(u'messages/3'))[0], 202)
+        self.assertEqual([notification.resource_id for notification in processor.drain()], [u'3'])
+        self.assertEqual(processor.stats[u'duplicates'], 0)
+
+    def test_request_is_refused_whole_when_the_queue_lacks_room(self):
+        processor = NotificationProcessor(u'secret', max_size=3, put_timeout=0.01)
+        processor.handle(u'', body(u'messages/1', u'messages/2'))
+        self.assertEqual(processor.handle(u'', body(u'messages/3', u'messages/4'))[0], 503)
+        self.assertEqual([notification.resource_id for notification in processor.drain()], [u'1', u'2'])
+        self.assertEqual(processor.handle(u'', body(u'messages/3', u'messages/4'))[0], 202)
+        self.assertEqual([notification.resource_id for notification in processor.drain()], [u'3', u'4'])
+
+    def test_refused_request_is_coalesced_again_on_redelivery(self):
+        processor = NotificationProcessor(u'secret', max_size=1, put_timeout=0.01, coalesce=True)
+        processor.handle(u'', body(u'messages/1'))
+        self.assertEqual(processor.handle(u'', body(u'messages/2', u'messages/2'))[0], 503)
+        processor.drain()
+        self.assertEqual(processor.handle(u'', body(u'messages/2', u'messages/2'))[0], 202)
+        self.assertEqual([notification.resource_id for notification in processor.drain()], [u'2'])
+
+    def test_request_larger_than_the_queue_is_accepted_when_it_is_empty(self):
+        processor = NotificationProcessor(u'secret', max_size=2, put_timeout=0.01)
+        self.assertEqual(processor.handle(u'', body(u'messages/1', u'messages/2', u'messages/3'))[0], 202)
+        self.assertEqual(processor.handle(u'', body(u'messages/4'))[0], 503)
+        self.assertEqual(len(processor.drain()), 3)
+
+    def test_request_waits_for_room(self):
+        processor = NotificationProcessor(u'secret', max_size=1, put_timeout=5)
+        processor.handle(u'', body(u'messages/1'))
+        consumer = threading.Timer(0.05, processor.get)
+        consumer.start()
+        self.assertEqual(processor.handle(u'', body(u'messages/2'))[0], 202)
+        consumer.join()
+        self.assertEqual(processor.get(timeout=1).resource_id, u'2')
+
+
+if __name__ == u'__main__':
+    unittest.main()
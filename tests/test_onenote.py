@@ -0,0 +1,146 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from io import open
+
+from microsoftgraph import exceptions
+from microsoftgraph.onenote import MultipartBody
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+GRAPH_RESOURCE = u"https://graph.microsoft.com/v1.0/users('me')/onenote/resources/image-1/$value"
+OTHER_RESOURCE = u'https://evil.example.com/onenote/resources/abc/$value'
+
+
+class ExportNotebooksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.transport = ReplayTransport()
+        self.transport.add(u'GET', BASE + u'me/onenote/notebooks',
+                           json_body={u'value': [{u'id': u'notebook', u'displayName': u'Notes'}]})
+        self.transport.add(u'GET', BASE + u'me/onenote/notebooks/notebook/sections',
+                           json_body={u'value': [{u'id': u'section', u'displayName': u'Work'}]})
+        self.transport.route(u'^GET /v1.0/me/onenote/sections/section/pages', lambda prepared: (200, {}, {
+            u'value': [{u'id': u'page', u'lastModifiedDateTime': u'2020-01-01T00:00:00Z'}]}))
+        html = u'<img src="{}"><img src="{}">'.format(GRAPH_RESOURCE, OTHER_RESOURCE)
+        self.transport.route(u'^GET /v1.0/me/onenote/pages/page/content',
+                             lambda prepared: (200, {u'Content-Type': u'text/html'}, html.encode(u'utf-8')))
+        self.downloads = []
+        self.transport.route(u'/onenote/resources/', self.resource)
+        self.client = make_client(self.transport)
+
+    def resource(self, prepared):
+        self.downloads.append((prepared.url, prepared.headers.get(u'Authorization')))
+        return 200, {}, b'image'
+
+    def test_only_graph_resources_are_downloaded_with_the_token(self):
+        stats = self.client.export_notebooks(self.directory)
+        self.assertEqual((stats[u'pages'], stats[u'resources'], stats[u'failed']), (1, 1, []))
+        self.assertEqual(self.downloads, [(GRAPH_RESOURCE, u'Bearer token')])
+        page_dir = os.path.join(self.directory, u'Notes', u'Work', u'page')
+        with open(os.path.join(page_dir, u'page.html'), encoding=u'utf-8') as f:
+            self.assertEqual(f.read(), u'<img src="resources/image-1"><img src="{}">'.format(OTHER_RESOURCE))
+        with open(os.path.join(page_dir, u'resources', u'image-1'), u'rb') as f:
+            self.assertEqual(f.read(), b'image')
+
+    def test_unchanged_pages_are_skipped(self):
+        self.client.export_notebooks(self.directory)
+        stats = self.client.export_notebooks(self.directory)
+        self.assertEqual((stats[u'pages'], stats[u'skipped']), (0, 1))
+        self.assertEqual(len(self.downloads), 1)
+
+
+class PageFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.html = self.write(u'page.html', b'<img src="name:image1">')
+        self.image = self.write(u'image.png', os.urandom(5000))
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, u'wb') as f:
+            f.write(content)
+        return path
+
+    def expected(self, boundary, image_type=u'image/png'):
+        with open(self.image, u'rb') as f:
+            image = f.read()
+        return (u'--{0}\r\nContent-Disposition: form-data; name="Presentation"\r\nContent-Type: text/html\r\n\r\n'
+                u'<img src="name:image1">\r\n--{0}\r\nContent-Disposition: form-data; name="image1"\r\n'
+                u'Content-Type: {1}\r\n\r\n'.format(boundary, image_type).encode(u'utf-8') + image +
+                u'\r\n--{}--\r\n'.format(boundary).encode(u'utf-8'))
+
+
+class MultipartBodyTest(PageFilesTest):
+
+    def test_body_is_read_from_the_files(self):
+        body = MultipartBody([(u'Presentation', self.html, u'text/html'), (u'image1', self.image, u'image/png')],
+                             boundary=u'boundary')
+        expected = self.expected(u'boundary')
+        self.assertEqual(body.content_type, u'multipart/form-data; boundary=boundary')
+        self.assertEqual(len(body), len(expected))
+        self.assertEqual(b''.join(iter(lambda: body.read(7), b'')), expected)
+        self.assertEqual(body.tell(), len(expected))
+        body.seek(0)
+        self.assertEqual(body.read(), expected)
+        body.seek(0)
+        self.assertEqual(b''.join(body), expected)
+        with self.assertRaises(IOError):
+            body.seek(1)
+
+    def test_truncated_file_is_an_error(self):
+        body = MultipartBody([(u'image1', self.image, u'image/png')])
+        self.write(u'image.png', b'short')
+        with self.assertRaises(IOError):
+            body.read()
+        body.close()
+
+
+class CreatePageTest(PageFilesTest):
+
+    def setUp(self):
+        super(CreatePageTest, self).setUp()
+        self.transport = ReplayTransport()
+        self.throttled = 0
+        self.bodies = []
+        self.transport.route(u'^POST /v1.0/me/onenote/sections/section/pages$', self.create)
+        self.client = make_client(self.transport)
+
+    def create(self, prepared):
+        self.bodies.append((prepared.headers[u'Content-Type'], prepared.body.read()))
+        if self.throttled:
+            self.throttled -= 1
+            return 429, {u'Retry-After': u'0'}, {u'error': {u'code': u'TooManyRequests', u'message': u'Throttled'}}
+        return 201, {}, {u'id': u'page'}
+
+    def test_throttled_creation_is_sent_again(self):
+        self.throttled = 2
+        results = list(self.client.create_pages([(u'section', self.html, {u'image1': self.image})]))
+        self.assertEqual(results[0].value, {u'id': u'page'})
+        self.assertEqual(len(self.bodies), 3)
+        content_type, body = self.bodies[-1]
+        boundary = content_type.partition(u'boundary=')[2]
+        self.assertEqual(body, self.expected(boundary))
+        self.assertTrue(all(sent == body for _, sent in self.bodies))
+
+    def test_resource_content_type_can_be_given(self):
+        list(self.client.create_pages([(u'section', self.html, {u'image1': (self.image, u'image/x-raw')})]))
+        content_type, body = self.bodies[0]
+        self.assertEqual(body, self.expected(content_type.partition(u'boundary=')[2], u'image/x-raw'))
+
+    def test_persistent_throttling_fails_the_page(self):
+        self.throttled = 100
+        self.client.retry_policy.max_retries = 1
+        results = list(self.client.create_pages([(u'section', self.html)]))
+        self.assertIsInstance(results[0].exception, exceptions.TooManyRequests)
+        self.assertEqual(len(self.bodies), 2)
+
+
+if __name__ == u'__main__':
+    unittest.main()
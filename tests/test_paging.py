@@ -0,0 +1,52 @@
+from __future__ import absolute_import
+import unittest
+
+from microsoftgraph.query import Query
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+CONTACTS = [{u'id': unicode(index)} for index in range(7)]
+
+
+class PageIteratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = ReplayTransport()
+        self.pages = self.transport.add_pages(BASE + u'me/contacts?%24top=3', CONTACTS, 3)
+        self.client = make_client(self.transport)
+
+    def ids(self, iterator):
+        return [contact[u'id'] for contact in iterator]
+
+    def test_items_of_every_page_are_yielded(self):
+        contacts = self.client.iter(self.client.outlook_get_me_contacts, page_size=3)
+        self.assertEqual(self.ids(contacts), [u'0', u'1', u'2', u'3', u'4', u'5', u'6'])
+        self.assertEqual(len(self.transport.requests), self.pages)
+
+    def test_page_size_is_added_to_a_query(self):
+        self.transport.add_pages(BASE + u'me/contacts?%24select=id&%24top=3', CONTACTS, 3)
+        contacts = self.client.iter(self.client.outlook_get_me_contacts, page_size=3, params=Query().select(u'id'))
+        self.assertEqual(len(self.ids(contacts)), len(CONTACTS))
+        self.assertEqual(self.transport.misses, 0)
+
+    def test_max_items_stops_before_the_next_page(self):
+        contacts = self.client.iter(self.client.outlook_get_me_contacts, page_size=3, max_items=3)
+        self.assertEqual(self.ids(contacts), [u'0', u'1', u'2'])
+        self.assertEqual(len(self.transport.requests), 1)
+        self.assertEqual(self.ids(self.client.iter(self.client.outlook_get_me_contacts, max_items=0)), [])
+
+    def test_prefetched_pages_are_yielded_in_order(self):
+        contacts = self.client.iter(self.client.outlook_get_me_contacts, page_size=3, prefetch=True)
+        self.assertEqual(self.ids(contacts), [u'0', u'1', u'2', u'3', u'4', u'5', u'6'])
+
+    def test_pages_yields_the_raw_pages(self):
+        for prefetch in (False, True):
+            pages = list(self.client.iter(self.client.outlook_get_me_contacts, page_size=3,
+                                          prefetch=prefetch).pages())
+            self.assertEqual([len(page[u'value']) for page in pages], [3, 3, 1])
+            self.assertIn(u'@odata.nextLink', pages[0])
+            self.assertNotIn(u'@odata.nextLink', pages[-1])
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+import unittest
+import warnings
+
+from microsoftgraph import query
+from microsoftgraph.query import ProjectionWarning, Query, project, set_default_projection
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+
+class QueryTest(unittest.TestCase):
+
+    def test_to_params(self):
+        params = Query().select(u'id', u'subject').select(u'from').expand(u'attachments').filter(
+            u'isRead eq false').filter(u'importance eq \'high\'').orderby(u'receivedDateTime desc').top(10).skip(
+            20).search(u'report').count().params(foo=u'bar').to_params()
+        self.assertEqual(params, {
+            u'$select': u'id,subject,from', u'$expand': u'attachments',
+            u'$filter': u'(isRead eq false) and (importance eq \'high\')', u'$orderby': u'receivedDateTime desc',
+            u'$top': 10, u'$skip': 20, u'$search': u'"report"', u'$count': u'true', u'foo': u'bar'})
+
+    def test_queries_are_immutable(self):
+        base = Query().select(u'id')
+        self.assertEqual(base.top(5).to_params(), {u'$select': u'id', u'$top': 5})
+        self.assertEqual(base.to_params(), {u'$select': u'id'})
+        self.assertEqual(base, Query(select=[u'id']))
+        self.assertNotEqual(base, base.select(u'subject'))
+
+    def test_search_keeps_a_quoted_text(self):
+        self.assertEqual(Query().search(u'"a b"').to_params()[u'$search'], u'"a b"')
+        self.assertEqual(Query().search(u'say "hi"').to_params()[u'$search'], u'"say \\"hi\\""')
+
+    def test_invalid_values_are_refused(self):
+        for build in (lambda: Query().select(u''), lambda: Query().select(1), lambda: Query().filter(None),
+                      lambda: Query().top(0), lambda: Query().top(True), lambda: Query().top(u'5'),
+                      lambda: Query().skip(-1), lambda: Query().search(5)):
+            with self.assertRaises(TypeError):
+                build()
+
+    def test_query_is_sent_as_params(self):
+        transport = ReplayTransport()
+        transport.add(u'GET', BASE + u'me/messages/1?%24select=id%2Csubject', json_body={u'id': u'1'})
+        make_client(transport).get_message(u'1', params=Query().select(u'id', u'subject'))
+        self.assertEqual(transport.misses, 0)
+
+
+class ProjectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(query.DEFAULT_PROJECTIONS.clear)
+
+    def test_nothing_is_selected_without_projections(self):
+        self.assertIsNone(project(BASE + u'me/messages', None))
+        self.assertEqual(project(BASE + u'me/messages', {u'$top': 5}), {u'$top': 5})
+
+    def test_default_projection_of_the_endpoint_is_selected(self):
+        set_default_projection(u'me/messages/{id}', [u'id', u'subject'])
+        self.assertEqual(project(BASE + u'me/messages/AAMkADQ1ZGY0MWZkLTdhODYtNGQ2OS1hMzA5', {u'$top': 1}),
+                         {u'$top': 1, u'$select': u'id,subject'})
+        self.assertIsNone(project(BASE + u'me/messages', None))
+        set_default_projection(u'me/messages/{id}', None)
+        self.assertEqual(query.DEFAULT_PROJECTIONS, {})
+
+    def test_client_projections_take_precedence(self):
+        set_default_projection(u'me', [u'id'])
+        self.assertEqual(project(BASE + u'me', None, {u'me': (u'mail',)}), {u'$select': u'mail'})
+
+    def test_existing_select_is_kept(self):
+        set_default_projection(u'me', [u'id'])
+        self.assertEqual(project(BASE + u'me', Query().select(u'mail')), {u'$select': u'mail'})
+        self.assertIsNone(project(BASE + u'me?$select=mail', None))
+
+    def test_recommended_projections_keep_the_defaults(self):
+        set_default_projection(u'me', [u'id'])
+        query.use_recommended_projections()
+        self.assertEqual(query.DEFAULT_PROJECTIONS[u'me'], (u'id',))
+        self.assertEqual(query.DEFAULT_PROJECTIONS[u'me/contacts'], query.RECOMMENDED_PROJECTIONS[u'me/contacts'])
+
+    def test_strict_projection_warns_about_whole_entities(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter(u'always')
+            project(BASE + u'me/messages', None, strict=True)
+            project(BASE + u'me/messages/1/$value', None, strict=True)
+            project(BASE + u'me/messages', {u'$select': u'id'}, strict=True)
+        self.assertEqual([warning.category for warning in caught], [ProjectionWarning])
+
+    def test_client_applies_its_projections_to_gets(self):
+        transport = ReplayTransport()
+        transport.add(u'GET', BASE + u'me/messages/1?%24select=id', json_body={u'id': u'1'})
+        transport.add(u'POST', BASE + u'me/messages/1/send', status=202)
+        client = make_client(transport, projections={u'me/messages/{id}': [u'id']})
+        client.get_message(u'1')
+        client._post(BASE + u'me/messages/1/send')
+        self.assertEqual(transport.misses, 0)
+
+
+if __name__ == u'__main__':
+    unittest.main()
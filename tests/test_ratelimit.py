@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+
+from microsoftgraph.ratelimit import RateLimiter, SQLiteBackend, resource_family
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+KEY = (u'common', u'mail')
+
+
+class ResourceFamilyTest(unittest.TestCase):
+
+    def test_families(self):
+        self.assertEqual(resource_family(BASE + u'me/mailFolders/inbox/messages'), u'mail')
+        self.assertEqual(resource_family(BASE + u'me/drive/items/1/workbook/worksheets'), u'drive')
+        self.assertEqual(resource_family(BASE + u'me/onenote/pages'), u'onenote')
+        self.assertEqual(resource_family(BASE + u'subscriptions/1'), u'subscriptions')
+        self.assertEqual(resource_family(BASE + u'me'), u'default')
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def limiter(self, **kwargs):
+        return RateLimiter(**kwargs)
+
+    def test_burst_is_sent_without_waiting(self):
+        limiter = self.limiter(rate=1, burst=3)
+        self.assertEqual([limiter.acquire(KEY) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(limiter.backend.update(KEY, limiter._take), 0.9)
+
+    def test_empty_bucket_waits_for_a_token(self):
+        limiter = self.limiter(rate=50, burst=1)
+        limiter.acquire(KEY)
+        self.assertGreater(limiter.acquire(KEY), 0)
+
+    def test_throttling_halves_the_rate_and_success_increases_it(self):
+        limiter = self.limiter(rate=8, min_rate=1, max_rate=8.5, increase=1)
+        self.assertEqual(limiter.feedback(KEY, 429), 4)
+        self.assertEqual(limiter.feedback(KEY, 503), 2)
+        self.assertEqual(limiter.feedback(KEY, 200), 3)
+        for _ in range(3):
+            limiter.feedback(KEY, 429)
+        self.assertEqual(limiter.get_rate(KEY), 1)
+        for _ in range(10):
+            limiter.feedback(KEY, 200)
+        self.assertEqual(limiter.get_rate(KEY), 8.5)
+        self.assertEqual(limiter.get_rate((u'common', u'drive')), 8)
+
+    def test_client_feeds_the_limiter_per_resource_family(self):
+        transport = ReplayTransport()
+        transport.add_throttling(u'GET', BASE + u'me/contacts', retry_after=0)
+        transport.add(u'GET', BASE + u'me/contacts', json_body={u'value': []})
+        limiter = self.limiter(rate=10, increase=1)
+        client = make_client(transport, rate_limiter=limiter)
+        client.outlook_get_me_contacts()
+        self.assertEqual(limiter.get_rate(KEY), 6)
+        self.assertEqual(limiter.get_rate((u'common', u'drive')), 10)
+
+
+class SQLiteBackendTest(RateLimiterTest):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, u'limits.db')
+
+    def limiter(self, **kwargs):
+        return RateLimiter(backend=SQLiteBackend(self.path), **kwargs)
+
+    def test_state_is_shared_between_limiters(self):
+        self.limiter(rate=8).feedback(KEY, 429)
+        self.assertEqual(self.limiter(rate=8).get_rate(KEY), 4)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+
+from microsoftgraph.registry import ClientRegistry
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.stores import MemoryStore
+
+
+class SlowStore(MemoryStore):
+    u"""A token store whose reads of `slow` wait until `release` is set."""
+
+    def __init__(self):
+        super(SlowStore, self).__init__()
+        self.reading = threading.Event()
+        self.release = threading.Event()
+        self.reads = []
+
+    def get(self, key, default=None):
+        self.reads.append(key)
+        if key == u'slow':
+            self.reading.set()
+            self.release.wait(5)
+        return super(SlowStore, self).get(key, default)
+
+
+class ClientRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SlowStore()
+        self.store.set(u'slow', {u'access_token': u'slow token'})
+        self.store.set(u'fast', {u'access_token': u'fast token'})
+        self.registry = ClientRegistry(u'id', u'secret', token_store=self.store, max_clients=2,
+                                       transport=ReplayTransport())
+
+    def load_slow(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get(u'slow'))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.store.reading.wait(5)
+        return threads, results
+
+    def test_loading_an_account_does_not_hold_up_the_others(self):
+        threads, results = self.load_slow()
+        start = time.time()
+        self.assertEqual(self.registry.get(u'fast').token, {u'access_token': u'fast token'})
+        self.assertLess(time.time() - start, 1)
+        self.store.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertEqual(self.store.reads.count(u'slow'), 1)
+        self.assertIs(self.registry.get(u'slow'), results[0])
+
+    def test_token_set_while_loading_is_kept(self):
+        threads, results = self.load_slow()
+        self.registry.set_token(u'slow', {u'access_token': u'new token'})
+        self.store.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results[0].token, {u'access_token': u'new token'})
+
+    def test_least_recently_used_clients_are_dropped(self):
+        self.store.release.set()
+        slow, fast = self.registry.get(u'slow'), self.registry.get(u'fast')
+        self.registry.get(u'slow')
+        self.registry.get(u'other')
+        self.assertIs(self.registry.get(u'slow'), slow)
+        self.assertIsNot(self.registry.get(u'fast'), fast)
+        self.assertIs(slow.session, fast.session)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+from __future__ import absolute_import
+import time
+import unittest
+from email.utils import formatdate
+
+import requests
+
+from microsoftgraph import exceptions
+from microsoftgraph.retry import RetryPolicy
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import BASE, make_client
+
+
+def response(status, headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    return result
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_retry_after_seconds(self):
+        policy = RetryPolicy()
+        self.assertEqual(policy.get_delay(response(429, {u'Retry-After': u'7'}), 0, 0), 7)
+        self.assertEqual(policy.stats[u'throttled'], 1)
+
+    def test_retry_after_date(self):
+        delay = RetryPolicy().get_delay(response(503, {u'Retry-After': formatdate(time.time() + 30)}), 0, 0)
+        self.assertTrue(25 <= delay <= 30, delay)
+
+    def test_retry_after_above_max_backoff_is_not_retried(self):
+        policy = RetryPolicy(max_backoff=5)
+        self.assertIsNone(policy.get_delay(response(429, {u'Retry-After': u'120'}), 0, 0))
+        self.assertEqual(policy.get_delay(response(429, {u'Retry-After': u'5'}), 0, 0), 5)
+        self.assertEqual(policy.stats[u'retries'], 1)
+
+    def test_backoff_without_retry_after(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=60)
+        for attempt in range(5):
+            self.assertTrue(0 <= policy.get_delay(response(503), attempt, 0) <= 2 ** attempt)
+
+    def test_limits(self):
+        policy = RetryPolicy(max_retries=2, max_total_time=10)
+        self.assertIsNone(policy.get_delay(response(429), 2, 0))
+        self.assertIsNone(policy.get_delay(response(429, {u'Retry-After': u'5'}), 0, 6))
+        self.assertIsNone(policy.get_delay(response(500), 0, 0))
+
+    def test_non_idempotent_requests(self):
+        self.assertFalse(RetryPolicy().can_retry(u'POST', {}))
+        self.assertTrue(RetryPolicy(retry_non_idempotent=True).can_retry(u'POST', {u'json': {}}))
+        self.assertFalse(RetryPolicy(retry_non_idempotent=True).can_retry(u'POST', {u'files': {}}))
+
+
+class ClientRetryTest(unittest.TestCase):
+
+    def test_throttled_get_is_retried(self):
+        transport = ReplayTransport()
+        transport.add(u'GET', BASE + u'me', json_body={u'id': u'me'})
+        transport.add_throttling(u'GET', BASE + u'me', count=2, retry_after=0)
+        client = make_client(transport)
+        self.assertEqual(client.get_me(), {u'id': u'me'})
+        self.assertEqual(len(transport.requests), 3)
+        self.assertEqual(client.retry_policy.stats[u'throttled'], 2)
+
+    def test_retries_are_limited(self):
+        transport = ReplayTransport()
+        transport.add_throttling(u'GET', BASE + u'me', count=1, retry_after=0)
+        client = make_client(transport, retry_policy=RetryPolicy(max_retries=3, backoff_factor=0))
+        self.assertRaises(exceptions.TooManyRequests, client.get_me)
+        self.assertEqual(len(transport.requests), 4)
+
+    def test_throttled_post_is_not_retried(self):
+        transport = ReplayTransport()
+        transport.add(u'POST', BASE + u'me/contacts', json_body={u'id': u'1'})
+        transport.add_throttling(u'POST', BASE + u'me/contacts', retry_after=0)
+        client = make_client(transport)
+        with self.assertRaises(exceptions.TooManyRequests) as context:
+            client.outlook_create_me_contact(json={u'givenName': u'Pavel'})
+        self.assertEqual(context.exception.response.headers[u'Retry-After'], u'0')
+        self.assertEqual(len(transport.requests), 1)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.singleflight import SingleFlight
+from tests.helpers import BASE, make_client
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def run_together(self, func, count=5):
+        results = []
+
+        def call():
+            try:
+                results.append(func())
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_one_call(self):
+        flight, calls = SingleFlight(), []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {u'id': u'1'}
+
+        results = self.run_together(lambda: flight.do(u'key', slow))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats, {u'hits': 4, u'misses': 1, u'in_flight': 0})
+
+    def test_exception_is_raised_to_every_caller(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError(u'failed')
+
+        results = self.run_together(lambda: flight.do(u'key', failing), count=3)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.do(u'key', lambda: 1), 1)
+
+    def test_calls_after_completion_are_sent_again(self):
+        flight = SingleFlight()
+        self.assertEqual([flight.do(u'key', lambda: 1), flight.do(u'key', lambda: 2)], [1, 2])
+        self.assertEqual(flight.stats[u'misses'], 2)
+
+    def test_client_sends_identical_gets_once(self):
+        transport = ReplayTransport(latency=0.1)
+        transport.add(u'GET', BASE + u'me/contacts', json_body={u'value': []})
+        client = make_client(transport, single_flight=SingleFlight())
+        self.assertEqual(self.run_together(client.outlook_get_me_contacts), [{u'value': []}] * 5)
+        self.assertEqual(transport.requests, [u'GET /v1.0/me/contacts'])
+
+
+if __name__ == u'__main__':
+    unittest.main()
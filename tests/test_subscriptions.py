@@ -0,0 +1,95 @@
+from __future__ import absolute_import
+import time
+import unittest
+
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.subscriptions import SubscriptionManager, format_datetime, parse_datetime
+from tests.helpers import batch_requests, make_client
+
+
+class SubscriptionService(object):
+    u"""Answers the batched renewals and creations of subscriptions, knowing only the ids in `alive`."""
+
+    def __init__(self, alive):
+        self.alive = set(alive)
+        self.created = 0
+        self.batches = []
+        self.error = None
+
+    def __call__(self, prepared):
+        if self.error is not None:
+            raise self.error
+        requests = batch_requests(prepared)
+        self.batches.append([(request[u'method'], request[u'url']) for request in requests])
+        return 200, {}, {u'responses': [self.respond(request) for request in requests]}
+
+    def respond(self, request):
+        if request[u'method'] == u'POST':
+            self.created += 1
+            subscription = dict(request[u'body'], id=u'new{}'.format(self.created))
+            self.alive.add(subscription[u'id'])
+            return {u'id': request[u'id'], u'status': 201, u'body': subscription}
+        subscription_id = request[u'url'].rsplit(u'/', 1)[-1]
+        if subscription_id not in self.alive:
+            return {u'id': request[u'id'], u'status': 404,
+                    u'body': {u'error': {u'code': u'ResourceNotFound', u'message': u'Not found'}}}
+        return {u'id': request[u'id'], u'status': 200,
+                u'body': {u'id': subscription_id, u'expirationDateTime': request[u'body'][u'expirationDateTime']}}
+
+
+def subscription(subscription_id, expires):
+    return {u'id': subscription_id, u'changeType': u'created', u'notificationUrl': u'https://example.com/notify',
+            u'resource': u'me/mailFolders/inbox/messages', u'clientState': u'secret',
+            u'expirationDateTime': format_datetime(expires)}
+
+
+class SubscriptionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = SubscriptionService([u'a', u'b'])
+        self.transport = ReplayTransport()
+        self.transport.route(u'^POST /beta/\\$batch$', self.service)
+        self.manager = SubscriptionManager(make_client(self.transport), lifetime=3600, renew_before=600,
+                                           retry_interval=60)
+        self.soon = int(time.time()) + 300
+        for subscription_id in (u'a', u'b'):
+            self.manager.add(subscription(subscription_id, self.soon))
+
+    def test_due_subscriptions_are_renewed_in_one_batch(self):
+        self.assertEqual(self.manager.renew_due(), {u'renewed': 2, u'recreated': 0, u'failed': 0})
+        self.assertEqual(self.service.batches, [[(u'PATCH', u'/subscriptions/a'), (u'PATCH', u'/subscriptions/b')]])
+        self.assertGreater(self.manager.get(u'a')[u'expires'], self.soon)
+        self.assertEqual(self.manager.next_due(), self.manager.get(u'a')[u'due'])
+        self.assertEqual(self.manager.renew_due(), {u'renewed': 0, u'recreated': 0, u'failed': 0})
+
+    def test_missing_subscription_is_recreated(self):
+        self.service.alive.discard(u'b')
+        self.assertEqual(self.manager.renew_due(), {u'renewed': 1, u'recreated': 1, u'failed': 0})
+        self.assertEqual(self.service.batches[1], [(u'POST', u'/subscriptions')])
+        self.assertIsNone(self.manager.get(u'b'))
+        record = self.manager.get(u'new1')
+        self.assertEqual((record[u'resource'], record[u'clientState']), (u'me/mailFolders/inbox/messages', u'secret'))
+        self.assertGreater(record[u'expires'], self.soon)
+
+    def test_failed_renewal_is_retried_later(self):
+        self.service.respond = lambda request: {
+            u'id': request[u'id'], u'status': 400, u'body': {u'error': {u'code': u'BadRequest', u'message': u''}}}
+        self.assertEqual(self.manager.renew_due(), {u'renewed': 0, u'recreated': 0, u'failed': 2})
+        self.assertGreater(self.manager.get(u'a')[u'due'], time.time() + 30)
+        self.assertEqual(self.manager.get(u'a')[u'expires'], self.soon)
+
+    def test_records_are_put_back_when_the_renewal_raises(self):
+        self.service.error = RuntimeError(u'unexpected')
+        with self.assertRaises(RuntimeError):
+            self.manager.renew_due()
+        self.assertEqual(self.manager.due(now=time.time() + 30), [])
+        self.assertEqual(len(self.manager.due(now=time.time() + 3600)), 2)
+
+    def test_index_is_rebuilt_from_the_store(self):
+        manager = SubscriptionManager(make_client(self.transport), self.manager.store, renew_before=600)
+        self.assertEqual(manager.next_due(), self.soon - 600)
+        self.assertEqual(parse_datetime(format_datetime(self.soon)), self.soon)
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from urlparse import parse_qs
+
+from microsoftgraph import exceptions
+from microsoftgraph.replay import ReplayTransport
+from tests.helpers import make_client
+
+
+class TokenEndpoint(object):
+    u"""Answers refresh_token grants with a new access token, slowly, counting them."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prepared):
+        self.assert_refresh(parse_qs(prepared.body))
+        time.sleep(self.delay)
+        with self._lock:
+            self.refreshes += 1
+            count = self.refreshes
+        return 200, {}, {u'access_token': u'token{}'.format(count), u'expires_in': 3600}
+
+    @staticmethod
+    def assert_refresh(form):
+        assert form[u'grant_type'] == [u'refresh_token'], form
+        assert form[u'refresh_token'] == [u'refresh'], form
+
+
+class AuthorizedMe(object):
+    u"""Answers GET me with 401 until the request carries one of the accepted tokens."""
+
+    def __init__(self, *accepted):
+        self.accepted = accepted
+        self.tokens = []
+
+    def __call__(self, prepared):
+        token = prepared.headers[u'Authorization'][len(u'Bearer '):]
+        self.tokens.append(token)
+        if token in self.accepted:
+            return 200, {}, {u'id': u'me'}
+        return 401, {}, {u'error': {u'code': u'InvalidAuthenticationToken'}}
+
+
+def managed_client(me, endpoint, expires_in=3600):
+    transport = ReplayTransport()
+    transport.route(u'^GET /v1.0/me$', me)
+    transport.route(u'^POST /common/oauth2/v2.0/token$', endpoint)
+    client = make_client(transport, token={u'access_token': u'token0', u'refresh_token': u'refresh',
+                                           u'expires_at': time.time() + expires_in})
+    client.manage_token(u'https://example.com/callback')
+    return client
+
+
+class TokenRefreshTest(unittest.TestCase):
+
+    def test_401_refreshes_once_and_retries(self):
+        me, endpoint = AuthorizedMe(u'token1'), TokenEndpoint()
+        client = managed_client(me, endpoint)
+        self.assertEqual(client.get_me(), {u'id': u'me'})
+        self.assertEqual(me.tokens, [u'token0', u'token1'])
+        self.assertEqual(endpoint.refreshes, 1)
+
+    def test_second_401_is_raised(self):
+        me, endpoint = AuthorizedMe(), TokenEndpoint()
+        client = managed_client(me, endpoint)
+        self.assertRaises(exceptions.Unauthorized, client.get_me)
+        self.assertEqual(me.tokens, [u'token0', u'token1'])
+        self.assertEqual(endpoint.refreshes, 1)
+
+    def test_expired_token_is_refreshed_once_for_concurrent_callers(self):
+        me, endpoint = AuthorizedMe(u'token1'), TokenEndpoint(delay=0.2)
+        client = managed_client(me, endpoint, expires_in=-1)
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(client.get_me())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 10)
+        self.assertEqual(endpoint.refreshes, 1)
+        self.assertEqual(set(me.tokens), set([u'token1']))
+
+    def test_token_close_to_expiry_is_refreshed_while_still_used(self):
+        me, endpoint = AuthorizedMe(u'token0', u'token1'), TokenEndpoint()
+        client = managed_client(me, endpoint, expires_in=60)
+        client.get_me()
+        client.get_me()
+        self.assertEqual(endpoint.refreshes, 1)
+        self.assertEqual(me.tokens, [u'token1', u'token1'])
+
+
+if __name__ == u'__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+from __future__ import absolute_import
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from microsoftgraph.download import QuickXorHash
+from microsoftgraph.replay import ReplayTransport
+from microsoftgraph.stores import MemoryStore
+from microsoftgraph.upload import CHUNK_MULTIPLE
+from tests.helpers import BASE, make_client
+
+SESSION_URL = u'https://upload.example.com/session'
+DOWNLOAD_URL = u'https://download.example.com/content'
+XOR_CONTENT = bytes(bytearray(range(256))) * 3 + b'xyz'
+XOR_DIGEST = u'rxAOGe1RimTF/e+k/W0O5gEa5iE='
+
+
+class QuickXorHashTest(unittest.TestCase):
+
+    def digest(self, *chunks):
+        hasher = QuickXorHash()
+        for chunk in chunks:
+            hasher.update(chunk)
+        return hasher.b64digest()
+
+    def test_known_digests(self):
+        self.assertEqual(self.digest(), u'AAAAAAAAAAAAAAAAAAAAAAAAAAA=')
+        self.assertEqual(self.digest(b'a'), u'YQAAAAAAAAAAAAAAAQAAAAAAAAA=')
+        self.assertEqual(self.digest(b'abc'), u'YRDDGAAAAAAAAAAAAwAAAAAAAAA=')
+        self.assertEqual(self.digest(XOR_CONTENT), XOR_DIGEST)
+
+    def test_digest_does_not_depend_on_the_chunks(self):
+        self.assertEqual(self.digest(XOR_CONTENT[:1], XOR_CONTENT[1:170], XOR_CONTENT[170:]), XOR_DIGEST)
+
+
+class UploadServer(object):
+    u"""An upload session expecting the ranges from `received` on, and answering its status."""
+
+    def __init__(self, size, received=0):
+        self.size = size
+        self.received = received
+        self.ranges = []
+
+    def status(self, prepared):
+        return 200, {}, {u'nextExpectedRanges': [u'{}-'.format(self.received)]}
+
+    def put(self, prepared):
+        start, end, total = map(int, re.match(u'bytes (\\d+)-(\\d+)/(\\d+)',
+                                              prepared.headers[u'Content-Range']).groups())
+        if start != self.received or len(prepared.body) != end - start + 1:
+            return 416, {}, {u'error': {u'code': u'invalidRange', u'message': u''}}
+        self.ranges.append((start, end + 1))
+        self.received = end + 1
+        if self.received == total:
+            return 201, {}, {u'id': u'item', u'size': total}
+        return 202, {}, {u'nextExpectedRanges': [u'{}-'.format(self.received)]}
+
+
+class DownloadServer(object):
+    u"""Serves content, recording the requested ranges."""
+
+    def __init__(self, content):
+        self.content = content
+        self.ranges = []
+        self.accept_ranges = True
+        self.max_length = None
+
+    def __call__(self, prepared):
+        match = re.match(u'bytes=(\\d+)-(\\d+)', prepared.headers.get(u'Range', u''))
+        if not match or not self.accept_ranges:
+            self.ranges.append(None)
+            return 200, {}, self.content[:self.max_length]
+        start, end = int(match.group(1)), int(match.group(2))
+        self.ranges.append((start, end + 1))
+        return 206, {u'Content-Range': u'bytes {}-{}/{}'.format(start, end, len(self.content))}, \
+            self.content[start:end + 1][:self.max_length]
+
+
+class TransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.transport = ReplayTransport()
+        self.client = make_client(self.transport)
+
+
+class UploadTest(TransferTest):
+
+    def setUp(self):
+        super(UploadTest, self).setUp()
+        self.size = 3 * CHUNK_MULTIPLE + 100
+        self.path = os.path.join(self.directory, u'file.bin')
+        with open(self.path, u'wb') as f:
+            f.write(os.urandom(self.size))
+        self.transport.add(u'POST', BASE + u'me/drive/root:/docs/file.bin:/createUploadSession',
+                           json_body={u'uploadUrl': SESSION_URL, u'nextExpectedRanges': [u'0-'],
+                                      u'expirationDateTime': u'2030-01-01T00:00:00Z'})
+
+    def upload(self, server, store):
+        self.transport.route(u'^GET /session$', server.status)
+        self.transport.route(u'^PUT /session$', server.put)
+        return self.client.drive_upload_large_file(self.path, u'docs/file.bin', chunk_size=CHUNK_MULTIPLE,
+                                                   state_store=store)
+
+    def test_upload_sends_every_range_in_order(self):
+        server, store = UploadServer(self.size), MemoryStore()
+        progress = []
+        self.transport.route(u'^PUT /session$', server.put)
+        item = self.client.drive_upload_large_file(self.path, u'docs/file.bin', chunk_size=CHUNK_MULTIPLE,
+                                                   state_store=store, on_progress=lambda *args: progress.append(args))
+        self.assertEqual(item, {u'id': u'item', u'size': self.size})
+        self.assertEqual(server.ranges, [(0, CHUNK_MULTIPLE), (CHUNK_MULTIPLE, 2 * CHUNK_MULTIPLE),
+                                         (2 * CHUNK_MULTIPLE, 3 * CHUNK_MULTIPLE), (3 * CHUNK_MULTIPLE, self.size)])
+        self.assertEqual(progress[-1], (self.size, self.size))
+        self.assertEqual(store.keys(), [])
+
+    def test_saved_session_is_resumed_from_its_next_expected_range(self):
+        server, store = UploadServer(self.size, received=2 * CHUNK_MULTIPLE), MemoryStore()
+        key = u'{}||docs/file.bin'.format(os.path.abspath(self.path))
+        store.set(key, {u'upload_url': SESSION_URL, u'size': self.size, u'mtime': os.path.getmtime(self.path),
+                        u'expiration': None})
+        self.assertEqual(self.upload(server, store)[u'size'], self.size)
+        self.assertEqual(server.ranges, [(2 * CHUNK_MULTIPLE, 3 * CHUNK_MULTIPLE), (3 * CHUNK_MULTIPLE, self.size)])
+        self.assertNotIn(u'POST /v1.0/me/drive/root:/docs/file.bin:/createUploadSession', self.transport.requests)
+        self.assertEqual(store.keys(), [])
+
+    def test_modified_file_starts_a_new_session(self):
+        server, store = UploadServer(self.size), MemoryStore()
+        key = u'{}||docs/file.bin'.format(os.path.abspath(self.path))
+        store.set(key, {u'upload_url': SESSION_URL, u'size': self.size, u'mtime': 0, u'expiration': None})
+        self.upload(server, store)
+        self.assertEqual(server.ranges[0], (0, CHUNK_MULTIPLE))
+        self.assertNotIn(u'GET /session', self.transport.requests)
+
+    def test_chunk_size_must_be_a_multiple_of_320_kib(self):
+        with self.assertRaises(ValueError):
+            self.client.drive_upload_large_file(self.path, u'docs/file.bin', chunk_size=1000)
+
+
+class DownloadTest(TransferTest):
+
+    def setUp(self):
+        super(DownloadTest, self).setUp()
+        self.content = os.urandom(10000)
+        self.server = DownloadServer(self.content)
+        self.transport.route(u'^GET /content$', self.server)
+        self.path = os.path.join(self.directory, u'file.bin')
+
+    def item(self, **hashes):
+        self.transport.add(u'GET', BASE + u'me/drive/items/item', json_body={
+            u'id': u'item', u'size': len(self.content), u'cTag': u'tag', u'file': {u'hashes': hashes},
+            u'@microsoft.graph.downloadUrl': DOWNLOAD_URL})
+
+    def read(self):
+        with open(self.path, u'rb') as f:
+            return f.read()
+
+    def test_segments_are_downloaded_and_verified(self):
+        self.item(sha1Hash=hashlib.sha1(self.content).hexdigest().upper())
+        self.client.drive_download_item(u'item', self.path, max_workers=3, segment_size=3000)
+        self.assertEqual(self.read(), self.content)
+        self.assertEqual(sorted(self.server.ranges), [(0, 3000), (3000, 6000), (6000, 9000), (9000, 10000)])
+        self.assertFalse(os.path.exists(self.path + u'.part'))
+        self.assertFalse(os.path.exists(self.path + u'.part.json'))
+
+    def test_quick_xor_hash_is_verified(self):
+        self.content = self.server.content = XOR_CONTENT
+        self.item(quickXorHash=XOR_DIGEST)
+        self.client.drive_download_item(u'item', self.path, max_workers=3, segment_size=300)
+        self.assertEqual(self.read(), self.content)
+        self.assertEqual(sorted(self.server.ranges), [(0, 300), (300, 600), (600, 771)])
+
+    def test_hash_mismatch_is_an_error(self):
+        self.item(quickXorHash=u'AAAAAAAAAAAAAAAAAAAAAAAAAAA=')
+        with self.assertRaises(IOError):
+            self.client.drive_download_item(u'item', self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_interrupted_download_only_fetches_the_missing_segments(self):
+        self.item(sha256Hash=hashlib.sha256(self.content).hexdigest())
+        with open(self.path + u'.part', u'wb') as f:
+            f.write(self.content[:6000] + b'\0' * 4000)
+        with open(self.path + u'.part.json', u'wb') as f:
+            f.write(json.dumps({u'tag': u'tag', u'size': len(self.content), u'segment_size': 3000,
+                                u'done': [1, 0]}).encode(u'utf-8'))
+        self.client.drive_download_item(u'item', self.path, segment_size=3000)
+        self.assertEqual(self.server.ranges, [(6000, 9000), (9000, 10000)])
+        self.assertEqual(self.read(), self.content)
+
+    def test_partial_file_of_another_version_is_discarded(self):
+        self.item()
+        with open(self.path + u'.part', u'wb') as f:
+            f.write(b'\0' * len(self.content))
+        with open(self.path + u'.part.json', u'wb') as f:
+            f.write(json.dumps({u'tag': u'old', u'size': len(self.content), u'segment_size': 3000,
+                                u'done': [0, 1, 2, 3]}).encode(u'utf-8'))
+        self.client.drive_download_item(u'item', self.path, segment_size=3000)
+        self.assertEqual(len(self.server.ranges), 4)
+        self.assertEqual(self.read(), self.content)
+
+    def test_hash_mismatch_is_raised_and_keeps_the_destination_untouched(self):
+        self.item(sha1Hash=hashlib.sha1(b'other').hexdigest())
+        with self.assertRaises(IOError):
+            self.client.drive_download_item(u'item', self.path, segment_size=3000)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_short_segment_is_raised_and_fetched_again(self):
+        self.item()
+        self.server.max_length = 100
+        with self.assertRaises(IOError):
+            self.client.drive_download_item(u'item', self.path, segment_size=3000)
+        self.assertFalse(os.path.exists(self.path))
+        self.server.max_length = None
+        self.server.ranges = []
+        self.client.drive_download_item(u'item', self.path, segment_size=3000)
+        self.assertEqual(self.server.ranges, [(0, 3000), (3000, 6000), (6000, 9000), (9000, 10000)])
+        self.assertEqual(self.read(), self.content)
+
+    def test_short_stream_is_raised_without_verify(self):
+        self.item()
+        self.server.max_length = 100
+        with self.assertRaises(IOError):
+            self.client.drive_download_item(u'item', io.BytesIO(), verify=False)
+
+    def test_ignored_range_is_raised(self):
+        self.item()
+        self.server.accept_ranges = False
+        with self.assertRaises(IOError):
+            self.client.drive_download_item(u'item', self.path, segment_size=3000)
+
+
+if __name__ == u'__main__':
+    unittest.main()